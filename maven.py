@@ -3,6 +3,8 @@
 
 from mavencoord import MavenCoord
 from mavendeps import MavenDeps
+from mavenstats import MavenStats, timed
+import mavenproperties
 import copy
 
 class Maven:
@@ -20,9 +22,20 @@ class Maven:
     self.parent = MavenCoord ()
     self.deps = MavenDeps ()
     self.depsManagement = MavenDeps ()
-    self.properties = { 'jdk' : Maven.DEFAULT_JDK_VERSION }
+    self.properties = MavenProperties ({ 'jdk' : Maven.DEFAULT_JDK_VERSION })
     self.profiles = []
 
+    # environment to activate profiles (None for the current machine)
+    self.environment = None
+
+    # state kept between expansions (see expand)
+    self._propertyGraph = None
+    self._coordIndex = None
+
+    # state of the last preparation and resolution (see prepare and resolve)
+    self._preparedState = None
+    self._resolvedState = None
+
     # TODO: self.resources
     # TODO: self.testResources
 
@@ -36,36 +49,130 @@ class Maven:
     return
 
   def clone (self):
-    """ Returns a clone of this object
+    """ Returns a clone of this object.
+
+    Dependency trees are shared between both objects until any of them is
+    modified (see MavenDeps.clone).
     """
-    return copy.deepcopy (self)
+    new = copy.copy (self)
+    new.coord = MavenCoord (self.coord)
+    new.parent = MavenCoord (self.parent)
+    new.deps = self.deps.clone ()
+    new.depsManagement = self.depsManagement.clone ()
+    new.properties = MavenProperties (self.properties)
+    new.profiles = list (self.profiles)
+
+    if self._propertyGraph is not None:
+      new._propertyGraph = self._propertyGraph.clone ()
+
+    if self._coordIndex is not None:
+      new._coordIndex = self._coordIndex.clone (new)
+    return new
 
   def setProperty (self, name, value):
-    self.properties[name] = value
+    """ Sets given property. When the object has been expanded already, the
+    next call to expand (or prepare and resolve) expands again the properties
+    and coordinates that depend on the properties changed, even if the
+    dependencies have been resolved since.
+
+    Setting the value a property already has changes nothing.
+    """
+    if self.properties.get (name) != value:
+      self.properties[name] = value
     return
 
-  def resolve (self, scope = None, skipOptional = True, jdkVersion = None):
+  def resolve (
+    self,
+    scope = None,
+    skipOptional = True,
+    jdkVersion = None,
+    environment = None,
+    report = None
+  ):
     """ Resolve all dependencies and exclude whatever needs to be excluded.
 
     Resolving a maven object implies have all properties expanded as well.
+
+    The environment (see MavenEnvironment) is used to evaluate os and file
+    activation rules of profiles. When a MavenReport is given, the outcome
+    of each dependency is recorded there (see MavenDeps.resolve).
+
+    Resolving again with the same arguments does nothing unless properties
+    or dependencies have changed since (see _getState), and resolving with
+    a narrower scope only filters the dependencies already resolved.
+    """
+    self.prepare (jdkVersion, environment)
+
+    if scope is None:
+      scopeKey = None
+    elif isinstance (scope, basestring):
+      scopeKey = frozenset ([scope])
+    else:
+      scopeKey = frozenset (scope)
+
+    resolvedState = (scopeKey, skipOptional, self._preparedState)
+    if (report is None) and (resolvedState == self._resolvedState):
+      return
+
+    self.deps.resolve (scope, skipOptional, report)
+
+    # a resolved object is still prepared
+    self._preparedState = self._getState ()
+    self._resolvedState = (scopeKey, skipOptional, self._preparedState)
+    return
+
+  def prepare (self, jdkVersion = None, environment = None):
+    """ Gets the effective dependencies (active profiles, properties expanded
+    and dependency management applied) without resolving them, so they keep
+    their exclusions (see resolve).
     """
     if jdkVersion:
-      self.properties['jdk'] = jdkVersion
+      self.setProperty ('jdk', jdkVersion)
+
+    if environment:
+      self.environment = environment
+
+    if self._getState () == self._preparedState:
+      return
 
     self._resolveProfiles ()
 
     self.expand ()
 
-    self.deps.updateVersionsAndScope (self.depsManagement.root)
-    self.deps.resolve (scope, skipOptional)
+    self.deps.updateVersionsAndScope (self.depsManagement)
+    self._preparedState = self._getState ()
     return
 
+  def _getState (self):
+    """ Returns a value that changes whenever something prepare or resolve
+    depend on is modified: properties (see MavenProperties), profiles, the
+    environment or the dependencies (see MavenDeps.getGeneration).
+
+    Profiles are applied and removed by prepare, so there are profiles only
+    when some have been added since.
+    """
+    # properties might have been replaced by a plain dictionary
+    if not isinstance (self.properties, MavenProperties):
+      self.properties = MavenProperties (self.properties)
+
+    return (
+      self.properties,
+      self.properties.generation,
+      len (self.profiles) > 0,
+      self.environment,
+      self.deps,
+      self.deps.getGeneration (),
+      self.depsManagement,
+      self.depsManagement.getGeneration ()
+    )
+
+  @timed (MavenStats.PROFILES)
   def _resolveProfiles (self):
     """ Resolves active profiles and updates current maven object with the
     new or modified dependencies and properties.
     """
     for profile in self.profiles:
-      if not profile.isActive (self.properties):
+      if not profile.isActive (self.properties, self.environment):
         continue
 
       # when active merge all deps
@@ -76,45 +183,46 @@ class Maven:
     self.profiles = []
     return
 
+  @timed (MavenStats.EXPAND)
   def expand (self):
     """ Expands all property variables and gets the effective dependencies
     by modifying the current object.
+
+    The first expansion keeps the original templates along a reverse index
+    from property names to the properties and coordinates referencing them,
+    so that expanding again after changing some properties (see setProperty)
+    only touches the affected entries. Adding or resolving dependencies
+    through MavenDeps discards the index.
     """
     self.properties['project.groupId'] = self.coord.group
     self.properties['project.artifactId'] = self.coord.artifact
     self.properties['project.version'] = self.coord.version
 
-    self._expandProperties ()
-    
-    # expand dependencies
-    self.deps.expand (self.properties)
-    self.depsManagement.expand (self.properties)
+    if self._propertyGraph is None:
+      self._expandProperties ()
+      changed = None
+    else:
+      changed = self._propertyGraph.update (self.properties)
+      self.properties = MavenProperties (self._propertyGraph.expanded)
+
+    if (self._coordIndex is None) or (not self._coordIndex.isValidFor (self)):
+      self._coordIndex = _MavenCoordIndex (self)
+      changed = None
 
+    # expand dependencies (same interpolator to share memoised templates)
+    interpolator = mavenproperties.MavenInterpolator (self.properties)
+    self._coordIndex.expand (self, interpolator, changed)
     return
 
   def _expandProperties (self):
     """ Replaces the values of the properties that have properties embedded
     so that all properties end up without having ${symbol}.
-    """
-    numReplacements = 1
-    while numReplacements > 0:
-      numReplacements = 0
-
-      # update properties with other properties
-      updatedProperties = {}
-      for k, v in self.properties.items():
-        if v.find ('${') >= 0:
-          nv = v
-          
-          for kk, vv in self.properties.items():
-            nv = nv.replace ('${%s}' % kk, vv)
-          
-          numReplacements += (0 if (nv == v) else 1)
-          v = nv
-        
-        updatedProperties[k] = v
-      self.properties = updatedProperties
 
+    References to unknown properties are left untouched and it raises an
+    exception when properties reference each other in a cycle.
+    """
+    self._propertyGraph = mavenproperties.MavenPropertyGraph (self.properties)
+    self.properties = MavenProperties (self._propertyGraph.expanded)
     return
 
   def __repr__ (self):
@@ -125,4 +233,163 @@ class Maven:
     for k,v in self.properties.items():
       s.append ('  %s = %s' % (k, v))
 
-    return '\n'.join (s)
\ No newline at end of file
+    return '\n'.join (s)
+
+class MavenProperties (dict):
+  """ Dictionary of properties that counts the changes made to it, so that
+  changing them directly (e.g: maven.properties['jdk'] = '1.8') is noticed
+  the same way as through Maven.setProperty.
+  """
+  # unpickling sets the items before the attributes of the instance
+  generation = 0
+
+  def __init__ (self, *args, **kwargs):
+    dict.__init__ (self, *args, **kwargs)
+    self.generation = 0
+    return
+
+  def __setitem__ (self, name, value):
+    self.generation += 1
+    dict.__setitem__ (self, name, value)
+    return
+
+  def __delitem__ (self, name):
+    self.generation += 1
+    dict.__delitem__ (self, name)
+    return
+
+  def update (self, *args, **kwargs):
+    self.generation += 1
+    dict.update (self, *args, **kwargs)
+    return
+
+  def setdefault (self, name, value = None):
+    self.generation += 1
+    return dict.setdefault (self, name, value)
+
+  def pop (self, name, *args):
+    self.generation += 1
+    return dict.pop (self, name, *args)
+
+  def popitem (self):
+    self.generation += 1
+    return dict.popitem (self)
+
+  def clear (self):
+    self.generation += 1
+    dict.clear (self)
+    return
+
+class _MavenCoordIndex:
+  """ Reverse index from property names to the coordinates of the dependency
+  trees (deps and depsManagement) whose templates reference them.
+
+  Only the root and the dependencies declared by the POM itself (the
+  children of the root) are indexed. Deeper dependencies come from other
+  POM files (e.g: grafted by MavenRepo) and were expanded with their own
+  properties, so they are never expanded again.
+
+  Coordinates are located by their path in the tree, so the index is only
+  valid while the trees keep the same structure. The templates are kept in
+  the dependencies as well (see MavenDep.templates), so an index built
+  again once the trees change (e.g: after resolving them) finds them.
+  """
+  TREES = ('deps', 'depsManagement')
+
+  def __init__ (self, maven):
+    self._trees = {}
+    self._entries = []
+    self._byProperty = {}
+
+    for treeName in _MavenCoordIndex.TREES:
+      tree = getattr (maven, treeName)
+      self._trees[treeName] = (tree, tree.getGeneration ())
+
+      self._add (treeName, (), tree.root)
+      for i, dep in enumerate (tree.root.children):
+        self._add (treeName, (i,), dep)
+    return
+
+  def clone (self, maven):
+    """ Returns a copy of this index for given maven object, which is
+    expected to be a clone of the one used to build this index.
+    """
+    new = copy.copy (self)
+    new._trees = {}
+    for treeName, (tree, generation) in self._trees.items():
+      new._trees[treeName] = (getattr (maven, treeName), generation)
+    return new
+
+  def isValidFor (self, maven):
+    """ Returns True when the trees of given maven object have not changed
+    since the index was built
+    """
+    for treeName, (tree, generation) in self._trees.items():
+      current = getattr (maven, treeName)
+      if (current is not tree) or (current.getGeneration () != generation):
+        return False
+    return True
+
+  def expand (self, maven, interpolator, changedProperties = None):
+    """ Expands the coordinates referencing any of the changed properties,
+    or all of them when _changedProperties_ is None.
+
+    The dependencies managed by the entries of depsManagement expanded (by
+    their names before and after expanding them) get the management applied
+    again with the new values (see MavenDeps.reapplyManagement).
+    """
+    if changedProperties is None:
+      entries = self._entries
+    else:
+      seen = set()
+      entries = []
+      for name in changedProperties:
+        for entry in self._byProperty.get (name, ()):
+          if id (entry) not in seen:
+            seen.add (id (entry))
+            entries.append (entry)
+
+    managedNames = set()
+    for (treeName, path, templates) in entries:
+      dep = getattr (maven, treeName).getWritableDep (path)
+
+      (group, artifact, version) = templates
+      if treeName == 'depsManagement':
+        managedNames.add (dep.coord.name)
+
+      dep.coord = dep.coord.withValues (
+        interpolator.interpolate (group),
+        interpolator.interpolate (artifact),
+        interpolator.interpolate (version)
+      )
+      if treeName == 'depsManagement':
+        managedNames.add (dep.coord.name)
+
+    if managedNames:
+      maven.deps.reapplyManagement (maven.depsManagement, managedNames)
+
+    # the structure of the trees has not changed, only their coordinates
+    for treeName, (tree, generation) in self._trees.items():
+      self._trees[treeName] = (tree, tree.getGeneration ())
+    return
+
+  def _add (self, treeName, path, dep):
+    templates = dep.templates
+    if templates is None:
+      templates = (dep.coord.group, dep.coord.artifact, dep.coord.version)
+
+    refs = set()
+    for template in templates:
+      refs.update (mavenproperties.getReferences (template))
+
+    if not refs:
+      return
+
+    # same value for all the trees sharing it, so it can be set in place
+    dep.templates = templates
+
+    entry = (treeName, path, templates)
+    self._entries.append (entry)
+    for ref in refs:
+      self._byProperty.setdefault (ref, []).append (entry)
+    return
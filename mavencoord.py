@@ -1,27 +1,115 @@
 #/usr/bin/env python
 # -*- coding: utf-8 -*- 
+import threading
+import weakref
+
 import mavenversioncmp as vercmp
+from mavenproperties import MavenInterpolator
+
+# component strings are interned, so the same group, artifact or version
+# is stored only once no matter how many coordinates reference it. Strings
+# cannot be weakly referenced, so the pool is emptied when it reaches
+# _STRINGS_SIZE (the strings in use are kept alive by their coordinates).
+_STRINGS_SIZE = 65536
+_strings = {}
+
+def _intern (value):
+  if isinstance (value, basestring):
+    interned = _strings.get (value)
+    if interned is None:
+      if len (_strings) >= _STRINGS_SIZE:
+        _strings.clear ()
+      interned = _strings.setdefault (value, value)
+    return interned
+  return value
+
+class _MavenCoordBase (object):
+  """ Read-only behaviour shared by MavenCoord and MavenFrozenCoord, which
+  are expected to provide group, artifact, version, scope, name, id and full
+  """
+  __slots__ = ()
+
+  def empty(self):
+    """ Returns True when group or artifact are not defined
+    """
+    if (self.group and self.artifact):
+      return False
+    return True
+
+  def isContainedIn (self, listOfCoords):
+    """ Returns True if the current coord is contained in any of the coords 
+    contained in the passed list
+    """
+    for coord in listOfCoords:
+      if self.isContained (coord):
+        return True
+    return False
+
+  def isContained (self, coord):
+    """ 
+
+    Example:
+      >>> MavenCoord('A:B').isContained ('A:B')
+      True
+      >>> MavenCoord('A:B:1.0').isContained ('A:B')
+      True
+      >>> MavenCoord('A:B:1.2').isContained ('A:B:1.0')
+      False
+    """
+    if isinstance (coord, basestring):
+      coord = MavenCoord(coord)
+
+    if (
+      (self.id.strip(':') == coord.id.strip(':')) or
+      (self.name == coord.id.strip(':'))
+    ):
+      return True
+
+    # TODO: check versioning in coord
+
+    return False
+
+  def __str__ (self):
+    return self.id
+
+  def __repr__ (self):
+    return self.full
+
 
-class MavenCoord:
+class MavenCoord (_MavenCoordBase):
   """ This class helps to manage maven coordinates, which are formed by
   groupId, artifactId and version.
 
   This class considers _name_ to the string composed as 'groupId:artifact'
+
+  MavenCoord is mutable, and is meant to be used to build coordinates (e.g:
+  when parsing), see MavenFrozenCoord for immutable ones.
+
+  The _name_, _id_ and _full_ keys are computed once and cached until any
+  of the values they are composed of is modified.
   """
   SCOPE_DEFAULT = 'default'
   SCOPE_COMPILE = 'compile'
 
+  __slots__ = (
+    '_group', '_artifact', '_version', '_type', '_scope',
+    '_name', '_id', '_full'
+  )
+
   def __init__ (self, coordObject = None):
-    self.group    = ''
-    self.artifact = ''
-    self.version  = ''
-    self.type     = 'jar'
-    self.scope    = MavenCoord.SCOPE_DEFAULT
+    self._name     = None
+    self._id       = None
+    self._full     = None
+    self._group    = ''
+    self._artifact = ''
+    self._version  = ''
+    self._type     = 'jar'
+    self._scope    = MavenCoord.SCOPE_DEFAULT
 
     if coordObject is None:
       return
 
-    elif isinstance (coordObject, MavenCoord):
+    elif isinstance (coordObject, _MavenCoordBase):
       self.copy (coordObject)
       return
 
@@ -34,50 +122,111 @@ class MavenCoord:
       return
     return
 
+  @property
+  def group (self):
+    return self._group
+
+  @group.setter
+  def group (self, value):
+    self._group = _intern (value)
+    self._name = self._id = self._full = None
+    return
+
+  @property
+  def artifact (self):
+    return self._artifact
+
+  @artifact.setter
+  def artifact (self, value):
+    self._artifact = _intern (value)
+    self._name = self._id = self._full = None
+    return
+
+  @property
+  def version (self):
+    return self._version
+
+  @version.setter
+  def version (self, value):
+    self._version = _intern (value)
+    self._id = self._full = None
+    return
+
+  @property
+  def type (self):
+    return self._type
+
+  @type.setter
+  def type (self, value):
+    self._type = _intern (value)
+    self._full = None
+    return
+
+  @property
+  def scope (self):
+    return self._scope
+
+  @scope.setter
+  def scope (self, value):
+    self._scope = _intern (value)
+    self._full = None
+    return
+
   @property
   def name (self):
     """ Returns both the group and the artifact ids as a string
     separated by colon
     """
-    return '%s:%s' % (self.group, self.artifact)
+    if self._name is None:
+      self._name = '%s:%s' % (self._group, self._artifact)
+    return self._name
 
   @property
   def id (self):
     """ Returns the group, artifact and version as a colon-separated
     string
     """
-    return '%s:%s:%s' % (self.group, self.artifact, self.version)
+    if self._id is None:
+      self._id = '%s:%s:%s' % (self._group, self._artifact, self._version)
+    return self._id
   
   @property
   def full (self):
     """ Returns the full maven coordinate
     """
-    return '%s:%s:%s:%s:%s' % (
-      self.group,
-      self.artifact,
-      self.type,
-      self.version,
-      self.scope
-    )
+    if self._full is None:
+      self._full = '%s:%s:%s:%s:%s' % (
+        self._group,
+        self._artifact,
+        self._type,
+        self._version,
+        self._scope
+      )
+    return self._full
+
+  def __getstate__ (self):
+    """ Coordinates have no __dict__, so their values are pickled (and
+    copied) as a tuple
+    """
+    return (self._group, self._artifact, self._version, self._type, self._scope)
+
+  def __setstate__ (self, state):
+    (self._group, self._artifact, self._version, self._type, self._scope) = state
+    self._name = self._id = self._full = None
+    return
 
   def resolve (self):
     self.scope = MavenCoord.resolveScope (self.scope)
     return
 
-  def empty(self):
-    """ Returns True when group or artifact are not defined
-    """
-    if (self.group and self.artifact):
-      return False
-    return True
-
   def expand (self, properties):
-    """ Expand variables found in the properties
+    """ Expand variables found in the properties, which can be either a
+    dictionary of expanded properties or a MavenInterpolator.
     """
-    for k, v in properties.items():
-      self.group = self.group.replace ('${%s}' % k, v)
-      self.artifact = self.artifact.replace ('${%s}' % k, v)
-      self.version = self.version.replace ('${%s}' % k, v)
+    interpolator = MavenInterpolator.create (properties)
+    self.group = interpolator.interpolate (self.group)
+    self.artifact = interpolator.interpolate (self.artifact)
+    self.version = interpolator.interpolate (self.version)
     return
 
   def _initFromString (self, coordString):
@@ -95,17 +244,19 @@ class MavenCoord:
     if len(splitCoord) == 5:
       splitCoord.pop(2) # remove type
 
-    self.group    = splitCoord[0]
-    self.artifact = splitCoord[1]
-    self.version  = splitCoord[2] if (len(splitCoord) > 2) else ''
-    self.scope    = splitCoord[3] if (len(splitCoord) > 3) else MavenCoord.SCOPE_DEFAULT
+    self._group    = _intern (splitCoord[0])
+    self._artifact = _intern (splitCoord[1])
+    self._version  = _intern (splitCoord[2]) if (len(splitCoord) > 2) else ''
+    self._scope    = _intern (splitCoord[3]) if (len(splitCoord) > 3) else MavenCoord.SCOPE_DEFAULT
+    self._name = self._id = self._full = None
     return
 
   def _initFromDict (self, coordDict):
-    self.group    = coordDict.get ('groupId', '')
-    self.artifact = coordDict.get ('artifactId', '')
-    self.version  = coordDict.get ('version', '')
-    self.scope    = coordDict.get ('scope', MavenCoord.SCOPE_DEFAULT)
+    self._group    = _intern (coordDict.get ('groupId', ''))
+    self._artifact = _intern (coordDict.get ('artifactId', ''))
+    self._version  = _intern (coordDict.get ('version', ''))
+    self._scope    = _intern (coordDict.get ('scope', MavenCoord.SCOPE_DEFAULT))
+    self._name = self._id = self._full = None
     return
 
   @staticmethod
@@ -127,53 +278,31 @@ class MavenCoord:
     new.scope    = self.scope
     return new
 
-  def isContainedIn (self, listOfCoords):
-    """ Returns True if the current coord is contained in any of the coords 
-    contained in the passed list
-    """
-    for coord in listOfCoords:
-      if self.isContained (coord):
-        return True
-    return False
-
-  def isContained (self, coord):
-    """ 
-
-    Example:
-      >>> MavenCoord('A:B').isContained ('A:B')
-      True
-      >>> MavenCoord('A:B:1.0').isContained ('A:B')
-      True
-      >>> MavenCoord('A:B:1.2').isContained ('A:B:1.0')
-      False
-    """
-    if isinstance (coord, basestring):
-      coord = MavenCoord(coord)
-
-    if (
-      (self.id.strip(':') == coord.id.strip(':')) or
-      (self.name == coord.id.strip(':'))
-    ):
-      return True
-
-    # TODO: check versioning in coord
-
-    return False
-
   def copy (self, obj):
     """ Copy data from another maven module object
     """
-    self.group    = obj.group
-    self.artifact = obj.artifact
-    self.version  = obj.version
-    self.scope    = obj.scope
+    self._group    = _intern (obj.group)
+    self._artifact = _intern (obj.artifact)
+    self._version  = _intern (obj.version)
+    self._scope    = _intern (obj.scope)
+    self._full = None
+
+    # name and id are the same, no need to compute them again
+    if isinstance (obj, MavenCoord):
+      self._name = obj._name
+      self._id = obj._id
+    elif isinstance (obj, MavenFrozenCoord):
+      self._name = obj.name
+      self._id = obj.id
+    else:
+      self._name = self._id = None
     return self
 
-  def __str__ (self):
-    return self.id
-
-  def __repr__ (self):
-    return self.full
+  def freeze (self):
+    """ Returns the canonical immutable instance of this coordinate (see
+    MavenFrozenCoord)
+    """
+    return MavenCoordPool.getDefault ().get (self)
 
 
   @staticmethod
@@ -222,6 +351,64 @@ class MavenCoord:
       "Could not resolve conflict! '%s' vs '%s'" % (coord1.id, coord2.id)
     )
 
+  @staticmethod
+  def resolveDependencyConflict (coord1, coord2):
+    """ Resolve the conflict between two dependencies with given coordinates,
+    sticking with the highest version that resolves the conflict.
+
+    Returns a (coord, scope) tuple with the coordinate that wins and the
+    scope it should have, which is the strongest scope of both.
+
+    It raises an exception if it cannot resolve the conflict
+    """
+    cmpValue = vercmp.compare (coord1.id, coord2.id)
+    newScope = MavenCoord.resolveScopeConflict (coord1.scope, coord2.scope)
+
+    # same value? any of both will do
+    if cmpValue == 0:
+      return (coord1, newScope)
+
+    # coord1 > coord2
+    if cmpValue > 0:
+      if vercmp.satisfies (coord1, coord2):
+        return (coord1, newScope)
+
+    # coord2 > coord1 or coord1 is higher and does not satisfies coord2
+    if vercmp.satisfies (coord2, coord1):
+      return (coord2, newScope)
+
+    raise Exception (
+      "Could not resolve conflict! '%s' vs '%s'" % (coord1.id, coord2.id)
+    )
+
+  @staticmethod
+  def resolveTransitiveScope (scope, transitiveScope):
+    """ Returns the scope of a transitive dependency with _transitiveScope_
+    reached through a dependency with _scope_, or None when it is not
+    transitive (following maven's scope propagation table).
+
+    Example:
+      >>> MavenCoord.resolveTransitiveScope ('compile', 'runtime')
+      'runtime'
+      >>> MavenCoord.resolveTransitiveScope ('test', 'compile')
+      'test'
+      >>> MavenCoord.resolveTransitiveScope ('compile', 'test') is None
+      True
+    """
+    scope = MavenCoord.resolveScope (scope)
+    transitiveScope = MavenCoord.resolveScope (transitiveScope)
+
+    if transitiveScope in ('provided', 'test'):
+      return None
+
+    if (transitiveScope == 'system') or (scope == 'compile'):
+      return transitiveScope
+
+    if scope in ('runtime', 'test'):
+      return scope
+
+    return 'provided'
+
   @staticmethod
   def resolveScopeConflict (scope1, scope2):
     scope1 = MavenCoord.resolveScope (scope1)
@@ -264,3 +451,183 @@ class MavenCoord:
         'test' : 'test'
       },
     }[scope1][scope2]
+
+
+class MavenFrozenCoord (_MavenCoordBase):
+  """ Immutable maven coordinate, hashable and comparable with other frozen
+  coordinates.
+
+  Instances should be obtained from MavenCoordPool (or MavenCoord.freeze),
+  which returns a single canonical instance per coordinate, so the same
+  coordinate found all over a tree is stored once and can be compared by
+  identity. Modifications return other canonical instances instead.
+  """
+  __slots__ = (
+    'group', 'artifact', 'type', 'version', 'scope',
+    'name', 'id', 'full', '_hash', '__weakref__'
+  )
+
+  def __init__ (self, coord):
+    """ Initializes the coordinate from a MavenCoord
+    """
+    init = object.__setattr__
+    init (self, 'group', _intern (coord.group))
+    init (self, 'artifact', _intern (coord.artifact))
+    init (self, 'type', _intern (coord.type))
+    init (self, 'version', _intern (coord.version))
+    init (self, 'scope', _intern (coord.scope))
+    init (self, 'name', _intern (coord.name))
+    init (self, 'id', _intern (coord.id))
+    init (self, 'full', _intern (coord.full))
+    init (self, '_hash', hash (self.full))
+    return
+
+  def __setattr__ (self, name, value):
+    raise AttributeError (
+      "Cannot modify '%s' of an immutable coordinate %s" % (name, self.full)
+    )
+
+  def __reduce__ (self):
+    """ Frozen coordinates are unpickled through the default pool, so they
+    are canonical in the process loading them as well
+    """
+    return (
+      _getFrozenCoord,
+      (self.group, self.artifact, self.type, self.version, self.scope)
+    )
+
+  def __copy__ (self):
+    return self
+
+  def __deepcopy__ (self, memo):
+    return self
+
+  def __hash__ (self):
+    return self._hash
+
+  def __eq__ (self, other):
+    if self is other:
+      return True
+    if not isinstance (other, MavenFrozenCoord):
+      return False
+    return self.full == other.full
+
+  def __ne__ (self, other):
+    return not self.__eq__ (other)
+
+  def thaw (self):
+    """ Returns a mutable copy (see MavenCoord)
+    """
+    return MavenCoord (self)
+
+  def withValues (self, group = None, artifact = None, version = None, scope = None):
+    """ Returns the canonical coordinate with the values given replaced, or
+    this very same object if nothing changes.
+    """
+    if (
+      ((group is None) or (group == self.group)) and
+      ((artifact is None) or (artifact == self.artifact)) and
+      ((version is None) or (version == self.version)) and
+      ((scope is None) or (scope == self.scope))
+    ):
+      return self
+
+    coord = MavenCoord (self)
+    if group is not None:
+      coord.group = group
+    if artifact is not None:
+      coord.artifact = artifact
+    if version is not None:
+      coord.version = version
+    if scope is not None:
+      coord.scope = scope
+    return MavenCoordPool.getDefault ().get (coord)
+
+  def expanded (self, properties):
+    """ Returns the coordinate with its variables expanded (see
+    MavenCoord.expand)
+    """
+    interpolator = MavenInterpolator.create (properties)
+    return self.withValues (
+      interpolator.interpolate (self.group),
+      interpolator.interpolate (self.artifact),
+      interpolator.interpolate (self.version)
+    )
+
+  def resolved (self):
+    """ Returns the coordinate with the scope resolved (see
+    MavenCoord.resolve)
+    """
+    return self.withValues (scope = MavenCoord.resolveScope (self.scope))
+
+
+def _getFrozenCoord (group, artifact, type, version, scope):
+  """ Returns the canonical coordinate with given values from the default
+  pool (see MavenFrozenCoord.__reduce__)
+  """
+  coord = MavenCoord ()
+  coord.group = group
+  coord.artifact = artifact
+  coord.type = type
+  coord.version = version
+  coord.scope = scope
+  return MavenCoordPool.getDefault ().get (coord)
+
+class MavenCoordPool:
+  """ Pool of canonical immutable coordinates (hash-consing), so there is a
+  single MavenFrozenCoord instance for each different coordinate in use.
+
+  Coordinates are weakly referenced, so the ones not used anymore are
+  released.
+  """
+  _default = None
+  _defaultLock = threading.Lock ()
+
+  def __init__ (self):
+    self._coords = weakref.WeakValueDictionary ()
+    self._parsed = weakref.WeakValueDictionary ()
+    self._lock = threading.Lock ()
+    return
+
+  def get (self, coord):
+    """ Returns the canonical instance for given coordinate, which can be
+    given as any of the values accepted by MavenCoord.
+    """
+    if isinstance (coord, MavenFrozenCoord):
+      if self._coords.get (coord.full) is coord:
+        return coord
+
+    elif isinstance (coord, basestring):
+      # strings are parsed only once
+      canonical = self._parsed.get (coord)
+      if canonical is None:
+        canonical = self.get (MavenCoord (coord))
+        self._parsed[coord] = canonical
+      return canonical
+
+    elif not isinstance (coord, MavenCoord):
+      coord = MavenCoord (coord)
+
+    full = coord.full
+    canonical = self._coords.get (full)
+    if canonical is None:
+      # only new coordinates are locked, so that they are created once
+      with self._lock:
+        canonical = self._coords.get (full)
+        if canonical is None:
+          canonical = MavenFrozenCoord (coord)
+          self._coords[full] = canonical
+    return canonical
+
+  def __len__ (self):
+    return len (self._coords)
+
+  @staticmethod
+  def getDefault ():
+    """ Returns the pool used by default
+    """
+    if MavenCoordPool._default is None:
+      with MavenCoordPool._defaultLock:
+        if MavenCoordPool._default is None:
+          MavenCoordPool._default = MavenCoordPool ()
+    return MavenCoordPool._default
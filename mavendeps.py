@@ -1,234 +1,533 @@
 #/usr/bin/env python
 # -*- coding: utf-8 -*- 
-import copy
-from collections import OrderedDict
-from mavencoord import MavenCoord
-import mavenversioncmp as vercmp
-
-class MavenDep:
+from collections import deque
+import weakref
+from mavencoord import MavenCoord, MavenCoordPool
+from mavenexclusions import MavenExclusions
+from mavenproperties import MavenInterpolator
+from mavenreport import MavenReport
+from mavenstats import MavenStats, timed
+
+class MavenDep (object):
   """ Class to model a single dependency along its internal dependencies
+
+  Dependencies can be shared by several trees (see clone), in which case they
+  are flagged as shared and all operations that modify a tree copy the shared
+  dependencies in the path being modified instead of modifying them (copy on
+  write). Children of a shared dependency are shared as well, even if they
+  are not flagged yet. The children handed out by deps and find are copied
+  first when shared, so a dependency obtained that way can be modified
+  without modifying any other tree.
+
+  Dependencies whose coordinate referenced properties keep the original
+  (group, artifact, version) templates once expanded by Maven, so they can
+  be expanded again with other values (see Maven.setProperty). In the same
+  way, dependencies updated by the dependency management keep the (version,
+  scope, exclusions) they had before, so it can be applied again (see
+  MavenDeps.reapplyManagement).
   """
+  __slots__ = (
+    'coord', 'optional', '_deps', 'exclusions', 'templates', 'unmanaged',
+    '_shared', '_changes'
+  )
+
   def __init__ (self, coord, optional = False):
-    self.coord = MavenCoord (coord)
+    self.coord = MavenCoordPool.getDefault ().get (coord)
     self.optional = optional
-    self.deps = []
+    self._deps = []
     self.exclusions = []
+    self.templates = None
+    self.unmanaged = None
+    self._shared = False
+
+    # weak references to the changes of the trees indexing this dependency,
+    # which can be several since dependencies are shared (see
+    # MavenDeps._getIndex)
+    self._changes = ()
+    return
+
+  def __getstate__ (self):
+    """ Dependencies have no __dict__, so their attributes are pickled (and
+    copied) as a tuple, without the trees indexing them (see MavenDeps)
+    """
+    return tuple (
+      getattr (self, name) if name != '_changes' else ()
+      for name in MavenDep.__slots__
+    )
+
+  def __setstate__ (self, state):
+    for (name, value) in zip (MavenDep.__slots__, state):
+      setattr (self, name, value)
+    return
+
+  @property
+  def deps (self):
+    """ List of children of this dependency, which can be modified: the
+    shared ones are copied first (see clone), so modifying them does not
+    modify other trees. Use children to read them without copying anything.
+    """
+    for i in range (len (self._deps)):
+      if self._deps[i]._shared:
+        self._ownDep (i)
+    return self._deps
+
+  @deps.setter
+  def deps (self, deps):
+    self._changed ()
+    self._deps = deps
     return
 
+  @property
+  def children (self):
+    """ List of children of this dependency as they are, including the
+    shared ones, so neither the list nor the children can be modified (see
+    deps)
+    """
+    return self._deps
+
+  def clone (self):
+    """ Returns a copy of this dependency that shares all its children with
+    this one.
+    """
+    new = MavenDep (self.coord, self.optional)
+    new._deps = list (self._deps)
+    new.exclusions = list (self.exclusions)
+    new.templates = self.templates
+    new.unmanaged = self.unmanaged
+
+    for dep in self._deps:
+      dep._shared = True
+    return new
+
+  def share (self):
+    """ Flags this dependency as shared, so it will be copied instead of
+    modified by any tree that modifies it. Returns itself.
+    """
+    self._shared = True
+    return self
+
+  def _ownDep (self, index):
+    """ Makes sure the child at given index can be modified and returns it
+    """
+    dep = self._deps[index]
+    if dep._shared:
+      dep = dep.clone ()
+      self._deps[index] = dep
+      self._changed ()
+    return dep
+
+  def _ownPath (self, path):
+    """ Returns the dependency found following given path (a list of indexes
+    of children) from this one, copying the shared dependencies found in the
+    path so the dependency returned can be modified.
+    """
+    dep = self
+    for i in path:
+      dep = dep._ownDep (i)
+    return dep
+
   def add (self, dep):
     """ Add a new dependency
 
     NOTE: multiple dependencies to the same coord can be added, if that happens
     they will be resolved at the end by following some prioritization rules.
+
+    NOTE: it modifies this very same dependency, which is never shared when
+    it has been obtained through deps, find or MavenDeps.getWritableDep.
     """
     if not isinstance (dep, MavenDep):
       raise Exception ("Expecting a MavenDep when adding dependency: %s" % str(dep))
 
-    self.deps.append (dep)
+    self._changed ()
+    self._deps.append (dep)
+    return
+
+  def _changed (self):
+    """ Lets the trees whose indexes reference this dependency (if any)
+    know that it has been modified (see MavenDeps._getIndex)
+    """
+    for ref in self._changes:
+      changes = ref ()
+      if changes is not None:
+        changes.count += 1
+    return
+
+  def _addChanges (self, ref):
+    """ Links this dependency to the changes of a tree (a weak reference
+    to them, see _changed), forgetting the ones of trees that are gone
+    """
+    for known in self._changes:
+      if known is ref:
+        return
+
+    self._changes = tuple (r for r in self._changes if r () is not None) + (ref,)
     return
 
   def find (self, coord):
-    """ Find a dependency based on the coord
+    """ Find a dependency based on the coord. The shared dependencies in the
+    path to the dependency found are copied, so it can be modified without
+    modifying other trees (see clone).
     """
-    if self.coord.id == MavenCoord(coord).id:
+    coordId = MavenCoordPool.getDefault ().get (coord).id
+    if self.coord.id == coordId:
       return self
 
-    for dep in self.deps:
-      result = dep.find (coord)
-      if result:
-        return result
-    
+    # each dependency is linked to its parent instead of building its path,
+    # which is only built for the dependency found
+    stack = [(child, (i, None)) for i, child in _reversedChildren (self)]
+    while stack:
+      (dep, link) = stack.pop ()
+      if dep.coord.id == coordId:
+        return self._ownPath (_linkToPath (link))
+
+      stack.extend ((child, (i, link)) for i, child in _reversedChildren (dep))
+
     return None
 
   def expand (self, properties):
-    """ Expand internal variables recursively
+    """ Expand internal variables recursively. Properties can be either a
+    dictionary of expanded properties or a MavenInterpolator.
     """
-    self.coord.expand (properties)
-    for dep in self.deps:
-      dep.expand (properties)
+    interpolator = MavenInterpolator.create (properties)
+    self._changed ()
+
+    stack = [self]
+    while stack:
+      dep = stack.pop ()
+      dep.coord = dep.coord.expanded (interpolator)
+      for i, child in enumerate (dep._deps):
+        if child._shared:
+          dep._deps[i] = child._expanded (interpolator)
+        else:
+          stack.append (child)
     return 
 
+  def _expanded (self, interpolator):
+    """ Returns this dependency when expanding it would not change anything,
+    otherwise it returns an expanded copy (only copying modified paths).
+    """
+    def isChanged (dep):
+      return dep.coord.expanded (interpolator) is not dep.coord
+
+    def update (dep):
+      dep.coord = dep.coord.expanded (interpolator)
+      return
+
+    return self._rebuilt (isChanged, update)
+
+  def _rebuilt (self, isChanged, update):
+    """ Returns this dependency when neither it nor any of its children are
+    changed (see _isChanged_), otherwise a copy where the changed dependencies
+    and their ancestors are copied and then updated (see _update_), reusing
+    the rest of dependencies as they are.
+
+    The tree is walked in post-order with an explicit stack, and dependencies
+    reached several times (shared ones) are only rebuilt once.
+    """
+    rebuilt = {}
+    stack = [(self, False)]
+    while stack:
+      (dep, visited) = stack.pop ()
+      if id (dep) in rebuilt:
+        continue
+
+      if not visited:
+        stack.append ((dep, True))
+        for child in dep._deps:
+          if id (child) not in rebuilt:
+            stack.append ((child, False))
+        continue
+
+      newDeps = None
+      for i, child in enumerate (dep._deps):
+        newChild = rebuilt[id (child)]
+        if newChild is not child:
+          if newDeps is None:
+            newDeps = list (dep._deps)
+          newDeps[i] = newChild
+
+      if (newDeps is None) and (not isChanged (dep)):
+        rebuilt[id (dep)] = dep
+        continue
+
+      new = dep.clone ()
+      update (new)
+      if newDeps is not None:
+        new._deps = [child.share () for child in newDeps]
+      rebuilt[id (dep)] = new
+
+    return rebuilt[id (self)]
+
   def count (self):
     """ Returns the number of dependencies recursively, counting even if there
     are duplicates in children (and not ignoring anything). Optional items
     will be counted as well.
     """
     total = 1
-    for dep in self.deps:
-      total += dep.count()
+    for dep in self.iterFlatten (skipOptional = False):
+      total += 1
     return total
 
   def addCoordToExclude (self, dep2ignore):
-    """ Add a coordinate to ignore
+    """ Add a coordinate to ignore (see the note about shared dependencies
+    in add)
     """
-    self.exclusions.append (MavenCoord (dep2ignore))
+    self.exclusions.append (MavenCoordPool.getDefault ().get (dep2ignore))
     return
 
   def flatten (self, skipOptional = True):
     """ Returns a list of all children flattened. Please note that this method
     won't be removing duplicates.
     """
-    flat = []
-    for child in self.deps:
-      if skipOptional and child.optional:
-        continue
-
-      flat.append (child)
-      flat.extend (child.flatten())
-
-    return flat
+    return list (self.iterFlatten (skipOptional))
 
-  def resolve (self, scope = None, skipOptional = True):
-    """ Resolve dependencies by excluding all dependencies that should
-    be taking into account the exclusion rules in the tree.
+  def iterFlatten (self, skipOptional = True, breadthFirst = False):
+    """ Generator of all children (this dependency is not included) in
+    pre-order, or level by level if _breadthFirst_ is set. Please note that
+    duplicates are not removed, and that shared dependencies are returned as
+    they are, so they should not be modified (see find).
 
-    NOTE: it modifies the current tree of dependencies
+    Optional dependencies and all their children are skipped when
+    _skipOptional_ is set.
     """
-    if scope is None:
-      pass
-    elif isinstance (scope, basestring):
-      scope = set ([scope])
-    else:
-      scope = set (scope)
-
-    self._removeOptionalAndExclusionsInTree ({}, scope, skipOptional)
-
-    # resolve modules included more than once with different versions
-    winnerCoordFullIds = self._findWinnerCoordsInTree ()
-    self._removeNonWinnerDepsInTree (winnerCoordFullIds)
+    if breadthFirst:
+      queue = deque (self._deps)
+      while queue:
+        dep = queue.popleft ()
+        if skipOptional and dep.optional:
+          continue
 
-    self._removeDuplicatesInTree ( set() )
-    return self
+        yield dep
+        queue.extend (dep._deps)
+      return
 
-  def _removeDuplicatesInTree (self, itemsAdded):
-    newDeps = OrderedDict()
-    for dep in self.deps:
-      # don't add same item twice when resolving a tree
-      if dep.coord.full in itemsAdded:
+    stack = list (reversed (self._deps))
+    while stack:
+      dep = stack.pop ()
+      if skipOptional and dep.optional:
         continue
 
-      newDeps[dep.coord.name] = dep
-      itemsAdded.add (dep.coord.full)
-
-    for dep in newDeps.values():
-      dep._removeDuplicatesInTree (itemsAdded)
-
-    self.deps = newDeps.values()
+      yield dep
+      stack.extend (reversed (dep._deps))
     return
 
-  def _removeOptionalAndExclusionsInTree (self, itemsToExclude, scopeSet, skipOptional):
-    self.coord.resolve()
-
-    for exclusion in self.exclusions:
-      itemsToExclude[exclusion.name] = exclusion
+  def walk (self, skipOptional = False, breadthFirst = False):
+    """ Generator of (dep, depth, path) tuples for this dependency (depth 0)
+    and all its children, in pre-order or level by level if _breadthFirst_
+    is set.
 
-    newDeps = OrderedDict()
-    for dep in self.deps:
-      if scopeSet and (dep.coord.scope not in scopeSet):
-        continue
+    The path is a tuple with the indexes of the children to follow from this
+    dependency to reach dep (see MavenDeps.getWritableDep).
+    """
+    if breadthFirst:
+      pending = deque ([(self, 0, ())])
+      pop = pending.popleft
+    else:
+      pending = [(self, 0, ())]
+      pop = pending.pop
+
+    while pending:
+      (dep, depth, path) = pop ()
+      yield (dep, depth, path)
+
+      children = [
+        (child, depth + 1, path + (i,))
+        for i, child in enumerate (dep._deps)
+        if not (skipOptional and child.optional)
+      ]
+
+      if not breadthFirst:
+        children.reverse ()
+      pending.extend (children)
+    return
 
-      if skipOptional and dep.optional:
-        continue
+  def resolve (self, scope = None, skipOptional = True, report = None):
+    """ Resolve dependencies by excluding all dependencies that should
+    be taking into account the exclusion rules in the tree.
 
-      if dep.coord.name in itemsToExclude:
-        if dep.coord.isContained (itemsToExclude[dep.coord.name]):        
-          continue
+    When a MavenReport is given, every dependency found is recorded there
+    along with the reason it was placed, omitted or excluded.
 
-        # excusion pseudo-match?
-        # print dep.coord.id, "vs", itemsToExclude[dep.coord.name].id
-        continue
+    The whole resolution (scope filtering, optional dependencies, exclusions,
+    conflicts between siblings, mediation and removal of duplicates) is done
+    in a single traversal that mediates each group of siblings before going
+    down to their children, one after the other, so a dependency is placed
+    where it is found first in that order (the placement of the previous
+    four-pass resolution).
 
-      if dep.coord.name in newDeps:
-        dep = MavenDep.resolveDependencyConflict (dep, newDeps[dep.coord.name])
+    NOTE: it modifies this dependency, but children are never modified. The
+    children that are not affected by the resolution are kept as they are,
+    so resolved dependencies are shared by all trees that reach them (the
+    tree is actually a DAG).
+    """
+    if scope is None:
+      pass
+    elif isinstance (scope, basestring):
+      scope = set ([scope])
+    else:
+      scope = set (scope)
 
-      newDeps[dep.coord.name] = dep
+    resolved = self._resolved (scope, skipOptional, report)
 
-    # resolve children
-    for dep in newDeps.values():
-      # need to copy to not modify siblings with exclusions from sons
-      # of this dependency      
-      dep._removeOptionalAndExclusionsInTree (itemsToExclude.copy(), scopeSet, skipOptional)
-      
-    self.deps = newDeps.values()
+    self._changed ()
+    self.coord = resolved.coord
+    self._deps = resolved._deps
     self.exclusions = []
-    return 
-
-  def _removeNonWinnerDepsInTree (self, winnerCoordFullIds):
-    """ Remove all duplicates which have not
-    """
-    newDeps = []
-    for dep in self.deps:
-      if dep.coord.full in winnerCoordFullIds:
-        dep._removeNonWinnerDepsInTree (winnerCoordFullIds)
-        newDeps.append (dep)
-
-    self.deps = newDeps
-    return
+    return self
 
-  def _findWinnerCoordsInTree (self):
-    """ Finds which coordinates with duplicates are the ones that should
-    stay in the tree.
+  def _resolved (self, scopeSet, skipOptional, report = None):
+    """ Returns this dependency resolved, which is either this very same
+    object when the resolution does not change anything, or a copy of it.
 
-    Returns a set of strings with the full coordinates of the 
+    The tree is walked depth-first with an explicit stack of the levels
+    being resolved (see _mediateLevel).
     """
-    allCoords = [x.coord for x in self.flatten (skipOptional = False)]
-
-    winnerCoords = {}
-    for coord in allCoords:
-      if coord.name in winnerCoords:
-        winnerCoord = MavenCoord.resolveConflict (coord, winnerCoords[coord.name])
-        if winnerCoord.full != coord.full:
-          continue
-
-      winnerCoords[coord.name] = coord
-
-    return set([c.full for c in winnerCoords.values()])
-
+    entry = None
+    if report is not None:
+      entry = report.add (
+        self.coord.resolved (),
+        MavenReport.PLACED,
+        exclusions = self.exclusions
+      )
+
+    itemsAdded = set()
+    stack = [
+      self._mediateLevel (
+        MavenExclusions.EMPTY,
+        itemsAdded,
+        scopeSet,
+        skipOptional,
+        report,
+        entry
+      )
+    ]
+    while True:
+      (dep, exclusions, level, children, entries) = stack[-1]
+      if len (children) < len (level):
+        i = len (children)
+        stack.append (
+          level[i]._mediateLevel (
+            exclusions,
+            itemsAdded,
+            scopeSet,
+            skipOptional,
+            report,
+            entries and entries[i]
+          )
+        )
+        continue
 
-  def _resolve (self, itemsToExclude, itemsAdded, scopeSet, skipOptional):
-    """ Resolve dependencies by excluding items and selecting the proper
-    version in case there are "duplicates" for the same coord.name
+      stack.pop ()
+      if (
+        (not dep.exclusions) and
+        (dep.coord.scope != MavenCoord.SCOPE_DEFAULT) and
+        dep._isSameDeps (children)
+      ):
+        resolved = dep
+      else:
+        resolved = dep._withDeps (children)
+        resolved.coord = resolved.coord.resolved ()
+        resolved.exclusions = []
+
+      if not stack:
+        return resolved
+
+      stack[-1][3].append (resolved)
+
+  def _mediateLevel (
+    self,
+    exclusions,
+    itemsAdded,
+    scopeSet,
+    skipOptional,
+    report = None,
+    entry = None
+  ):
+    """ Selects which children of this dependency will be part of the
+    resolved tree, and returns a (dep, exclusions, level, children, entries)
+    tuple where _level_ is the list of children selected, _children_ an empty
+    list for their resolved counterparts and _entries_ their entries in given
+    report (or None).
+
+    _exclusions_ has the exclusions inherited from the ancestors (see
+    MavenExclusions) and _itemsAdded_ has the names of the dependencies already
+    placed in the resolved tree, which is updated with the selected ones.
     """
-    self.coord.resolve()
+    exclusions = exclusions.extend (self.exclusions)
 
-    for exclusion in self.exclusions:
-      itemsToExclude[exclusion.name] = exclusion
+    # mediate all children as a level before going down
+    level = []
+    levelIndex = {}
+    for dep in self._deps:
+      name = dep.coord.name
 
-    newDeps = OrderedDict()
-    for dep in self.deps:
       if scopeSet and (dep.coord.scope not in scopeSet):
         continue
 
       if skipOptional and dep.optional:
         continue
 
-      if dep.coord.name in itemsToExclude:
-        if dep.coord.isContained (itemsToExclude[dep.coord.name]):        
-          continue
-
-        # version conflict
-        # print dep.coord.id, "vs", itemsToExclude[dep.coord.name].id
+      if exclusions.excludes (dep.coord):
+        # any version is excluded, as well as wildcard matches (e.g: *:*)
+        if report is not None:
+          report.add (dep.coord, MavenReport.EXCLUDED, entry)
         continue
 
-      if dep.coord.name in newDeps:
-        dep = MavenDep.resolveDependencyConflict (dep, newDeps[dep.coord.name])
+      # already placed in a previous level or branch
+      if name in itemsAdded:
+        if report is not None:
+          report.add (dep.coord, MavenReport.OMITTED, entry)
+        continue
 
-      # don't add same item twice when resolving a tree
-      if dep.coord.full in itemsAdded:
+      if name in levelIndex:
+        # the conflict modifies the scope of the winner, work on copies
+        i = levelIndex[name]
+        (first, second) = (dep.clone(), level[i].clone())
+        level[i] = MavenDep.resolveDependencyConflict (first, second)
+        if report is not None:
+          loser = second if (level[i] is first) else first
+          report.add (loser.coord, MavenReport.CONFLICT, entry)
         continue
 
-      newDeps[dep.coord.name] = dep
-      itemsAdded.add (dep.coord.full)
+      levelIndex[name] = len (level)
+      level.append (dep)
+
+    itemsAdded.update (levelIndex)
+
+    entries = None
+    if report is not None:
+      entries = [
+        report.add (
+          dep.coord.resolved (),
+          MavenReport.PLACED,
+          entry,
+          dep.exclusions
+        )
+        for dep in level
+      ]
+    return (self, exclusions, level, [], entries)
+
+  def _withDeps (self, deps):
+    """ Returns a copy of this dependency with given children, which might
+    be shared with other dependencies from now on.
+    """
+    new = MavenDep (self.coord, self.optional)
+    new._deps = [dep.share () for dep in deps]
+    new.exclusions = list (self.exclusions)
+    new.templates = self.templates
+    new.unmanaged = self.unmanaged
+    return new
+
+  def _isSameDeps (self, deps):
+    """ Returns True if given list has the same children objects as this one
+    """
+    if len (deps) != len (self._deps):
+      return False
 
-    # resolve children
-    for dep in newDeps.values():
-      # need to copy to not modify siblings with exclusions from sons
-      # of this dependency      
-      dep._resolve (itemsToExclude.copy(), itemsAdded, scopeSet, skipOptional)
-      
-    self.deps = newDeps.values()
-    self.exclusions = []
-    return 
+    for (dep, ownDep) in zip (deps, self._deps):
+      if dep is not ownDep:
+        return False
+    return True
 
   @staticmethod
   def resolveDependencyConflict (dep1, dep2):
@@ -240,78 +539,217 @@ class MavenDep:
 
     It raises an exception if it cannot resolve the conflict
     """
-    cmpValue = vercmp.compare (dep1.coord.id, dep2.coord.id)
-    newScope = MavenCoord.resolveScopeConflict (dep1.coord.scope, dep2.coord.scope)
-
-    # same value? any of both will do
-    if cmpValue == 0:
-      dep1.coord.scope = newScope
-      return dep1
-
-    # dep1 > dep2
-    if cmpValue > 0:
-      if vercmp.satisfies (dep1.coord, dep2.coord):
-        dep1.coord.scope = newScope
-        return dep1
+    (coord, newScope) = MavenCoord.resolveDependencyConflict (
+      dep1.coord,
+      dep2.coord
+    )
 
-    # dep2 > dep1 or dep1 is higher and does not satisfies dep2
-    if vercmp.satisfies (dep2.coord, dep1.coord):
-      dep2.coord.scope = newScope
-      return dep2
+    winner = dep1 if (coord is dep1.coord) else dep2
+    winner.coord = winner.coord.withValues (scope = newScope)
+    return winner
 
-    raise Exception (
-      "Could not resolve conflict! '%s' vs '%s'" % (dep1.coord.id, dep2.coord.id)
-    )
-  
   def updateVersionsAndScope (self, depManagement):
     """ Update default or missing version numbers and default or missing
-    scopes with the right values inherited from given depManagement
+    scopes with the right values inherited from given depManagement, which
+    can be a MavenDep or an index of managed dependencies (see indexByName).
     """
-    assert isinstance (depManagement, MavenDep)
-
-    for dep in depManagement.deps:
-      if self.coord.name == dep.coord.name:
-        if not self.coord.version:
-          self.coord.version = dep.coord.version
+    if isinstance (depManagement, MavenDep):
+      managed = MavenDep.indexByName (depManagement._deps)
+    else:
+      managed = depManagement
+
+    self._changed ()
+    stack = [self]
+    while stack:
+      dep = stack.pop ()
+      dep._updateVersionAndScope (managed)
+      for i, child in enumerate (dep._deps):
+        if child._shared:
+          dep._deps[i] = child._updatedVersionsAndScope (managed)
+        else:
+          stack.append (child)
+    return
 
-        if self.coord.scope == MavenCoord.SCOPE_DEFAULT:
-          self.coord.scope = dep.coord.scope
+  @staticmethod
+  def indexByName (deps):
+    """ Returns a dictionary mapping each coord.name to the list of given
+    dependencies with that name (in the same order).
+    """
+    index = {}
+    for dep in deps:
+      index.setdefault (dep.coord.name, []).append (dep)
+    return index
+
+  def _updateVersionAndScope (self, managed):
+    """ Updates this dependency (but not its children) from the index of
+    managed dependencies.
+    """
+    for dep in managed.get (self.coord.name, ()):
+      if self.unmanaged is None:
+        self.unmanaged = (
+          self.coord.version,
+          self.coord.scope,
+          tuple (self.exclusions)
+        )
+
+      if not self.coord.version:
+        self.coord = self.coord.withValues (version = dep.coord.version)
+
+      if self.coord.scope == MavenCoord.SCOPE_DEFAULT:
+        self.coord = self.coord.withValues (scope = dep.coord.scope)
+
+      # applying the management again does not add them twice
+      for exclusion in dep.exclusions:
+        if exclusion not in self.exclusions:
+          self.exclusions.append (exclusion)
+    return
 
-        self.exclusions.extend (dep.exclusions)
-    
-    for dep in self.deps:
-      dep.updateVersionsAndScope (depManagement)
+  def _resetManagement (self):
+    """ Restores the version, scope and exclusions this dependency (but not
+    its children) had before the dependency management was applied
+    """
+    (version, scope, exclusions) = self.unmanaged
+    self.coord = self.coord.withValues (version = version, scope = scope)
+    self.exclusions = list (exclusions)
+    self.unmanaged = None
     return
 
+  def _updatedVersionsAndScope (self, managed):
+    """ Same as updateVersionsAndScope but returns a copy (only copying the
+    modified paths) instead of modifying this dependency.
+    """
+    def isChanged (dep):
+      for managedDep in managed.get (dep.coord.name, ()):
+        if (
+          (not dep.coord.version) or
+          (dep.coord.scope == MavenCoord.SCOPE_DEFAULT) or
+          any (e not in dep.exclusions for e in managedDep.exclusions)
+        ):
+          return True
+      return False
+
+    def update (dep):
+      dep._updateVersionAndScope (managed)
+      return
+
+    return self._rebuilt (isChanged, update)
 
   def __repr__ (self):
-    s = [self.coord.full]
+    s = []
+
+    # exclusions are written after all children, so they are stacked as
+    # pending lines before the children
+    stack = [(self, '')]
+    while stack:
+      (dep, indent) = stack.pop ()
+      if not isinstance (dep, MavenDep):
+        s.append (dep)
+        continue
+
+      s.append (indent + dep.coord.full)
 
-    for dep in self.deps:
-      s.append ('  ' + repr(dep).replace ('\n', '\n  '))
+      for exclusion in reversed (dep.exclusions):
+        stack.append ((indent + '  <<< ' + exclusion.full, None))
 
-    for dep in self.exclusions:
-      s.append ('  <<< ' + dep.full)
+      for child in reversed (dep._deps):
+        stack.append ((child, indent + '  '))
 
     return '\n'.join (s)
 
 
+def _reversedChildren (dep):
+  """ Returns a list of (index, child) tuples with the children of given
+  dependency in reverse order, to be pushed to a stack
+  """
+  return reversed (list (enumerate (dep._deps)))
+
+def _linkToPath (link):
+  """ Returns the path (a list of indexes of children, see getWritableDep)
+  of a link, which is an (index, parentLink) tuple or None for the root
+  """
+  path = []
+  while link is not None:
+    (i, link) = link
+    path.append (i)
+  path.reverse ()
+  return path
+
+class _MavenDepsChanges (object):
+  """ Number of changes made to the dependencies of a tree through their own
+  methods (see MavenDep._changed)
+  """
+  __slots__ = ('count', '__weakref__')
+
+  def __init__ (self):
+    self.count = 0
+    return
+
+  def __getstate__ (self):
+    # never a false value, otherwise __setstate__ is not called
+    return (self.count,)
+
+  def __setstate__ (self, state):
+    (self.count,) = state
+    return
+
 class MavenDeps:
   """ Class to manage maven dependencies, which are formed by
   groupId, artifactId and version.
 
-  This class manages dependencies as a tree of MavenDep
+  This class manages dependencies as a tree of MavenDep.
+
+  Lookups by coordinate (see find) and by name of the direct dependencies
+  (see getNameIndex, used to apply dependencyManagement) are done through
+  indexes that are built when needed and kept until the tree is changed
+  through this object or through the methods of its dependencies, even the
+  ones shared with other trees (changes made only to other trees never
+  invalidate them).
   """
   def __init__ (self, coord = None):
     """ Initializes the dependencies by using a root coordinate of the
     package that the dependencies are going to defined for
+
+    Dependencies can be changed through this object, through the methods of
+    MavenDep (e.g: add) or directly once returned by getWritableDep, but not
+    by changing the lists or attributes of other dependencies, since the
+    indexes used to look them up (see find) would not notice it.
     """
     self.root = MavenDep (coord)
+    self._generation = 0
+    self._indexes = {}
+
+    # changes made through the methods of the dependencies indexed
+    self._changes = _MavenDepsChanges ()
     return
 
+  def __getstate__ (self):
+    """ Indexes are neither copied nor pickled, they are built again when
+    needed, linking the dependencies copied to the new tree (see _getIndex)
+    """
+    state = dict (self.__dict__)
+    state['_indexes'] = {}
+    return state
+
   def getRoot (self):
     return self.root
 
+  def getWritableDep (self, path):
+    """ Returns the dependency found following given path, which is a list of
+    indexes from the root, copying the shared dependencies found in the path
+    so the dependency returned can be modified.
+    """
+    # the dependency returned can be modified at will
+    self._generation += 1
+    return self.root._ownPath (path)
+
+  def getGeneration (self):
+    """ Returns a number that changes every time dependencies are added,
+    merged, expanded, resolved or modified (see getWritableDep) through this
+    object, or through the methods of the dependencies found by its indexes
+    (see _getIndex).
+    """
+    return self._generation + self._changes.count
+
   def count (self):
     """ Returns the number of dependencies recursively, counting even if there
     are duplicates.
@@ -323,18 +761,108 @@ class MavenDeps:
     """ Adds a maven dependency by either specifying a coordinate string, a 
     MavenCoord or a MavenDep.
     """
+    indexes = self._getValidIndexes ()
+
+    self._generation += 1
     self.root.add (dep)
+
+    # added dependencies are the last ones in pre-order, so indexes can be
+    # updated instead of built again
+    if 'name' in indexes:
+      indexes['name'].setdefault (dep.coord.name, []).append (dep)
+
+    if 'id' in indexes:
+      self._indexDeps (dep, indexes['id'], (len (self.root._deps) - 1, None))
+
+    for name, index in indexes.items():
+      self._indexes[name] = (self.getGeneration (), index)
     return
 
   def find (self, coord):
-    """ Find a dependency based on the coord
+    """ Find a dependency based on the coord. The dependency returned can be
+    modified: the shared dependencies in its path are copied first (see
+    getWritableDep), which only happens the first time.
+    """
+    coordId = MavenCoordPool.getDefault ().get (coord).id
+    found = self._getIndex ('id', self._buildIdIndex).get (coordId)
+    if found is None:
+      return None
+
+    # copying the path changes the tree, so the indexes are built again
+    (dep, link) = found
+    return self.root._ownPath (_linkToPath (link))
+
+  def getNameIndex (self):
+    """ Returns a dictionary mapping the coord.name of the direct dependencies
+    to the list of direct dependencies with that name (see
+    MavenDep.indexByName), which is how dependencyManagement is looked up.
     """
-    return self.root.find (coord)
+    return self._getIndex (
+      'name',
+      lambda: MavenDep.indexByName (self.root._deps)
+    )
+
+  def _buildIdIndex (self):
+    """ Maps each coord.id to the first dependency with that id in pre-order
+    and the link to its path (see _linkToPath)
+    """
+    index = {}
+    self._indexDeps (self.root, index, None)
+    return index
+
+  def _indexDeps (self, dep, index, link):
+    """ Adds given dependency (found following _link_) and its children to
+    the id index, unless their coord.id is there already, and links them to
+    the changes of this tree (see MavenDep._changed)
+    """
+    # the same weak reference for all of them (see MavenDep._addChanges)
+    ref = weakref.ref (self._changes)
+    stack = [(dep, link)]
+    while stack:
+      (dep, link) = stack.pop ()
+      dep._addChanges (ref)
+      if dep.coord.id not in index:
+        index[dep.coord.id] = (dep, link)
+      stack.extend ((child, (i, link)) for i, child in _reversedChildren (dep))
+    return
+
+  def _getIndex (self, name, build):
+    """ Returns the index with given name, building it with _build_ when it
+    does not exist or the tree has changed since it was built.
+
+    Changes made through the methods of the dependencies indexed (the root
+    for all indexes) are counted as changes of this tree, so the indexes are
+    only invalidated by the changes of the tree they belong to.
+    """
+    self.root._addChanges (weakref.ref (self._changes))
+
+    key = self.getGeneration ()
+    cached = self._indexes.get (name)
+    if (cached is None) or (cached[0] != key):
+      cached = (key, build ())
+      self._indexes[name] = cached
+    return cached[1]
+
+  def _getValidIndexes (self):
+    """ Returns a dictionary with the indexes that are up to date
+    """
+    key = self.getGeneration ()
+    indexes = {}
+    for name, (indexKey, index) in self._indexes.items():
+      if indexKey == key:
+        indexes[name] = index
+    return indexes
 
   def clone (self):
-    """ Returns a clone of this object
+    """ Returns a clone of this object.
+
+    Both objects share the dependencies (see MavenDep) until any of them is
+    modified, at which point only the modified paths are copied.
     """
-    return copy.deepcopy (self)
+    new = MavenDeps ()
+    new.root = self.root.clone ()
+    new._generation = self.getGeneration ()
+    return new
 
   def merge (self, mavenDepsObj):
     """ Merge given mavenDepsObj dependencies into this one
@@ -342,32 +870,69 @@ class MavenDeps:
     if not isinstance (mavenDepsObj, MavenDeps):
       raise Exception ("Expecting MavenDeps object")
 
-    for obj in mavenDepsObj.root.deps:
-      self.add (copy.deepcopy (obj))
+    self._generation += 1
+    for obj in mavenDepsObj.root._deps:
+      self.add (obj.share ())
     return
 
   def expand (self, properties):
-    """ Expand internal variables
+    """ Expand internal variables (see MavenDep.expand)
     """
+    self._generation += 1
     self.root.expand (properties)
     return 
 
-  def resolve (self, scope = None, skipOptional = True):
+  @timed (MavenStats.RESOLVE)
+  def resolve (self, scope = None, skipOptional = True, report = None):
     """ Resolve dependencies by excluding all dependencies that should
     be taking into account the exclusion rules in the tree.
 
     NOTE: it modifies the current tree of dependencies
     """
-    self.root.resolve (scope, skipOptional)
+    self._generation += 1
+    self.root.resolve (scope, skipOptional, report)
     return self
 
   def updateVersionsAndScope (self, deps):
+    self._generation += 1
     if isinstance (deps, MavenDeps):
-      self.root.updateVersionsAndScope (deps.root)
+      self.root.updateVersionsAndScope (deps.getNameIndex ())
     else:
       self.root.updateVersionsAndScope (deps)
     return
 
+  def reapplyManagement (self, deps, names):
+    """ Applies the dependency management in _deps_ again (see
+    updateVersionsAndScope) to the dependencies with given names (coord.name)
+    it has been applied to, restoring first the version, scope and exclusions
+    they had before, so they get the values managed now.
+    """
+    paths = [
+      path for (dep, depth, path) in self.root.walk ()
+      if (dep.unmanaged is not None) and (dep.coord.name in names)
+    ]
+    if not paths:
+      return
+
+    managed = deps.getNameIndex ()
+    for path in paths:
+      dep = self.getWritableDep (path)
+      dep._resetManagement ()
+      dep._updateVersionAndScope (managed)
+    return
+
+  def iterFlattenDeps (self, skipOptional = True):
+    """ Generator of all dependencies in the same order as getFlattenDeps
+    """
+    return self.root.iterFlatten (skipOptional)
+
+  def iterFlattenCoords (self, skipOptional = True):
+    """ Generator of all dependencies as coordinates
+    """
+    for d in self.root.iterFlatten (skipOptional):
+      yield d.coord
+    return
+
   def getFlattenDeps (self, skipOptional = True):
     """ Returns a flatten list of all dependencies
     """
@@ -376,17 +941,17 @@ class MavenDeps:
   def getFlattenCoords (self, skipOptional = True):
     """ Returns a flatten list of all dependencies as coordinates
     """
-    return [d.coord for d in self.root.flatten (skipOptional)]
+    return [d.coord for d in self.root.iterFlatten (skipOptional)]
 
   def getFlattenCoordIds (self, skipOptional = True):
     """ Returns a flatten list of all dependencies as coordinates
     """
-    return [d.coord.id for d in self.root.flatten (skipOptional)]
+    return [d.coord.id for d in self.root.iterFlatten (skipOptional)]
   
   def getFlattenCoordFullIds (self, skipOptional = True):
     """ Returns a flatten list of all dependencies as coordinates
     """
-    return [d.coord.full for d in self.root.flatten (skipOptional)]
+    return [d.coord.full for d in self.root.iterFlatten (skipOptional)]
 
   def __repr__ (self):
     return repr(self.root)
\ No newline at end of file
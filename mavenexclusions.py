@@ -0,0 +1,95 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+from mavencoord import MavenCoord, MavenFrozenCoord
+
+class MavenExclusions:
+  """ Immutable set of exclusions inherited while walking down a tree of
+  dependencies.
+
+  Adding exclusions (see extend) returns a new set that holds the inherited
+  exclusions merged with the new ones, or the inherited set itself when
+  nothing new is excluded, so a dependency without exclusions reuses the set
+  of its parent as it is. Sets are never modified once built, so they are
+  shared by all the dependencies below the one adding them, and checking a
+  coordinate (see excludes) takes the same time no matter how many ancestors
+  added exclusions.
+
+  Exclusions are matched by name (the version is ignored, same as maven),
+  and wildcards ('*') are supported for the group, the artifact or both
+  (e.g: '*:*', 'org.group:*' or '*:artifact'). Empty groups or artifacts
+  are not wildcards.
+  """
+  WILDCARD = '*'
+
+  def __init__ (self, exclusions = (), parent = None):
+    self._all = False
+
+    names = set()
+    groups = set()
+    artifacts = set()
+    if parent is not None:
+      self._all = parent._all
+      names.update (parent._names)
+      groups.update (parent._groups)
+      artifacts.update (parent._artifacts)
+
+    for exclusion in exclusions:
+      if not isinstance (exclusion, (MavenCoord, MavenFrozenCoord)):
+        exclusion = MavenCoord (exclusion)
+
+      if exclusion.group == MavenExclusions.WILDCARD:
+        if exclusion.artifact == MavenExclusions.WILDCARD:
+          self._all = True
+        else:
+          artifacts.add (exclusion.artifact)
+      elif exclusion.artifact == MavenExclusions.WILDCARD:
+        groups.add (exclusion.group)
+      else:
+        names.add (exclusion.name)
+
+    self._names = frozenset (names)
+    self._groups = frozenset (groups)
+    self._artifacts = frozenset (artifacts)
+    return
+
+  def extend (self, exclusions):
+    """ Returns a set with the exclusions of this one plus the exclusions
+    given (a list of coordinates), or this same object if they exclude
+    nothing new.
+    """
+    if (not exclusions) or self._all:
+      return self
+
+    new = MavenExclusions (exclusions, self)
+    if new.getKey () == self.getKey ():
+      return self
+    return new
+
+  def excludes (self, coord):
+    """ Returns True if given coordinate is excluded
+
+    Example:
+      >>> MavenExclusions (['A:B']).excludes (MavenCoord ('A:B:1.0'))
+      True
+      >>> MavenExclusions (['A:*']).excludes (MavenCoord ('A:C:1.0'))
+      True
+    """
+    return (
+      self._all or
+      (coord.name in self._names) or
+      (coord.group in self._groups) or
+      (coord.artifact in self._artifacts)
+    )
+
+  def getKey (self):
+    """ Returns a hashable value, equal for sets that exclude the same
+    coordinates no matter how they were built
+    """
+    return (self._all, self._groups, self._artifacts, self._names)
+
+  def empty (self):
+    """ Returns True if nothing is excluded
+    """
+    return not (self._all or self._names or self._groups or self._artifacts)
+
+MavenExclusions.EMPTY = MavenExclusions ()
@@ -0,0 +1,327 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+from array import array
+
+from mavencoord import MavenCoord, MavenFrozenCoord, MavenCoordPool
+from mavendeps import MavenDep, MavenDeps
+from mavenexclusions import MavenExclusions
+
+class MavenGraph:
+  """ Compact representation of a graph of dependencies for very large
+  resolutions, as an alternative to a tree of MavenDep objects.
+
+  Coordinates (without scope), names and scopes are interned to integer ids
+  and each node of the graph is a position in a set of columns:
+
+    - nodeCoords, nodeScopes, nodeOptional: coordinate id, scope id and
+      optional flag of each node
+    - edgeStart, edges: children of each node in CSR form, where the
+      children of node i are edges[edgeStart[i]:edgeStart[i + 1]]
+    - exclusionStart, exclusions: coordinate ids excluded by each node,
+      also in CSR form
+
+  Node 0 is the root and nodes are numbered in pre-order. Dependencies
+  shared by several parents (see MavenDep.share) are stored once.
+  """
+  def __init__ (self):
+    self.coords = []
+    self.names = []
+    self.scopes = []
+    self.coordNames = array ('i')
+    self._coordIndex = {}
+    self._nameIndex = {}
+    self._scopeIndex = {}
+    self._scopedCoords = {}
+
+    self.nodeCoords = array ('i')
+    self.nodeScopes = array ('B')
+    self.nodeOptional = array ('B')
+    self.edgeStart = array ('i', [0])
+    self.edges = array ('i')
+    self.exclusionStart = array ('i', [0])
+    self.exclusions = array ('i')
+    return
+
+  def __len__ (self):
+    """ Returns the number of nodes (shared dependencies are counted once)
+    """
+    return len (self.nodeCoords)
+
+  def internCoord (self, coord):
+    """ Returns the id of given coordinate (the scope is not taken into
+    account), adding it if needed.
+    """
+    if not isinstance (coord, MavenFrozenCoord):
+      coord = MavenCoordPool.getDefault ().get (coord)
+
+    coordId = self._coordIndex.get (coord.id)
+    if coordId is None:
+      name = coord.name
+      nameId = self._nameIndex.get (name)
+      if nameId is None:
+        nameId = len (self.names)
+        self.names.append (name)
+        self._nameIndex[name] = nameId
+
+      coordId = len (self.coords)
+      self.coords.append (coord.withValues (scope = MavenCoord.SCOPE_DEFAULT))
+      self.coordNames.append (nameId)
+      self._coordIndex[coord.id] = coordId
+    return coordId
+
+  def internScope (self, scope):
+    """ Returns the id of given scope, adding it if needed
+    """
+    scopeId = self._scopeIndex.get (scope)
+    if scopeId is None:
+      scopeId = len (self.scopes)
+      self.scopes.append (scope)
+      self._scopeIndex[scope] = scopeId
+    return scopeId
+
+  def getCoord (self, node):
+    """ Returns the coordinate of given node (with its scope)
+    """
+    key = (self.nodeCoords[node], self.nodeScopes[node])
+    coord = self._scopedCoords.get (key)
+    if coord is None:
+      coord = self.coords[key[0]].withValues (scope = self.scopes[key[1]])
+      self._scopedCoords[key] = coord
+    return coord
+
+  def getChildren (self, node):
+    """ Returns the list of children of given node
+    """
+    return self.edges[self.edgeStart[node]:self.edgeStart[node + 1]]
+
+  def getExclusions (self, node):
+    """ Returns the list of coordinates excluded by given node
+    """
+    return [
+      self.coords[c]
+      for c in self.exclusions[self.exclusionStart[node]:self.exclusionStart[node + 1]]
+    ]
+
+  def iterFlatten (self, skipOptional = True, node = 0):
+    """ Generator of the children of given node in pre-order (see
+    MavenDep.iterFlatten)
+    """
+    edges = self.edges
+    edgeStart = self.edgeStart
+    optional = self.nodeOptional
+
+    stack = list (reversed (edges[edgeStart[node]:edgeStart[node + 1]]))
+    while stack:
+      node = stack.pop ()
+      if skipOptional and optional[node]:
+        continue
+
+      yield node
+      stack.extend (reversed (edges[edgeStart[node]:edgeStart[node + 1]]))
+    return
+
+  def getFlattenCoords (self, skipOptional = True):
+    """ Returns a flatten list of all dependencies as coordinates
+    """
+    return [self.getCoord (n) for n in self.iterFlatten (skipOptional)]
+
+  def getFlattenCoordFullIds (self, skipOptional = True):
+    """ Returns a flatten list of all dependencies as full coordinates
+    """
+    return [c.full for c in self.getFlattenCoords (skipOptional)]
+
+  def find (self, coord):
+    """ Returns the first node in pre-order with the same coordinate id
+    (root included) or None if there is no such node.
+    """
+    coordId = self._coordIndex.get (MavenCoordPool.getDefault ().get (coord).id)
+    if coordId is None:
+      return None
+
+    try:
+      # nodes are numbered in pre-order
+      return self.nodeCoords.index (coordId)
+    except ValueError:
+      return None
+
+  def resolve (self, scope = None, skipOptional = True):
+    """ Returns a new graph with the dependencies resolved, following the
+    same rules and order as MavenDep.resolve.
+    """
+    if scope is None:
+      scopeSet = None
+    elif isinstance (scope, basestring):
+      scopeSet = set ([scope])
+    else:
+      scopeSet = set (scope)
+
+    edges = self.edges
+    edgeStart = self.edgeStart
+    coordNames = self.coordNames
+    nodeCoords = self.nodeCoords
+    nodeScopes = self.nodeScopes
+
+    # placed nodes as (node, scope) and their placed children
+    placed = [(0, MavenCoord.resolveScope (self.scopes[nodeScopes[0]]))]
+    placedChildren = [[]]
+    namesAdded = set()
+
+    stack = [(0, MavenExclusions.EMPTY)]
+    while stack:
+      (current, exclusions) = stack.pop ()
+      (node, nodeScope) = placed[current]
+      exclusions = exclusions.extend (self.getExclusions (node))
+
+      # mediate all children as a level before going down
+      level = []
+      levelIndex = {}
+      for child in edges[edgeStart[node]:edgeStart[node + 1]]:
+        childScope = self.scopes[nodeScopes[child]]
+        if scopeSet and (childScope not in scopeSet):
+          continue
+
+        if skipOptional and self.nodeOptional[child]:
+          continue
+
+        nameId = coordNames[nodeCoords[child]]
+        if nameId in namesAdded:
+          continue
+
+        coord = self.coords[nodeCoords[child]]
+        if exclusions.excludes (coord):
+          continue
+
+        if nameId in levelIndex:
+          i = levelIndex[nameId]
+          (other, otherScope) = level[i]
+          (winner, newScope) = MavenCoord.resolveDependencyConflict (
+            coord.withValues (scope = childScope),
+            self.getCoord (other).withValues (scope = otherScope)
+          )
+          level[i] = (child if (winner.id == coord.id) else other, newScope)
+          continue
+
+        levelIndex[nameId] = len (level)
+        level.append ((child, childScope))
+
+      namesAdded.update (levelIndex)
+
+      pending = []
+      for (child, childScope) in level:
+        placedChildren[current].append (len (placed))
+        pending.append ((len (placed), exclusions))
+        placed.append ((child, MavenCoord.resolveScope (childScope)))
+        placedChildren.append ([])
+
+      # siblings are resolved in order
+      stack.extend (reversed (pending))
+
+    return self._fromPlaced (placed, placedChildren)
+
+  def _fromPlaced (self, placed, placedChildren):
+    """ Builds a new graph sharing the interned tables of this one from
+    the (node, scope) tuples placed by resolve, renumbering them in pre-order
+    """
+    new = MavenGraph ()
+    new.coords = self.coords
+    new.names = self.names
+    new.scopes = self.scopes
+    new.coordNames = self.coordNames
+    new._coordIndex = self._coordIndex
+    new._nameIndex = self._nameIndex
+    new._scopeIndex = self._scopeIndex
+    new._scopedCoords = self._scopedCoords
+
+    order = []
+    stack = [0]
+    while stack:
+      current = stack.pop ()
+      order.append (current)
+      stack.extend (reversed (placedChildren[current]))
+
+    newIndex = {}
+    for i, current in enumerate (order):
+      newIndex[current] = i
+
+    for current in order:
+      (node, scope) = placed[current]
+      new.nodeCoords.append (self.nodeCoords[node])
+      new.nodeScopes.append (new.internScope (scope))
+      new.nodeOptional.append (self.nodeOptional[node])
+      new.edges.extend ([newIndex[c] for c in placedChildren[current]])
+      new.edgeStart.append (len (new.edges))
+      new.exclusionStart.append (len (new.exclusions))
+    return new
+
+  @staticmethod
+  def fromDeps (deps):
+    """ Builds a graph from a MavenDeps (or MavenDep) object
+    """
+    root = deps.root if isinstance (deps, MavenDeps) else deps
+
+    # number nodes in pre-order, shared dependencies only once
+    graph = MavenGraph ()
+    nodes = []
+    index = {}
+    stack = [root]
+    while stack:
+      dep = stack.pop ()
+      if id (dep) in index:
+        continue
+
+      index[id (dep)] = len (nodes)
+      nodes.append (dep)
+      graph.nodeCoords.append (graph.internCoord (dep.coord))
+      graph.nodeScopes.append (graph.internScope (dep.coord.scope))
+      graph.nodeOptional.append (1 if dep.optional else 0)
+
+      for exclusion in dep.exclusions:
+        graph.exclusions.append (graph.internCoord (exclusion))
+      graph.exclusionStart.append (len (graph.exclusions))
+
+      stack.extend (reversed (dep.children))
+
+    for dep in nodes:
+      graph.edges.extend ([index[id (child)] for child in dep.children])
+      graph.edgeStart.append (len (graph.edges))
+    return graph
+
+  def toDeps (self):
+    """ Returns the graph as a MavenDeps object (dependencies shared by
+    several nodes are shared as well, see MavenDep.share)
+    """
+    shared = self._sharedNodes ()
+    built = {}
+    stack = [(0, False)]
+    while stack:
+      (node, visited) = stack.pop ()
+      if node in built:
+        continue
+
+      children = self.getChildren (node)
+      if not visited:
+        stack.append ((node, True))
+        stack.extend ([(c, False) for c in children if c not in built])
+        continue
+
+      dep = MavenDep (self.getCoord (node), self.nodeOptional[node] == 1)
+      dep.exclusions = self.getExclusions (node)
+      dep.deps = [built[c] for c in children]
+      if node in shared:
+        dep.share ()
+      built[node] = dep
+
+    deps = MavenDeps ()
+    deps.root = built[0]
+    return deps
+
+  def _sharedNodes (self):
+    """ Returns the set of nodes with more than one parent
+    """
+    seen = set()
+    shared = set()
+    for child in self.edges:
+      if child in seen:
+        shared.add (child)
+      seen.add (child)
+    return shared
@@ -5,6 +5,7 @@ from mavencoord import MavenCoord
 from maven import Maven
 from mavenprofile import MavenProfile
 from mavendeps import MavenDep, MavenDeps
+from mavenstats import MavenStats, byteCount, timed
 import requests
 import xmltodict
 import json
@@ -39,9 +40,14 @@ def parseFile (pomFile):
     return parseString (f.read())
   return None
 
+@timed (MavenStats.PARSE)
 def parseString (pomString):
   """ Parses a pom.xml string and returns a Maven object
   """
+  stats = MavenStats.getCurrent ()
+  if stats.enabled:
+    stats.count (MavenStats.PARSE, bytes = byteCount (pomString))
+
   maven = Maven()
 
   obj = xmltodict.parse (pomString)
@@ -151,7 +157,7 @@ def _parseProfiles (projectObj, mavenCoord):
   profiles = []
   for profileObj in allProfileObjs:
     profile = MavenProfile()
-    profile.activation = profileObj.get ('activation', {})
+    profile.setActivation (profileObj.get ('activation', {}))
     profile.deps = _parseDependencies (profileObj, mavenCoord)
     profile.depsManagement = _parseDependencyManagement (profileObj, mavenCoord)  
     profile.properties = _parseProperties (profileObj)
@@ -1,7 +1,11 @@
 #/usr/bin/env python
-# -*- coding: utf-8 -*- 
+# -*- coding: utf-8 -*-
+import os
+import platform
+
 from mavencoord import MavenCoord
 from mavendeps import MavenDeps
+import mavenproperties
 import mavenversioncmp as vercmp
 
 class MavenProfile:
@@ -12,38 +16,300 @@ class MavenProfile:
     self.deps = MavenDeps ()
     self.depsManagement = MavenDeps ()
     self.properties = {}
-    
+    self._compiledActivation = None
+
     # TODO: self.resources
     # TODO: self.testResources
     return
 
-  def isActive (self, properties = {}):
-    if self.activation.get ('activeByDefault', 'false').lower() == 'true':
+  def setActivation (self, activation):
+    """ Sets and compiles the activation rules of this profile, which is a
+    dictionary like the <activation> tag of the pom.xml
+    """
+    self.activation = activation if (activation is not None) else {}
+    self._compiledActivation = MavenActivation (self.activation)
+    return
+
+  def getActivation (self):
+    """ Returns the compiled activation rules (see MavenActivation)
+    """
+    # compile again if the activation dict has been replaced
+    compiled = self._compiledActivation
+    if (compiled is None) or (compiled.source is not self.activation):
+      self.setActivation (self.activation)
+    return self._compiledActivation
+
+  def isActive (self, properties = {}, environment = None):
+    """ Returns True if the profile is active for given properties and
+    environment (see MavenEnvironment)
+    """
+    return self.getActivation ().isActive (properties, environment)
+
+
+class MavenEnvironment:
+  """ Environment used to evaluate os and file activation rules of profiles.
+
+  By default it describes the machine we are running on, but any of the
+  values can be injected in order to evaluate profiles for a different one.
+  Values follow the same conventions as maven (e.g: os family is 'unix',
+  'windows' or 'mac').
+  """
+  _default = None
+
+  def __init__ (
+    self,
+    osName = None,
+    osFamily = None,
+    osArch = None,
+    osVersion = None,
+    fileExists = None
+  ):
+    system = platform.system ().lower ()
+
+    if osName is None:
+      osName = 'mac os x' if (system == 'darwin') else system
+
+    if osFamily is None:
+      if os.name == 'nt':
+        osFamily = 'windows'
+      elif system == 'darwin':
+        osFamily = 'mac'
+      else:
+        osFamily = 'unix'
+
+    if osArch is None:
+      osArch = platform.machine ().lower ()
+      osArch = 'amd64' if (osArch == 'x86_64') else osArch
+
+    if osVersion is None:
+      osVersion = platform.release ().lower ()
+
+    self.osName = osName.lower ()
+    self.osFamily = osFamily.lower ()
+    self.osArch = osArch.lower ()
+    self.osVersion = osVersion.lower ()
+    self.fileExists = fileExists if fileExists else os.path.exists
+    return
+
+  def isFamily (self, family):
+    """ Returns True if the environment belongs to given os family
+    """
+    family = family.lower ()
+    if family == self.osFamily:
+      return True
+
+    # mac is a unix as well for maven
+    return (family == 'unix') and (self.osFamily == 'mac')
+
+  @staticmethod
+  def getDefault ():
+    """ Returns the environment of the machine we are running on
+    """
+    if MavenEnvironment._default is None:
+      MavenEnvironment._default = MavenEnvironment ()
+    return MavenEnvironment._default
+
+
+class MavenActivation:
+  """ Activation rules of a profile compiled to a list of conditions.
+
+  A profile is active when it is active by default or when all of its
+  conditions are met. Results are memoised per distinct activation context,
+  which is formed by the environment and the values of the properties that
+  the conditions read, except for file conditions, which are checked every
+  time since files can be created or deleted at any moment.
+  """
+  def __init__ (self, activation = None):
+    self.source = activation
+    if activation is None:
+      activation = {}
+
+    activeByDefault = _text (activation.get ('activeByDefault')) or 'false'
+    self.activeByDefault = (activeByDefault.lower () == 'true')
+
+    self.conditions = []
+    if activation.get ('jdk') is not None:
+      self.conditions.append (_JdkCondition (_text (activation['jdk'])))
+
+    if activation.get ('property') is not None:
+      self.conditions.append (_PropertyCondition (activation['property']))
+
+    if activation.get ('os') is not None:
+      self.conditions.append (_OsCondition (activation['os']))
+
+    if activation.get ('file') is not None:
+      self.conditions.append (_FileCondition (activation['file']))
+
+    self._memoised = [c for c in self.conditions if c.memoised]
+    self._unmemoised = [c for c in self.conditions if not c.memoised]
+
+    names = set()
+    for condition in self._memoised:
+      names.update (condition.properties)
+    self._properties = tuple (sorted (names))
+    self._cache = {}
+    return
+
+  def isActive (self, properties = {}, environment = None):
+    """ Returns True if the activation rules are met for given properties
+    and environment (see MavenEnvironment)
+    """
+    if self.activeByDefault:
       return True
-    
-    if ('jdk' in self.activation) and ('jdk' in properties):
-      jdkActivation = self.activation['jdk']
 
-      # if a specific version is specified, it should match exactly (e.g: 1.8)
-      if len(jdkActivation) == len(jdkActivation.strip('[](),')):
-        return (properties['jdk'].lower().strip() == jdkActivation.lower().strip())
+    if not self.conditions:
+      return False
+
+    if environment is None:
+      environment = MavenEnvironment.getDefault ()
+
+    key = (environment, tuple ([properties.get (n) for n in self._properties]))
+    result = self._cache.get (key)
+    if result is None:
+      result = True
+      for condition in self._memoised:
+        if not condition.matches (properties, environment):
+          result = False
+          break
+      self._cache[key] = result
+
+    if not result:
+      return False
+
+    for condition in self._unmemoised:
+      if not condition.matches (properties, environment):
+        return False
+
+    return True
 
-      # if a range is specified, then compare accordingly (e.g: [1.8,1.9] )
-      return vercmp.satisfies (properties['jdk'], jdkActivation)
 
-    # is it avaliable as a property?
-    if ('property' in self.activation):
-      name = self.activation.get('property', {}).get ('name', '')
-      if name in properties:
-        value = self.activation.get('property', {}).get ('value', '')
-        if value is None:
-          value = ''
-        
-        # NOTE: there are several scenarios in order to expand properties for
-        #       comparison, the simplest is the one implemented
-        if properties.get(name, '').strip() == value.strip():
-          return True
+def _text (value):
+  """ Returns the stripped text of an xml value (None when empty)
+  """
+  if value is None:
+    return None
+  value = value.strip ()
+  return value if value else None
+
+def _negated (value):
+  """ Splits a value like '!value' into ('value', True)
+  """
+  if value and value.startswith ('!'):
+    return (value[1:].strip (), True)
+  return (value, False)
+
+
+class _JdkCondition:
+  """ <jdk>1.8</jdk>, <jdk>!1.8</jdk> or <jdk>[1.8,1.9)</jdk>
+  """
+  memoised = True
+
+  def __init__ (self, jdk):
+    (jdk, self.negated) = _negated (jdk or '')
+    self.jdk = jdk.lower ()
+    self.isRange = (len (jdk) != len (jdk.strip ('[](),')))
+    self.properties = ('jdk',)
+    return
+
+  def matches (self, properties, environment):
+    jdk = properties.get ('jdk')
+    if jdk is None:
+      return False
+
+    # if a specific version is specified, it should match exactly (e.g: 1.8)
+    # if a range is specified, then compare accordingly (e.g: [1.8,1.9] )
+    if self.isRange:
+      result = vercmp.satisfies (jdk, self.jdk)
+    else:
+      result = (jdk.lower ().strip () == self.jdk)
+
+    return result != self.negated
+
+
+class _PropertyCondition:
+  """ <property> with a name (or !name to check it is missing) and an
+  optional value (or !value to check the value is different)
+  """
+  memoised = True
+
+  def __init__ (self, propertyObj):
+    (self.name, self.missing) = _negated (_text (propertyObj.get ('name')) or '')
+    (self.value, self.negated) = _negated (_text (propertyObj.get ('value')))
+    self.properties = (self.name,)
+    return
+
+  def matches (self, properties, environment):
+    value = properties.get (self.name)
+
+    if self.missing:
+      return value is None
+
+    if value is None:
+      return False
+
+    if self.value is None:
+      return True
+
+    return (value.strip () == self.value) != self.negated
+
+
+class _OsCondition:
+  """ <os> with name, family, arch and version (all of them can be negated)
+  """
+  memoised = True
+
+  def __init__ (self, osObj):
+    self.rules = []
+    for key in ('name', 'family', 'arch', 'version'):
+      (value, negated) = _negated (_text (osObj.get (key)))
+      if value is not None:
+        self.rules.append ((key, value.lower (), negated))
+    self.properties = ()
+    return
+
+  def matches (self, properties, environment):
+    for (key, value, negated) in self.rules:
+      if key == 'family':
+        result = environment.isFamily (value)
+      elif key == 'name':
+        result = (environment.osName == value)
+      elif key == 'arch':
+        result = (environment.osArch == value)
+      else:
+        result = (environment.osVersion == value)
+
+      if result == negated:
+        return False
+
+    return True
+
+
+class _FileCondition:
+  """ <file> with <exists> and/or <missing> paths (paths can reference
+  properties)
+  """
+  # files can be created or deleted at any time
+  memoised = False
+
+  def __init__ (self, fileObj):
+    self.exists = _text (fileObj.get ('exists'))
+    self.missing = _text (fileObj.get ('missing'))
+
+    names = set()
+    for path in (self.exists, self.missing):
+      names.update (mavenproperties.getReferences (path))
+    self.properties = tuple (names)
+    return
+
+  def matches (self, properties, environment):
+    interpolator = mavenproperties.MavenInterpolator (properties)
 
-    return False
+    if self.exists is not None:
+      if not environment.fileExists (interpolator.interpolate (self.exists)):
+        return False
 
+    if self.missing is not None:
+      if environment.fileExists (interpolator.interpolate (self.missing)):
+        return False
 
+    return True
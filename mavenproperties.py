@@ -0,0 +1,296 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Property interpolation helpers.
+#
+# Properties are resolved by building the reference graph between them once
+# and then resolving each property after the properties it references
+# (topological order), so every value is interpolated only once.
+#
+import re
+
+# matches innermost references first, so '${a.${b}}' matches '${b}'
+_PROPERTY_REGEX = re.compile (r'\$\{([^${}]+)\}')
+
+# matches values with nested references (e.g: '${a.${b}}')
+_COMPOSED_REGEX = re.compile (r'\$\{[^}]*\$\{')
+
+def getReferences (value):
+  """ Returns the list of property names referenced in given value
+
+  Example:
+    >>> getReferences ('${a}-${b}')
+    ['a', 'b']
+  """
+  if not isinstance (value, basestring) or (value.find ('${') < 0):
+    return []
+  return _PROPERTY_REGEX.findall (value)
+
+def getResolvedReferences (value, properties):
+  """ Returns the set of property names referenced in given value once it is
+  expanded with given dictionary of expanded properties, including the
+  references composed while expanding it.
+
+  Example:
+    >>> getResolvedReferences ('${a.${b}}', { 'b' : 'x' })
+    set(['a.x', 'b'])
+  """
+  refs = set()
+  if not isinstance (value, basestring):
+    return refs
+
+  def _lookup (m):
+    refs.add (m.group (1))
+    return properties.get (m.group (1), m.group (0))
+
+  while True:
+    newValue = _PROPERTY_REGEX.sub (_lookup, value)
+    if newValue == value:
+      return refs
+    value = newValue
+
+  return refs
+
+def expandProperties (properties):
+  """ Returns a new dictionary with the values of all given properties
+  expanded, so that no value references any other known property.
+
+  References to unknown properties are kept as they are (e.g: '${unknown}').
+
+  It raises an exception if properties reference each other in a cycle.
+  """
+  resolved = {}
+  inProgress = set()
+
+  for name in properties:
+    if name not in resolved:
+      _resolveProperty (name, properties, resolved, inProgress)
+
+  return resolved
+
+def _resolveProperty (name, properties, resolved, inProgress):
+  """ Resolves given property and all properties it depends on, storing the
+  expanded values in _resolved_.
+
+  The graph is walked with an explicit stack so deep reference chains do not
+  hit the recursion limit. Properties in _inProgress_ are the ones being
+  resolved at the moment, finding one of them again means there is a cycle.
+  """
+  stack = [name]
+  inProgress.add (name)
+
+  while stack:
+    current = stack[-1]
+    value = properties[current]
+
+    pending = None
+    for ref in getReferences (value):
+      if (ref not in properties) or (ref in resolved):
+        continue
+
+      if ref in inProgress:
+        _raiseCycle (stack, ref)
+
+      pending = ref
+      break
+
+    if pending is not None:
+      stack.append (pending)
+      inProgress.add (pending)
+      continue
+
+    resolved[current] = _interpolate (value, properties, resolved, inProgress)
+    stack.pop ()
+    inProgress.discard (current)
+
+  return resolved[name]
+
+def _interpolate (value, properties, resolved, inProgress):
+  """ Replaces all references in _value_ by the already resolved values.
+
+  The substitution might compose new references (e.g: '${a.${b}}' becomes
+  '${a.x}'), in which case those are resolved as well.
+  """
+  def _lookup (m):
+    return resolved.get (m.group (1), m.group (0))
+
+  while True:
+    newValue = _PROPERTY_REGEX.sub (_lookup, value)
+    if newValue == value:
+      return value
+
+    value = newValue
+
+    # resolve references composed by the previous substitution
+    for ref in getReferences (value):
+      if (ref in properties) and (ref not in resolved):
+        if ref in inProgress:
+          _raiseCycle (sorted (inProgress), ref)
+        _resolveProperty (ref, properties, resolved, inProgress)
+
+  return value
+
+def _raiseCycle (names, ref):
+  """ Raises an exception describing the cycle found while resolving _ref_
+  """
+  if ref in names:
+    names = names[names.index (ref):]
+
+  raise Exception (
+    "Cyclic property reference found: %s" % ' -> '.join (list (names) + [ref])
+  )
+
+class MavenInterpolator:
+  """ Compiled interpolator that replaces ${...} references in strings using
+  a dictionary of already expanded properties (see expandProperties).
+
+  Each string is interpolated with a single regex pass and strings without
+  references are returned as they are. Results are memoised, since the
+  same templates (e.g: '${project.version}') are found all over a tree.
+  """
+  def __init__ (self, properties):
+    self._properties = properties
+    self._cache = {}
+    return
+
+  @staticmethod
+  def create (properties):
+    """ Returns given object if it is already an interpolator, otherwise
+    a new interpolator for the dictionary of properties given.
+    """
+    if isinstance (properties, MavenInterpolator):
+      return properties
+    return MavenInterpolator (properties)
+
+  def interpolate (self, value):
+    """ Returns _value_ with all known references replaced
+    """
+    if value.find ('${') < 0:
+      return value
+
+    result = self._cache.get (value)
+    if result is None:
+      result = _PROPERTY_REGEX.sub (self._lookup, value)
+      self._cache[value] = result
+
+    return result
+
+  def _lookup (self, m):
+    return self._properties.get (m.group (1), m.group (0))
+
+class MavenPropertyGraph:
+  """ Keeps the raw (unexpanded) properties, their expanded values and a
+  reverse index from each property name to the properties referencing it.
+
+  Updating a few properties only re-expands the properties affected by the
+  change instead of the whole set of properties.
+
+  Properties with nested references (e.g: '${a.${b}}') depend on the names
+  their references are composed into (e.g: 'a.x' when b is 'x'), which are
+  found again every time they are expanded.
+  """
+  def __init__ (self, properties):
+    self._raw = {}
+    self._references = {}
+    self._dependents = {}
+    for name, value in properties.items():
+      self._setRaw (name, value)
+
+    self.expanded = expandProperties (self._raw)
+    self._linkComposed (self._raw)
+    return
+
+  def clone (self):
+    """ Returns an independent copy of this graph
+    """
+    new = MavenPropertyGraph ({})
+    new._raw = dict (self._raw)
+    new._references = dict (self._references)
+    new.expanded = dict (self.expanded)
+    for name, dependents in self._dependents.items():
+      new._dependents[name] = set (dependents)
+    return new
+
+  def getDependents (self, name):
+    """ Returns the set of properties that reference given property directly
+    (or through nested references)
+    """
+    return self._dependents.get (name, set())
+
+  def update (self, properties):
+    """ Updates the graph with the current values of _properties_, which is
+    expected to be a dictionary with the expanded values returned by a
+    previous expansion where some values have been added, modified or removed.
+
+    Returns the set of property names whose expanded value has changed.
+    """
+    modified = set()
+    for name, value in properties.items():
+      if (name not in self.expanded) or (self.expanded[name] != value):
+        self._setRaw (name, value)
+        modified.add (name)
+
+    for name in self.expanded:
+      if name not in properties:
+        self._setRaw (name, None)
+        modified.add (name)
+
+    if not modified:
+      return set()
+
+    # all properties referencing modified ones, directly or not
+    affected = set (modified)
+    pending = list (modified)
+    while pending:
+      for dependent in self._dependents.get (pending.pop(), ()):
+        if dependent not in affected:
+          affected.add (dependent)
+          pending.append (dependent)
+
+    previous = {}
+    for name in affected:
+      previous[name] = self.expanded.pop (name, None)
+
+    inProgress = set()
+    for name in affected:
+      if (name in self._raw) and (name not in self.expanded):
+        _resolveProperty (name, self._raw, self.expanded, inProgress)
+
+    self._linkComposed (affected)
+
+    return set ([
+      name for name in affected if previous[name] != self.expanded.get (name)
+    ])
+
+  def _setRaw (self, name, value):
+    """ Sets the raw value of a property (None removes it) keeping the
+    reverse index of dependents up to date.
+    """
+    if value is None:
+      self._raw.pop (name, None)
+    else:
+      self._raw[name] = value
+
+    self._setReferences (name, getReferences (value))
+    return
+
+  def _linkComposed (self, names):
+    """ Updates the references of the properties with given names whose raw
+    values have nested references, with the names they are composed into
+    by their current expansion (see getResolvedReferences).
+    """
+    for name in names:
+      value = self._raw.get (name)
+      if (value is not None) and _COMPOSED_REGEX.search (value):
+        self._setReferences (name, getResolvedReferences (value, self.expanded))
+    return
+
+  def _setReferences (self, name, refs):
+    for ref in self._references.pop (name, ()):
+      self._dependents.get (ref, set()).discard (name)
+
+    if refs:
+      self._references[name] = refs
+      for ref in refs:
+        self._dependents.setdefault (ref, set()).add (name)
+    return
@@ -1,22 +1,46 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*- 
+import itertools
 import os
 import re
 import requests
 import shutil
+import tempfile
+import threading
 import xmltodict
 
 from maven import Maven
 from mavencoord import MavenCoord
+from mavendeps import MavenDep, MavenDeps
+from mavenexclusions import MavenExclusions
+from mavenreport import MavenWarning
+from mavenstats import MavenStats, activated, byteCount, timed
 from mavenversiondb import MavenVersionDb
 import mavenversioncmp as mavenvercmp
 import mavenparser
 
 class MavenRepo:
   """ Manages the dependencies and downloads of a maven repository
+
+  A repository can be shared by several threads, downloads of the same
+  files are done once and the version DB is shared as well (see
+  MavenVersionDb).
+
+  Each repository collects its own stats (see stats), which include the
+  parsing, expansion and resolution done by its methods.
   """
   OFFICIAL_REPO_URL = 'https://repo.maven.apache.org/maven2/'
 
+  # scopes of the dependencies included in each classpath
+  CLASSPATH_SCOPES = {
+    'compile' : ['compile', 'provided', 'system'],
+    'runtime' : ['compile', 'runtime'],
+    'test'    : ['compile', 'provided', 'runtime', 'system', 'test'],
+  }
+
+  # number of locks shared by all the URLs downloaded (see _lockFor)
+  LOCK_STRIPES = 64
+
   def __init__ (
     self,
     url = OFFICIAL_REPO_URL,
@@ -26,12 +50,21 @@ class MavenRepo:
     self._cacheDir = cacheDir
     self._repoUrl = url
     self._versionDb = MavenVersionDb ()
-    self._scheduledDownloads = {}
     self._jdkVersion = Maven.DEFAULT_JDK_VERSION
+    self._environment = None
+    self._verbose = False
+    self._warnings = []
+    self._warningsLock = threading.Lock ()
+    self._metadata = {}
+    self._locks = [threading.Lock () for i in range (MavenRepo.LOCK_STRIPES)]
+    self._stats = MavenStats ()
 
     if isinstance (versionDb, basestring):
-      self._versionDb = MavenVersionDb()
-      self._versionDb.parseFile (versionDb)
+      # the indexed copy next to it is only parsed again when it changes
+      self._versionDb = MavenVersionDb.fromFile (
+        versionDb,
+        versionDb + MavenVersionDb.INDEX_EXTENSION
+      )
 
     elif isinstance (versionDb, MavenVersionDb):
       self._versionDb = versionDb
@@ -50,6 +83,66 @@ class MavenRepo:
     self._jdkVersion = jdkVersion
     return
 
+  def setEnvironment (self, environment):
+    """ Sets the MavenEnvironment used to evaluate os and file activation
+    rules of profiles when resolving maven objects (by default the current
+    machine).
+    """
+    self._environment = environment
+    return
+
+  def setVerbose (self, verbose = True):
+    """ Prints the warnings found while fetching dependencies as well as
+    recording them (see getWarnings), which is not done by default
+    """
+    self._verbose = verbose
+    return
+
+  def getWarnings (self, kind = None):
+    """ Returns the list of warnings found while fetching dependencies (see
+    MavenWarning), all of them or only the ones of given kind
+    """
+    with self._warningsLock:
+      return [w for w in self._warnings if (kind is None) or (w.kind == kind)]
+
+  def _warn (self, kind, coord, expected, message):
+    warning = MavenWarning (kind, coord, expected, message)
+    with self._warningsLock:
+      self._warnings.append (warning)
+
+    if self._verbose:
+      print (str (warning))
+    return
+
+  def stats (self):
+    """ Returns a snapshot of the timers and counters of each phase of the
+    resolutions (see MavenStats.snapshot), which are only collected while
+    enabled (see enableStats).
+
+    Stats belong to this repository: they do not include the work done by
+    other repositories or outside the methods of this one.
+    """
+    return self._stats.snapshot ()
+
+  def resetStats (self):
+    """ Clears the stats collected so far (see stats)
+    """
+    self._stats.reset ()
+    return
+
+  def enableStats (self, enabled = True):
+    """ Enables or disables collecting stats (see stats)
+    """
+    self._stats.enable (enabled)
+    return
+
+  def _lockFor (self, key):
+    """ Returns the lock for given key (e.g: an URL). Keys are spread
+    among LOCK_STRIPES locks, so threads working with different keys rarely
+    wait for each other.
+    """
+    return self._locks[hash (key) % len (self._locks)]
+
   def cleanCache (self):
     """ Cleans the complete cache directory. Please keep in mind that this
     method is not thread safe.
@@ -90,40 +183,106 @@ class MavenRepo:
     """
     return self.getBaseUrlFor (coord) + '.pom'
 
+  @activated
   def resolveCoord (self, coord):
     """ Resolve coordinate so it has group, artifact and version numbers
 
+    Coordinates without version take the one from the version DB or the
+    latest release of the repository, and coordinates with a version range
+    (e.g: '[1.2,2.0)') take the version from the version DB if it is in the
+    range, or the highest version of the repository in the range.
+
     Returns a valid MavenCoord object or None if it could not figure out
     a valid version.
     """
     coord = MavenCoord (coord)
-    if coord.version:
+    if coord.version and (not mavenvercmp.isRange (coord.version)):
       return coord
       
     newCoord = self._versionDb.find (coord)
     if newCoord:
-      return newCoord
+      if (not coord.version) or mavenvercmp.satisfies (newCoord.version, coord.version):
+        return newCoord
 
-    # finally, let's download latest version from metadata file
-    metadataUrl = self.getMetadataUrlFor (coord)
-    metadataString = self._download2string (metadataUrl)
-    if not metadataString:
-      # raise Exception ("Cannot find out the coord version for: %s" % coord.id)
-      return None
+    # finally, let's take the version from the metadata file
+    (lastReleaseVersion, versions, keys) = self._getMetadata (coord)
 
-    obj = xmltodict.parse (metadataString)
+    if coord.version:
+      versions = mavenvercmp.getRange (coord.version).filter (versions, keys)
+      if not versions:
+        return None
 
-    # get latest release version
-    metadata = obj.get ('metadata', {})    
-    versioning = metadata.get ('versioning', {})
-    lastReleaseVersion = versioning.get ('release', None)
+      coord.version = versions[-1]
+      return coord
 
     if not lastReleaseVersion:
+      # raise Exception ("Cannot find out the coord version for: %s" % coord.id)
       return None
 
     coord.version = lastReleaseVersion
     return coord       
 
+  def _resolveRange (self, coord, sources = None):
+    """ Returns given dependency coordinate (a MavenFrozenCoord) with the
+    version its range resolves to (see resolveCoord), or the same object
+    when it has no range or it cannot be resolved.
+
+    The ids of the coordinate and the one it resolves to are added to
+    _sources_ (see _fetchWithAncestors).
+    """
+    if not (coord.version and mavenvercmp.isRange (coord.version)):
+      return coord
+
+    resolvedCoord = self.resolveCoord (coord)
+    if sources is not None:
+      sources[coord.id] = resolvedCoord.id if resolvedCoord else None
+
+    if not resolvedCoord:
+      return coord
+    return coord.withValues (version = resolvedCoord.version)
+
+  @activated
+  def getVersionsFor (self, coord):
+    """ Returns a (release, versions) tuple with the latest release and the
+    list of all versions (sorted, see mavenversioncmp.VersionKey) of given
+    coordinate found in the repository metadata, which is downloaded and
+    parsed once for each artifact.
+    """
+    return self._getMetadata (coord)[:2]
+
+  def _getMetadata (self, coord):
+    """ Returns a (release, versions, keys) tuple as getVersionsFor, where
+    _keys_ are the canonical versions (see mavenversioncmp.getCanonical) of
+    _versions_, so ranges are located by bisection (see VersionRange.filter)
+    """
+    coord = MavenCoord (coord)
+    metadata = self._metadata.get (coord.name)
+    if metadata is None:
+      release = None
+      versions = []
+
+      metadataString = self._download2string (self.getMetadataUrlFor (coord))
+      if metadataString:
+        obj = xmltodict.parse (metadataString)
+
+        metadata = obj.get ('metadata') or {}
+        versioning = metadata.get ('versioning') or {}
+        release = versioning.get ('release', None)
+
+        versions = (versioning.get ('versions') or {}).get ('version') or []
+        if isinstance (versions, basestring):
+          versions = [versions]
+
+        versions = sorted (versions, key = mavenvercmp.VersionKey)
+
+      keys = [mavenvercmp.getCanonical (v) for v in versions]
+
+      # keep the first one when several threads parse the same metadata
+      metadata = self._metadata.setdefault (coord.name, (release, versions, keys))
+
+    return metadata
+
+  @activated
   def fetchOne (self, coord):
     """ Fetch maven file from coordinate
     """
@@ -137,16 +296,25 @@ class MavenRepo:
     
     return None
 
+  @activated
   def fetchWithAncestors (self, coord):
     """ Fetch maven file from coordinate
     """
-    maven = self.fetchOne (coord)
+    return self._fetchWithAncestors (coord, {})
+
+  def _fetchWithAncestors (self, coord, sources):
+    """ Fetch maven file from coordinate merged with its ancestors.
+
+    The id of each coordinate fetched is added to sources along the id of
+    the coordinate it resolved to (or None).
+    """
+    maven = self._fetchSource (coord, sources)
     if not maven:
       return None
 
     parentCoord = maven.parent
     while parentCoord and (not parentCoord.empty()):
-      mavenParent = self.fetchOne (parentCoord)
+      mavenParent = self._fetchSource (parentCoord, sources)
       if (not mavenParent):
         break
 
@@ -156,22 +324,197 @@ class MavenRepo:
    
     return maven
 
-  def fetchResolvedTree (self, coord, scope):
+  def _fetchSource (self, coord, sources):
+    coord = MavenCoord (coord)
+    resolvedCoord = self.resolveCoord (coord)
+    sources[coord.id] = resolvedCoord.id if resolvedCoord else None
+    if not resolvedCoord:
+      return None
+    return self.fetchOne (resolvedCoord)
+
+  @activated
+  def fetchResolvedTree (self, coord, scope, resolution = None, report = None):
     """ Recursively gets all the dependencies for given POM Coordinate
+
+    When a MavenResolution is given, it keeps the state of the resolution
+    so that resolving again after editing some POM files (see
+    MavenResolution.invalidate) or the version DB only fetches and mediates
+    again the subtrees affected by the changes.
+
+    When a MavenReport is given, every resolution done while fetching is
+    recorded there (see Maven.resolve): the one of each POM file fetched,
+    with paths starting at that POM file, and the final one of the whole
+    tree, which is the one placing the dependencies returned (see
+    MavenReport.getPlaced). Subtrees reused from a MavenResolution are not
+    resolved again, so only the final resolution records them.
     """
     assert isinstance (scope, basestring)
+    return self._fetchResolvedTree (coord, scope, {}, resolution, report)
 
+  def _fetchResolvedTree (
+    self,
+    coord,
+    scope,
+    downloadedItems,
+    resolution = None,
+    report = None
+  ):
+    """ Same as fetchResolvedTree, with the maven objects already fetched
+    given in downloadedItems (see _fetchTreeDeps), so several trees can
+    share them.
+    """
     coord = self.resolveCoord (coord)
     if not coord:
       return None
 
-    return self._fetchTreeDeps (
+    if resolution is not None:
+      resolution.start (self)
+
+    maven = self._fetchTreeDeps (
       coord,
       scope,
-      downloadedItems = {},
-      exclusions = {}
+      downloadedItems,
+      exclusions = MavenExclusions.EMPTY,
+      resolution = resolution,
+      report = report
     )
 
+    # the resolution keeps referencing the maven objects fetched
+    if maven and (resolution is not None):
+      return maven.clone ()
+    return maven
+
+  @activated
+  def fetchResolvedScopes (self, coord, scopes = None):
+    """ Gets all the dependencies for given POM Coordinate once and returns
+    a dictionary with a resolved Maven object for each classpath in _scopes_
+    (compile, runtime and test by default, see CLASSPATH_SCOPES).
+
+    The scope of transitive dependencies is propagated following maven's
+    rules (see MavenCoord.resolveTransitiveScope), so each POM file is
+    fetched and resolved only once into a single tree with all scopes,
+    which is then mediated for each classpath.
+    """
+    if scopes is None:
+      scopes = ['compile', 'runtime', 'test']
+
+    fetched = self._fetchScopedTree (coord, {}, {})
+    if not fetched:
+      return None
+
+    (maven, tree) = fetched
+    result = {}
+    for scope in scopes:
+      result[scope] = maven.clone ()
+      result[scope].deps = tree.clone ().resolve (MavenRepo.CLASSPATH_SCOPES[scope])
+    return result
+
+  @activated
+  def fetchResolvedRoots (self, coords, scope):
+    """ Gets all the dependencies of a list of POM coordinates for the
+    classpath of given scope (see CLASSPATH_SCOPES), sharing the POM files
+    fetched and the subtrees built between all of them.
+
+    Returns a (deps, roots) tuple where _deps_ is a MavenDeps with all the
+    coordinates given as children of an empty root, mediated together so
+    each artifact is found once (the classpath of all of them), and _roots_
+    is a list with the resolved Maven object of each coordinate (or None if
+    it cannot be fetched), as returned by fetchResolvedScopes.
+    """
+    scopes = MavenRepo.CLASSPATH_SCOPES.get (scope, [scope])
+
+    poms = {}
+    built = {}
+    deps = MavenDeps ()
+    roots = []
+    for coord in coords:
+      fetched = self._fetchScopedTree (coord, poms, built)
+      if not fetched:
+        roots.append (None)
+        continue
+
+      (maven, tree) = fetched
+      roots.append (maven.clone ())
+      roots[-1].deps = tree.clone ().resolve (scopes)
+
+      root = tree.root.clone ()
+      root.coord = root.coord.withValues (scope = MavenCoord.SCOPE_COMPILE)
+      deps.add (root)
+
+    deps.resolve (scopes)
+    return (deps, roots)
+
+  def _fetchScopedTree (self, coord, poms, built):
+    """ Returns a (maven, tree) tuple with the maven object of given
+    coordinate and a MavenDeps with all its dependencies not resolved yet
+    (with the scopes propagated, see _fetchScopedDep), or None if it cannot
+    be fetched.
+    """
+    coord = self.resolveCoord (coord)
+    if not coord:
+      return None
+
+    maven = self._fetchResolvedPom (coord, poms)
+    if not maven:
+      return None
+
+    tree = MavenDeps ()
+    tree.root = MavenDep (maven.deps.root.coord)
+    for dep in maven.deps.root.deps:
+      scope = MavenCoord.resolveScope (dep.coord.scope)
+      tree.root.add (self._fetchScopedDep (dep, scope, poms, built, set()))
+    return (maven, tree)
+
+  def _fetchResolvedPom (self, coord, poms):
+    """ Returns the maven object of given coordinate with its ancestors and
+    its effective dependencies (see Maven.prepare), fetched once for each
+    coordinate in _poms_.
+    """
+    if coord.id not in poms:
+      maven = self.fetchWithAncestors (coord)
+      if maven:
+        maven.prepare (self._jdkVersion, self._environment)
+      poms[coord.id] = maven
+    return poms[coord.id]
+
+  def _fetchScopedDep (self, dep, scope, poms, built, building):
+    """ Returns a copy of given dependency with the scope given along all
+    its transitive dependencies, which are only built once for each
+    coordinate and scope (in _built_) and shared by all their parents.
+
+    _building_ has the (coordinate, scope) tuples being built, to skip
+    circular dependencies.
+    """
+    coord = self._resolveRange (dep.coord)
+    key = (coord.id, scope)
+    children = built.get (key)
+    if (children is None) and (key not in building):
+      building.add (key)
+
+      children = []
+      maven = self._fetchResolvedPom (coord, poms)
+      for child in (maven.deps.root.deps if maven else []):
+        if child.optional:
+          continue
+
+        childScope = MavenCoord.resolveTransitiveScope (scope, child.coord.scope)
+        if childScope is None:
+          continue
+
+        children.append (
+          self._fetchScopedDep (child, childScope, poms, built, building).share ()
+        )
+
+      building.remove (key)
+      built[key] = children
+
+    new = MavenDep (coord.withValues (scope = scope), dep.optional)
+    new.deps = list (children or [])
+    new.exclusions = list (dep.exclusions)
+    return new
+
+  @activated
+  @timed (MavenStats.DOWNLOAD_URL)
   def downloadUrl (self, downloadUrl):
     """ Downloads given URL and saves the file in the cache dir, in case
     the file is already there, it won't download the file.
@@ -181,52 +524,92 @@ class MavenRepo:
     jarFileName = downloadUrl.split('/')[-1]
     destJarPath = os.path.join (self._cacheDir, jarFileName)
 
+    stats = self._stats
     if os.path.exists (destJarPath):
+      stats.count (MavenStats.DOWNLOAD_URL, hits = 1)
       return destJarPath
 
-    r = requests.get(downloadUrl, stream=True)
-    with open(destJarPath, 'wb') as f:
+    with self._lockFor (downloadUrl):
+      # it might have been downloaded while waiting for the lock
+      if os.path.exists (destJarPath):
+        stats.count (MavenStats.DOWNLOAD_URL, hits = 1)
+        return destJarPath
+
+      r = requests.get(downloadUrl, stream=True)
+      with self._openAtomic (destJarPath) as f:
         shutil.copyfileobj(r.raw, f)
 
+    if stats.enabled:
+      stats.count (
+        MavenStats.DOWNLOAD_URL,
+        bytes = os.path.getsize (destJarPath),
+        misses = 1
+      )
     return destJarPath    
 
+  @activated
   def downloadArtifacts (self, coord, scope):
     """ Resolves all dependencies for given coord and downloads all artifacts
-    """
-    if isinstance(coord, list):
-      result = []
-      for c in coord:
-        result.extend (self.downloadArtifacts (c, scope))
-      return result
+    of given scope (see fetchResolvedTree).
 
-    mavenObj = self.fetchResolvedTree (coord, scope)
-    if not mavenObj:
-      return []
+    Given a list of coords, the artifacts of all of them are downloaded.
+    They share the POM files fetched (a dependency already fetched for a
+    previous coord is reused as it is) and each artifact is returned once.
+    """
+    if not isinstance(coord, list):
+      coord = [coord]
 
+    downloadedItems = {}
     result = []
-    for coord in [MavenCoord(coord)] + mavenObj.deps.getFlattenCoords():
-      normCoord = self._versionDb.findOrRegister (coord)
-      if normCoord.version and coord.version:
-        if mavenvercmp.compare (coord.version, normCoord.version) > 0:
-          print (
-            "WARNING: it seems you are downloading an outdated version (update your version DB):\n"
-            "  - proposal: %s\n" 
-            "  -    using: %s" % (coord, normCoord)
-          )
+    for rootCoord in coord:
+      mavenObj = self._fetchResolvedTree (rootCoord, scope, downloadedItems)
+      if not mavenObj:
+        continue
+
+      for coord in itertools.chain ([MavenCoord(rootCoord)], mavenObj.deps.iterFlattenCoords()):
+        if coord.version and mavenvercmp.isRange (coord.version):
+          # version ranges that cannot be resolved have no artifact
+          continue
 
-      downloadUrl = self.getJarUrlFor (normCoord)
-      destJarPath = self.downloadUrl (downloadUrl)
-      result.append (destJarPath)
+        normCoord = self._versionDb.findOrRegister (coord)
+        if normCoord.version and coord.version:
+          if mavenvercmp.compare (coord.version, normCoord.version) > 0:
+            self._warn (
+              MavenWarning.OUTDATED_VERSION,
+              coord.id,
+              normCoord.version,
+              "WARNING: it seems you are downloading an outdated version (update your version DB):\n"
+              "  - proposal: %s\n" 
+              "  -    using: %s" % (coord, normCoord)
+            )
+
+        downloadUrl = self.getJarUrlFor (normCoord)
+        destJarPath = self.downloadUrl (downloadUrl)
+        if destJarPath not in result:
+          result.append (destJarPath)
     return result
 
-  def _fetchTreeDeps (self, coord, scope, downloadedItems, exclusions):
+  def _fetchTreeDeps (
+    self,
+    coord,
+    scope,
+    downloadedItems,
+    exclusions,
+    resolution = None,
+    report = None
+  ):
     """ Downloads given coordinate and its dependencies recursively for given
     scope. All downloaded dependencies will be added to downloadedItems to avoid
     recursion.
 
-    For quick lookups exclusions is mapping the coord.name with the actual
-    coord excluded.
+    Exclusions inherited from the ancestors are given as a MavenExclusions
+    object. Subtrees recorded by given MavenResolution (if any) are reused
+    as long as nothing they depend on has changed. Resolutions are recorded
+    in given MavenReport (if any, see fetchResolvedTree).
     """
+    if resolution is not None:
+      resolution.probe (coord.name, downloadedItems)
+
     # is maven object in cache downloadedItems ['<group:artifact>']
     if coord.name in downloadedItems:
       if (downloadedItems [coord.name].coord.id != coord.id):
@@ -235,56 +618,123 @@ class MavenRepo:
           coord.id
         ) < 0:
           # TODO: adjust versions versions
-          print "WARNING: expecting same coord id for package '%s' vs '%s'" % (coord.id, downloadedItems [coord.name].coord.id)
+          self._warn (
+            MavenWarning.VERSION_MISMATCH,
+            coord.id,
+            downloadedItems [coord.name].coord.version,
+            "WARNING: expecting same coord id for package '%s' vs '%s'" % (coord.id, downloadedItems [coord.name].coord.id)
+          )
       return downloadedItems [coord.name]
 
-    maven = self.fetchWithAncestors (coord)
+    if resolution is not None:
+      return resolution.fetch (
+        self,
+        coord,
+        scope,
+        downloadedItems,
+        exclusions,
+        report
+      )
+
+    return self._fetchTree (
+      coord,
+      scope,
+      downloadedItems,
+      exclusions,
+      None,
+      {},
+      report
+    )
+
+  def _fetchTree (
+    self,
+    coord,
+    scope,
+    downloadedItems,
+    exclusions,
+    resolution,
+    sources,
+    report = None
+  ):
+    """ Downloads given coordinate (which has not been downloaded yet) and
+    its dependencies (see _fetchTreeDeps).
+
+    The coordinates of all POM files fetched are added to sources (see
+    _fetchWithAncestors).
+    """
+    maven = self._fetchWithAncestors (coord, sources)
     if not maven:
       return None
 
-    maven.resolve (jdkVersion = self._jdkVersion)
+    maven.resolve (
+      jdkVersion = self._jdkVersion,
+      environment = self._environment,
+      report = report
+    )
+
+    # dependencies with a version range take the version they resolve to,
+    # which is kept when resolving again (their templates are dropped, see
+    # Maven.expand)
+    for i in range (len (maven.deps.root.deps)):
+      depCoord = maven.deps.root.deps[i].coord
+      resolvedCoord = self._resolveRange (depCoord, sources)
+      if resolvedCoord is not depCoord:
+        dep = maven.deps.getWritableDep ([i])
+        dep.coord = resolvedCoord
+        dep.templates = None
 
     # TODO: handle provided
 
     children = {}
-    for dep in maven.deps.getFlattenDeps(skipOptional = True):
+    for dep in maven.deps.iterFlattenDeps(skipOptional = True):
       if (dep.coord.scope != scope):
         continue
 
-      if dep.coord.name in exclusions:
-        if dep.coord.isContained (exclusions [dep.coord.name]):
-          # exclude dep
-          continue
+      if exclusions.excludes (dep.coord):
+        # exclude dep
+        continue
 
       # build the new exclusion list based on current dep
-      newExclusions = exclusions.copy()
-      for exclusion in dep.exclusions:
-        newExclusions[exclusion.name] = exclusion
+      newExclusions = exclusions.extend (dep.exclusions)
 
       # fetch child with deps
       mavenChild = self._fetchTreeDeps (
         dep.coord,
         scope,
         downloadedItems,
-        newExclusions
+        newExclusions,
+        resolution,
+        report
       )
       if mavenChild:
-        mavenChild.resolve (jdkVersion = self._jdkVersion)
+        # fetched and recorded already
+        mavenChild.resolve (jdkVersion = self._jdkVersion, environment = self._environment)
         children [dep.coord.id] = mavenChild
 
-    # update dependencies of this element
-    for dep in maven.deps.root.deps:
-      if dep.coord.id not in children:
+    # update dependencies of this element, children are not copied but
+    # referenced, so each resolved artifact exists once no matter how many
+    # parents reach it (see MavenDep.share)
+    for i in range (len (maven.deps.root.deps)):
+      if maven.deps.root.deps[i].coord.id not in children:
         continue
 
+      dep = maven.deps.getWritableDep ([i])
+
       # assert dep.coord.id == mavenChild.deps.root.coord.id
-      childDepsClone = children[dep.coord.id].deps.clone()
-      dep.deps += childDepsClone.root.deps
-      dep.exclusions += childDepsClone.root.exclusions
+      childRoot = children[dep.coord.id].deps.root
+      dep.deps += [childDep.share() for childDep in childRoot.children]
+      dep.exclusions += childRoot.exclusions
 
     downloadedItems [coord.name] = maven
-
-    maven.resolve (scope = scope, jdkVersion = self._jdkVersion)
+    if resolution is not None:
+      resolution.added (coord.name, maven)
+
+    maven.resolve (
+      scope = scope,
+      jdkVersion = self._jdkVersion,
+      environment = self._environment,
+      report = report
+    )
     return maven
 
   def _cacheFile (self, cacheName):
@@ -312,18 +762,240 @@ class MavenRepo:
     """ Saves data to cache
     """
     cacheFile = self._cacheFile (cacheName)
-    with open (cacheFile, 'wb') as f:
+    if not cacheFile:
+      return
+
+    with self._openAtomic (cacheFile) as f:
       f.write (data.encode('utf-8'))
     return
 
+  def _openAtomic (self, path):
+    """ Returns a file object to write the contents of given file, which is
+    written to a temporary file and then renamed, so other threads or
+    processes never read it half written.
+    """
+    return _AtomicFile (path)
+
+  @activated
+  @timed (MavenStats.DOWNLOAD)
   def _download2string (self, url):
+    """ Returns the contents of given URL, from the cache if possible. When
+    several threads request the same URL at the same time, it is downloaded
+    only once.
+    """
+    stats = self._stats
     data = self._cacheGet (url)
     if data:
+      stats.count (MavenStats.DOWNLOAD, hits = 1)
       return data
 
+    with self._lockFor (url):
+      # it might have been downloaded while waiting for the lock
+      data = self._cacheGet (url)
+      if data:
+        stats.count (MavenStats.DOWNLOAD, hits = 1)
+        return data
+
+      data = self._request2string (url)
+      if data:
+        self._cacheSave (url, data)
+
+    if stats.enabled:
+      stats.count (MavenStats.DOWNLOAD, bytes = byteCount (data), misses = 1)
+    return data
+
+  def _request2string (self, url):
+    """ Downloads given URL and returns its contents or None
+    """
     r = requests.get (url)
     if r.status_code != 200:
       return None
-
-    self._cacheSave (url, r.text)
     return r.text
+
+class _AtomicFile:
+  """ File written to a temporary file in the same directory, which
+  replaces the destination file when it is closed (see
+  MavenRepo._openAtomic)
+  """
+  def __init__ (self, path):
+    self._path = path
+    (fd, self._tempPath) = tempfile.mkstemp (
+      prefix = os.path.basename (path) + '.',
+      suffix = '.tmp',
+      dir = os.path.dirname (path) or '.'
+    )
+    self._file = os.fdopen (fd, 'wb')
+    return
+
+  def write (self, data):
+    self._file.write (data)
+    return
+
+  def __enter__ (self):
+    return self
+
+  def __exit__ (self, excType, excValue, traceback):
+    self._file.close ()
+    if excType is not None:
+      os.remove (self._tempPath)
+      return False
+
+    try:
+      os.rename (self._tempPath, self._path)
+    except OSError:
+      # on windows the file cannot be replaced, someone else wrote it
+      os.remove (self._tempPath)
+    return False
+
+class MavenResolution:
+  """ State of a resolution (see MavenRepo.fetchResolvedTree) that can be
+  reused to resolve again the same coordinates after some changes.
+
+  Every subtree fetched is recorded along with everything it depends on:
+
+    - the POM files fetched (the artifact and its ancestors)
+    - the version taken for coordinates without version (version DB or
+      repository metadata)
+    - the artifacts already downloaded by other subtrees when it was
+      fetched, since they are referenced instead of fetched again
+
+  Resolving again reuses the recorded subtrees for which none of them has
+  changed, and fetches and mediates the rest, so the result is the same as
+  a resolution from scratch. Versions are checked on each resolution, but
+  POM files that have been edited must be notified (see invalidate).
+
+  A resolution keeps the state of a single resolution at a time, so unlike
+  MavenRepo it must not be shared by several threads.
+  """
+  def __init__ (self):
+    self._records = {}
+    self._settings = None
+    self._stack = []
+    self._versions = {}
+    return
+
+  def invalidate (self, coord):
+    """ Discards all subtrees that depend on the POM file of given coordinate
+    (e.g: after editing it)
+    """
+    coordId = MavenCoord (coord).id
+    for key, record in self._records.items ():
+      if coordId in record.sources.values ():
+        del self._records[key]
+    return
+
+  def clear (self):
+    """ Discards all subtrees recorded
+    """
+    self._records = {}
+    return
+
+  def start (self, repo):
+    """ Called by given MavenRepo before each resolution
+    """
+    settings = (repo, repo._jdkVersion, repo._environment)
+    if settings != self._settings:
+      self._records = {}
+      self._settings = settings
+
+    self._stack = []
+    self._versions = {}
+    return
+
+  def probe (self, name, downloadedItems):
+    """ Called by MavenRepo before looking for given name in the downloaded
+    items, to record its state for the subtree being fetched
+    """
+    if self._stack:
+      self._stack[-1].probe (name, downloadedItems.get (name))
+    return
+
+  def added (self, name, maven):
+    """ Called by MavenRepo when the subtree being fetched is added to the
+    downloaded items
+    """
+    self._stack[-1].added[name] = maven
+    return
+
+  def fetch (self, repo, coord, scope, downloadedItems, exclusions, report = None):
+    """ Returns the maven object of given coordinate (not downloaded yet),
+    reusing the recorded subtree when possible. Subtrees fetched again are
+    recorded in given MavenReport (if any).
+    """
+    key = (coord.id, scope, exclusions.getKey ())
+    record = self._records.get (key)
+    if (record is not None) and self._isValid (repo, record, downloadedItems):
+      downloadedItems.update (record.added)
+    else:
+      record = _MavenFetchRecord ()
+      self._stack.append (record)
+      try:
+        record.maven = repo._fetchTree (
+          coord,
+          scope,
+          downloadedItems,
+          exclusions,
+          self,
+          record.sources,
+          report
+        )
+      finally:
+        self._stack.pop ()
+
+      self._records[key] = record
+
+    if self._stack:
+      self._stack[-1].merge (record)
+    return record.maven
+
+  def _isValid (self, repo, record, downloadedItems):
+    """ Returns True if nothing the recorded subtree depends on has changed
+    """
+    for name, maven in record.probes.iteritems ():
+      if downloadedItems.get (name) is not maven:
+        return False
+
+    for coordId, resolvedId in record.sources.iteritems ():
+      if coordId == resolvedId:
+        continue
+
+      if coordId not in self._versions:
+        resolvedCoord = repo.resolveCoord (coordId)
+        self._versions[coordId] = resolvedCoord.id if resolvedCoord else None
+
+      if self._versions[coordId] != resolvedId:
+        return False
+
+    return True
+
+class _MavenFetchRecord:
+  """ Subtree fetched by a MavenResolution and what it depends on
+  """
+  def __init__ (self):
+    self.maven = None
+
+    # coordinate ids of the POM files fetched and the ids they resolved to
+    self.sources = {}
+
+    # state of the downloaded items (maven object or None) looked up, for
+    # the names that were not added by the subtree itself
+    self.probes = {}
+
+    # downloaded items added by the subtree
+    self.added = {}
+    return
+
+  def probe (self, name, maven):
+    if (name not in self.probes) and (name not in self.added):
+      self.probes[name] = maven
+    return
+
+  def merge (self, record):
+    """ Merges the record of a child subtree fetched or reused
+    """
+    for name, maven in record.probes.iteritems ():
+      self.probe (name, maven)
+
+    self.sources.update (record.sources)
+    self.added.update (record.added)
+    return
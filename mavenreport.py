@@ -0,0 +1,181 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+from mavencoord import MavenCoordPool
+from mavenexclusions import MavenExclusions
+
+class MavenReportEntry (object):
+  """ A dependency found while resolving a tree and what happened to it
+  (see MavenReport). Each entry references the entry of the parent it was
+  found in, so its path from the root is built in O(depth).
+  """
+  __slots__ = ('coord', 'reason', 'parent', 'exclusions')
+
+  def __init__ (self, coord, reason, parent = None, exclusions = ()):
+    self.coord = coord
+    self.reason = reason
+    self.parent = parent
+
+    # exclusions declared by the dependency (only for placed ones)
+    self.exclusions = exclusions
+    return
+
+  def getPath (self):
+    """ Returns the list of coordinates from the root to this dependency
+    """
+    path = []
+    entry = self
+    while entry is not None:
+      path.append (entry.coord)
+      entry = entry.parent
+
+    path.reverse ()
+    return path
+
+  def getExcludedBy (self):
+    """ Returns an (entry, exclusion) tuple with the nearest ancestor that
+    excluded this dependency and the exclusion that matched, or None.
+    """
+    entry = self.parent
+    while entry is not None:
+      for exclusion in entry.exclusions:
+        if MavenExclusions ([exclusion]).excludes (self.coord):
+          return (entry, exclusion)
+      entry = entry.parent
+    return None
+
+  def __repr__ (self):
+    return '%s (%s)' % (self.coord.full, self.reason)
+
+class MavenReport:
+  """ Reverse index of a resolution (see MavenDeps.resolve) that answers
+  why each dependency is or is not in the resolved tree.
+
+  Every dependency found while resolving is recorded once as an entry (see
+  MavenReportEntry) with one of these reasons:
+
+    - PLACED: it is part of the resolved tree
+    - OMITTED: another version was already placed nearer to the root
+    - CONFLICT: it lost the conflict against a sibling with the same name
+    - EXCLUDED: an exclusion of one of its ancestors removed it
+
+  Dependencies filtered by scope or because they are optional, as well as
+  the children of dependencies not placed, are not walked so they are not
+  recorded either.
+
+  A report can record several resolutions (e.g: MavenRepo.fetchResolvedTree
+  resolves each POM file fetched and then the whole tree), each one starting
+  with the entry of its root. Losers are matched with the winner of their
+  own resolution, and getPlaced returns the entries placed by the last one.
+  """
+  PLACED = 'placed'
+  OMITTED = 'omitted'
+  CONFLICT = 'conflict'
+  EXCLUDED = 'excluded'
+
+  def __init__ (self):
+    self.entries = []
+    self._byName = {}
+    self._placed = {}
+
+    # entries placed by each resolution, by the entry of its root
+    self._resolutions = {}
+    return
+
+  def add (self, coord, reason, parent = None, exclusions = ()):
+    """ Records given coordinate found in _parent_ entry and returns its entry
+    """
+    entry = MavenReportEntry (coord, reason, parent, tuple (exclusions))
+    if parent is None:
+      self._placed = {}
+      self._resolutions[entry] = self._placed
+
+    self.entries.append (entry)
+    self._byName.setdefault (coord.name, []).append (entry)
+    if reason == MavenReport.PLACED:
+      self._placed[coord.name] = entry
+    return entry
+
+  def findAll (self, coord):
+    """ Returns all the entries of given coordinate, which is matched by
+    name when it has no version.
+    """
+    coord = MavenCoordPool.getDefault ().get (coord)
+    entries = self._byName.get (coord.name, [])
+    if not coord.version:
+      return list (entries)
+    return [e for e in entries if e.coord.id == coord.id]
+
+  def getPlaced (self, coord):
+    """ Returns the entry placed in the resolved tree with the same name as
+    given coordinate (any version) or None.
+    """
+    return self._placed.get (MavenCoordPool.getDefault ().get (coord).name)
+
+  def getPaths (self, coord):
+    """ Returns all the paths from the root (as lists of coordinates) where
+    given coordinate has been found
+    """
+    return [entry.getPath () for entry in self.findAll (coord)]
+
+  def getLosers (self, coord = None):
+    """ Returns a list of (entry, winner) tuples for the dependencies that
+    lost the mediation (for given coordinate or all of them), where _winner_
+    is the entry placed instead.
+    """
+    entries = self.entries if coord is None else self.findAll (coord)
+    return [
+      (entry, self._getResolution (entry).get (entry.coord.name))
+      for entry in entries
+      if entry.reason in (MavenReport.OMITTED, MavenReport.CONFLICT)
+    ]
+
+  def _getResolution (self, entry):
+    """ Returns the entries placed by the resolution given entry belongs to
+    """
+    while entry.parent is not None:
+      entry = entry.parent
+    return self._resolutions.get (entry, {})
+
+  def getExclusions (self, coord = None):
+    """ Returns a list of (entry, excludedBy, exclusion) tuples for the
+    dependencies excluded (for given coordinate or all of them), where
+    _excludedBy_ is the entry of the ancestor that declared the exclusion.
+    """
+    result = []
+    entries = self.entries if coord is None else self.findAll (coord)
+    for entry in entries:
+      if entry.reason != MavenReport.EXCLUDED:
+        continue
+
+      (excludedBy, exclusion) = entry.getExcludedBy () or (None, None)
+      result.append ((entry, excludedBy, exclusion))
+    return result
+
+class MavenWarning (object):
+  """ Warning found while fetching or resolving dependencies, kept as a
+  record so it can be queried (see MavenRepo.getWarnings and
+  MavenVersionDb.getWarnings).
+  """
+  # a dependency reached with a different version than the one downloaded
+  VERSION_MISMATCH = 'version-mismatch'
+
+  # version DB conflict between a registered version and a new one
+  UNHANDLED_CONFLICT = 'unhandled-conflict'
+
+  # a dependency requires a newer version than the one in the version DB
+  OUTDATED_VERSION = 'outdated-version'
+
+  __slots__ = ('kind', 'coord', 'expected', 'message')
+
+  def __init__ (self, kind, coord, expected, message):
+    self.kind = kind
+    self.coord = coord
+    self.expected = expected
+    self.message = message
+    return
+
+  def __str__ (self):
+    return self.message
+
+  def __repr__ (self):
+    return 'MavenWarning (%s, %s, %s)' % (self.kind, self.coord, self.expected)
@@ -0,0 +1,192 @@
+#/usr/bin/env python
+# -*- coding: utf-8 -*-
+import contextlib
+import functools
+import threading
+import timeit
+
+class MavenPhaseStats (object):
+  """ Counters of a phase (e.g: downloading or parsing POM files), see
+  MavenStats
+  """
+  __slots__ = ('name', 'calls', 'totalTime', 'maxTime', 'bytes', 'hits', 'misses')
+
+  def __init__ (self, name):
+    self.name = name
+    self.calls = 0
+    self.totalTime = 0.0
+    self.maxTime = 0.0
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+    return
+
+  def copy (self):
+    new = MavenPhaseStats (self.name)
+    for attr in MavenPhaseStats.__slots__:
+      setattr (new, attr, getattr (self, attr))
+    return new
+
+  def __repr__ (self):
+    return (
+      '%s: %d calls, %.2f ms (max %.2f ms), %d bytes, %d hits, %d misses' % (
+        self.name,
+        self.calls,
+        self.totalTime * 1000,
+        self.maxTime * 1000,
+        self.bytes,
+        self.hits,
+        self.misses
+      )
+    )
+
+class MavenStats:
+  """ Timers and counters of the phases of a resolution, so it is possible
+  to tell whether the time goes to the network, XML parsing, property
+  expansion or mediation.
+
+  Stats are disabled by default and, when disabled, instrumented functions
+  (see timed) only check a flag. Instrumented functions update the stats
+  activated by the current thread (e.g: the ones of the MavenRepo running
+  them, see activate) or the ones shared by the whole process otherwise
+  (see getDefault). Stats can be updated by several threads.
+  """
+  DOWNLOAD = 'download'
+  DOWNLOAD_URL = 'downloadUrl'
+  PARSE = 'parse'
+  EXPAND = 'expand'
+  PROFILES = 'profiles'
+  RESOLVE = 'resolve'
+
+  _default = None
+
+  # stats activated by each thread (see activate)
+  _current = threading.local ()
+
+  def __init__ (self):
+    self.enabled = False
+    self._phases = {}
+    self._lock = threading.Lock ()
+    return
+
+  def enable (self, enabled = True):
+    self.enabled = enabled
+    return
+
+  def record (self, phase, elapsed):
+    """ Records a call to given phase that took _elapsed_ seconds
+    """
+    with self._lock:
+      stats = self._getPhase (phase)
+      stats.calls += 1
+      stats.totalTime += elapsed
+      if elapsed > stats.maxTime:
+        stats.maxTime = elapsed
+    return
+
+  def count (self, phase, bytes = 0, hits = 0, misses = 0):
+    """ Adds given bytes and cache hits and misses to given phase
+    """
+    if not self.enabled:
+      return
+
+    with self._lock:
+      stats = self._getPhase (phase)
+      stats.bytes += bytes
+      stats.hits += hits
+      stats.misses += misses
+    return
+
+  def snapshot (self):
+    """ Returns a dictionary with a copy of the stats of each phase (see
+    MavenPhaseStats)
+    """
+    with self._lock:
+      return dict ((name, stats.copy ()) for (name, stats) in self._phases.items ())
+
+  def reset (self):
+    """ Clears the stats of all phases
+    """
+    with self._lock:
+      self._phases = {}
+    return
+
+  @contextlib.contextmanager
+  def activate (self):
+    """ Makes these stats the ones updated by the instrumented functions
+    run by the current thread until the block ends (see getCurrent)
+
+    Example:
+      >>> with stats.activate ():
+      ...   mavenparser.parseString (data)
+    """
+    previous = getattr (MavenStats._current, 'stats', None)
+    MavenStats._current.stats = self
+    try:
+      yield self
+    finally:
+      MavenStats._current.stats = previous
+
+  def _getPhase (self, phase):
+    stats = self._phases.get (phase)
+    if stats is None:
+      stats = MavenPhaseStats (phase)
+      self._phases[phase] = stats
+    return stats
+
+  @staticmethod
+  def getDefault ():
+    """ Returns the stats shared by the whole process, used by the
+    instrumented functions when no other stats are activated
+    """
+    return MavenStats._default
+
+  @staticmethod
+  def getCurrent ():
+    """ Returns the stats used by the instrumented functions run by the
+    current thread (see activate)
+    """
+    stats = getattr (MavenStats._current, 'stats', None)
+    if stats is None:
+      return MavenStats._default
+    return stats
+
+MavenStats._default = MavenStats ()
+
+def byteCount (data):
+  """ Returns the number of bytes of given string, which is encoded as UTF-8
+  if it is unicode (as it is written to the cache)
+  """
+  if isinstance (data, unicode):
+    return len (data.encode ('utf-8'))
+  return len (data or '')
+
+def timed (phase):
+  """ Decorator that records the calls to the function as given phase in
+  the current stats (see MavenStats.getCurrent)
+  """
+  def decorator (fn):
+    @functools.wraps (fn)
+    def wrapper (*args, **kwargs):
+      stats = MavenStats.getCurrent ()
+      if not stats.enabled:
+        return fn (*args, **kwargs)
+
+      start = timeit.default_timer ()
+      try:
+        return fn (*args, **kwargs)
+      finally:
+        stats.record (phase, timeit.default_timer () - start)
+    return wrapper
+  return decorator
+
+def activated (fn):
+  """ Decorator of the methods of objects with their own stats (a _stats
+  attribute, e.g: MavenRepo) that activates those stats while the method
+  runs (see MavenStats.activate)
+  """
+  @functools.wraps (fn)
+  def wrapper (self, *args, **kwargs):
+    with self._stats.activate ():
+      return fn (self, *args, **kwargs)
+  return wrapper
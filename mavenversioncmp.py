@@ -20,6 +20,7 @@
 #   https://cwiki.apache.org/confluence/display/MAVENOLD/Dependency+Mediation+and+Conflict+Resolution
 #   https://maven.apache.org/enforcer/enforcer-rules/versionRanges.html
 #
+import bisect
 import re
 
 _CANONICAL_REGEX = re.compile (r'''
@@ -37,6 +38,14 @@ _CANONICAL_REGEX = re.compile (r'''
   re.VERBOSE
 )
 
+# maximum number of versions whose canonical representation is memoised
+_CANONICAL_CACHE_SIZE = 4096
+_canonicalCache = {}
+
+# maximum number of version constraints whose VersionRange is memoised
+_RANGE_CACHE_SIZE = 1024
+_rangeCache = {}
+
 
 def satisfies (version, versionConstraints):
   """ Checks if given version satisfies given version constraint that might
@@ -44,6 +53,12 @@ def satisfies (version, versionConstraints):
   """
   return isContained (version, versionConstraints)
 
+def isRange (version):
+  """ Returns True if given version is a range (e.g: '[1.0,2.0)' or '[1.2]')
+  instead of a single version (e.g: '1.0', which is a soft requirement)
+  """
+  return version.lstrip ()[:1] in ('[', '(')
+
 def isContained (version, versionConstraints):
   """ Checks if given version is contained in given version range
 
@@ -51,94 +66,32 @@ def isContained (version, versionConstraints):
   if not isinstance (versionConstraints, basestring):
     raise Exception ("Expecting version range to be a string")
 
-  # split version by ranges
-  versionRanges = [
-    x.strip(',') for x in re.split (r'(.*[\)\]],)', versionConstraints) if x
-  ]
+  return getRange (versionConstraints).contains (version)
 
-  # if is contained in any range, then satisfies the rules
-  for vr in versionRanges:
-    if _isContained (version, vr):
-      return True
-
-  return False
-
-def _isContained (version, versionRangeExpr):
-  """ Compares version against given version range in order to see if
-  it matches given criteria.
+def getRange (versionConstraints):
+  """ Returns the VersionRange for given version constraints, which are
+  parsed once and memoised (the memo is emptied when it reaches
+  _RANGE_CACHE_SIZE).
   """
-  version = re.sub (r'\s+', '', version)
-  versionRangeExpr = re.sub (r'\s+', '', versionRangeExpr)
-  if version == versionRangeExpr:
-    return True
+  versionRange = _rangeCache.get (versionConstraints)
+  if versionRange is None:
+    versionRange = VersionRange (versionConstraints)
 
-  versionRanges = versionRangeExpr.split(',')
-  if len(versionRanges) == 0:
-    return False
+    if len (_rangeCache) >= _RANGE_CACHE_SIZE:
+      _rangeCache.clear ()
+    _rangeCache[versionConstraints] = versionRange
 
-  elif len(versionRanges) == 1:
-    # has no braces/brackets, it means it is like '1.0' 
-    # and should be normalized to '[1.0,]'
-    if len(versionRanges[0]) == len(versionRanges[0].strip('[]()')):
-      lowerBound = '[%s' % versionRanges[0]
-      upperBound = ']'
+  return versionRange
 
-    # has braces/brackets like '[1.2]', and will normalize to '[1.2,1.2]'
-    else:
-      lowerBound = '[%s' % versionRanges[0].strip('()[],')
-      upperBound = '%s]' % versionRanges[0].strip('()[],')
-
-    return _isContainedInBounds (version, lowerBound, upperBound)
-
-  elif len(versionRanges) == 2:
-    return _isContainedInBounds (
-      version,
-      lowerBound = versionRanges[0],
-      upperBound = versionRanges[1]
-    )
-
-  else:
-    raise Exception ("Version ranges expression not well formed: %s" % versionRangeExpr)
-
-  return False
-
-def _isContainedInBounds (version, lowerBound, upperBound):
-  """ Checks if given version is contained in given bounds
-  """
-  # if lowerBound = '(' or '[' it passes the lower test since anything
-  # is > or >= than minus infinite
-  if (lowerBound != '(') and (lowerBound != '['):
-    result = compare(version, lowerBound)
-
-    # version should be > lower to continue
-    if (lowerBound[0] == '(') and (result <= 0):
-      return False
-
-    # version should be >= lower to continue
-    elif (lowerBound[0] == '[') and (result < 0):
-      return False
-
-  # if upperBound = ')' or ']' it passes the upper test since anything
-  # is < or <= than infinite
-  if (upperBound != ')') and (upperBound != ']'):
-    result = compare(version, upperBound)
-
-    # version should be less than my upper to continue
-    if (upperBound[-1] == ')') and (result >= 0):
-      return False
-
-    # version should be less than or equal to upper value 
-    # to continue, otherwise if it is greater we are done
-    elif (upperBound[-1] == ']') and (result > 0):
-      return False
-
-  return True
+def _removeSpaces (value):
+  return ''.join (value.split ())
 
 def getCanonical (version):
   """ Returns the canonical representation of given version by returning a
   tuple containing (major, minor, revision, qualifier, build)
 
-  Everything is a number apart of the qualifier.
+  Everything is a number apart of the qualifier. Versions are parsed once
+  and memoised (the memo is emptied when it reaches _CANONICAL_CACHE_SIZE).
 
   Example:
     >>> _getCanonical ("")
@@ -153,6 +106,20 @@ def getCanonical (version):
     >>> _getCanonical ("1.3.9-SNAPSHOT-3")
     (1, 3, 9, 'SNAPSHOT', 3)
   """
+  canonical = _canonicalCache.get (version)
+  if canonical is None:
+    canonical = _parseCanonical (version)
+
+    if len (_canonicalCache) >= _CANONICAL_CACHE_SIZE:
+      _canonicalCache.clear ()
+    _canonicalCache[version] = canonical
+
+  return canonical
+
+def _parseCanonical (version):
+  """ Parses given version into its canonical representation (see
+  getCanonical)
+  """
   major = 0
   minor = 0
   revision = 0
@@ -185,33 +152,183 @@ def compare (a, b):
   - if no qualifier, and build does not exist, add "-0" for comparison purposes
   - numerical comparison of build  
   """
-  (aMajor, aMinor, aRevision, aQualifier, aBuild) = getCanonical(a)
-  (bMajor, bMinor, bRevision, bQualifier, bBuild) = getCanonical(b)
+  # canonical tuples are ordered the same way (empty qualifiers first)
+  return cmp (getCanonical (a), getCanonical (b))
+
+class VersionKey (object):
+  """ Sortable key of a version, ordered the same way as compare.
+
+  Example:
+    >>> sorted (['1.10', '1.2-beta', '1.2'], key = VersionKey)
+    ['1.2', '1.2-beta', '1.10']
+  """
+  __slots__ = ('version', 'canonical')
 
-  if (aMajor < bMajor):
-    return -1
+  def __init__ (self, version):
+    self.version = version
+    self.canonical = getCanonical (version)
+    return
 
-  elif (aMajor == bMajor):
-    if (aMinor < bMinor):
-      return -1
+  def __lt__ (self, other):
+    return self.canonical < other.canonical
 
-    elif (aMinor == bMinor):
-      if (aRevision < bRevision):
-        return -1
+  def __le__ (self, other):
+    return self.canonical <= other.canonical
 
-      elif (aRevision == bRevision):
-        if (
-          ((aQualifier == '') and (bQualifier != ''))
-          or (aQualifier < bQualifier)
-        ):
-          return -1
+  def __gt__ (self, other):
+    return self.canonical > other.canonical
 
-        elif (aQualifier == bQualifier):
-          if (aBuild < bBuild):
-            return -1
+  def __ge__ (self, other):
+    return self.canonical >= other.canonical
 
-          elif (aBuild == bBuild):
-            return 0
+  def __eq__ (self, other):
+    return isinstance (other, VersionKey) and (self.canonical == other.canonical)
+
+  def __ne__ (self, other):
+    return not self.__eq__ (other)
+
+  def __hash__ (self):
+    return hash (self.canonical)
+
+  def __repr__ (self):
+    return 'VersionKey (%r)' % self.version
+
+class VersionRange (object):
+  """ Version constraints (see the header of this module) parsed into a
+  list of intervals, so that checking versions against them does not need
+  to parse the constraints again (see getRange).
+
+  Each interval is a (lower, lowerInclusive, upper, upperInclusive) tuple
+  where the bounds are canonical versions (see getCanonical) or None when
+  there is no such bound. A single version without brackets is a minimum
+  (e.g: '1.0' means x >= 1.0).
+  """
+  __slots__ = ('constraints', 'intervals', '_exprs')
+
+  def __init__ (self, versionConstraints):
+    if not isinstance (versionConstraints, basestring):
+      raise Exception ("Expecting version range to be a string")
+
+    self.constraints = versionConstraints
+    self.intervals = []
+
+    # versions equal to a whole range expression are always contained
+    self._exprs = set()
+
+    for expr in re.split (r'(?<=[\)\]]),', _removeSpaces (versionConstraints)):
+      expr = expr.strip (',')
+      if not expr:
+        continue
+
+      self._exprs.add (expr)
+      self.intervals.append (VersionRange._parseInterval (expr))
+    return
+
+  @staticmethod
+  def _parseInterval (versionRangeExpr):
+    """ Returns the interval tuple of a single range expression
+    """
+    versionRanges = versionRangeExpr.split (',')
+
+    if len (versionRanges) == 1:
+      # has no braces/brackets, it means it is like '1.0' 
+      # and should be normalized to '[1.0,]'
+      if len(versionRanges[0]) == len(versionRanges[0].strip('[]()')):
+        return (getCanonical (versionRanges[0]), True, None, True)
+
+      # has braces/brackets like '[1.2]', and will normalize to '[1.2,1.2]'
+      version = versionRanges[0].strip('()[],')
+      if not version:
+        return (None, True, None, True)
+
+      version = getCanonical (version)
+      return (version, True, version, True)
+
+    elif len (versionRanges) == 2:
+      (lowerBound, upperBound) = versionRanges
+
+      # a bound without version (or bracket) is infinite
+      lower = None
+      if (lowerBound[:1] in ('(', '[')) and (len (lowerBound) > 1):
+        lower = getCanonical (lowerBound)
+
+      upper = None
+      if (upperBound[-1:] in (')', ']')) and (len (upperBound) > 1):
+        upper = getCanonical (upperBound)
+
+      return (lower, lowerBound[:1] != '(', upper, upperBound[-1:] != ')')
+
+    raise Exception ("Version ranges expression not well formed: %s" % versionRangeExpr)
+
+  def contains (self, version):
+    """ Returns True if given version is contained in any of the intervals
+    """
+    version = _removeSpaces (version)
+    if version in self._exprs:
+      return True
+
+    key = getCanonical (version)
+    for (lower, lowerInclusive, upper, upperInclusive) in self.intervals:
+      if lower is not None:
+        if (key < lower) or ((key == lower) and not lowerInclusive):
+          continue
+
+      if upper is not None:
+        if (key > upper) or ((key == upper) and not upperInclusive):
+          continue
+
+      return True
+
+    return False
 
-  # if not equal and not lower, then it is bigger :D
-  return 1
\ No newline at end of file
+  def filter (self, versions, keys = None):
+    """ Returns the versions contained in the intervals from given list of
+    versions, which must be sorted (see VersionKey). Their canonical
+    versions (see getCanonical) can be given in _keys_ when they are known.
+
+    Each interval is located with a binary search on the list, instead of
+    checking the versions one by one.
+    """
+    if keys is None:
+      keys = [getCanonical (v) for v in versions]
+
+    spans = []
+    for (lower, lowerInclusive, upper, upperInclusive) in self.intervals:
+      start = 0
+      if lower is not None:
+        if lowerInclusive:
+          start = bisect.bisect_left (keys, lower)
+        else:
+          start = bisect.bisect_right (keys, lower)
+
+      end = len (keys)
+      if upper is not None:
+        if upperInclusive:
+          end = bisect.bisect_right (keys, upper)
+        else:
+          end = bisect.bisect_left (keys, upper)
+
+      if start < end:
+        spans.append ((start, end))
+
+    for expr in self._exprs:
+      key = getCanonical (expr)
+      i = bisect.bisect_left (keys, key)
+      while (i < len (keys)) and (keys[i] == key):
+        if versions[i] == expr:
+          spans.append ((i, i + 1))
+        i += 1
+
+    # join the spans in order, without repeating versions
+    result = []
+    last = 0
+    for (start, end) in sorted (spans):
+      start = max (start, last)
+      if start < end:
+        result.extend (versions[start:end])
+        last = end
+
+    return result
+
+  def __repr__ (self):
+    return 'VersionRange (%r)' % self.constraints
@@ -1,15 +1,161 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*- 
 
+import bisect
+import multiprocessing
+import os
+import tempfile
+import threading
+import xmltodict
+from xml.parsers.expat import ExpatError
+
 from mavencoord import MavenCoord
+from mavenreport import MavenWarning
+import mavenversioncmp as vercmp
 
 class MavenVersionDb:
   """ This class serves as a dependency database so we can lookup 
   versions of packages that have been registered already.
+
+  Besides the default version of each package (the first one registered,
+  see find), all the versions registered are kept sorted (see VersionKey in
+  mavenversioncmp) so they can be queried by range (see
+  getHighestVersionFor).
+
+  The database can be saved in an indexed form (see save) that loads much
+  faster than parsing the text file again (see load and fromFile).
+
+  It can be shared by several threads: changes are serialized with a lock,
+  while lookups take no lock because the version lists are replaced instead
+  of changed in place.
   """
+  # first bytes of the files written by save (the number is the version of
+  # the format)
+  MAGIC = 'MVDB2\n'
+
+  # extension of the indexed copies kept next to text files (see fromFile)
+  INDEX_EXTENSION = '.index'
+
+  # files scanned when importing directories (see importPaths)
+  IMPORT_EXTENSIONS = ('.pom', '.xml', '.cache', '.txt')
+
   def __init__ (self):
     self._db = {}
+    self._versions = {}
+    self._keys = {}
     self._warnings = set()
+    self._warningRecords = []
+    self._lock = threading.RLock ()
+    return
+
+  @staticmethod
+  def fromFile (path, cachePath = None):
+    """ Returns a new database with the contents of given file, which can
+    be a text file (see parseFile) or one written by save.
+
+    When _cachePath_ is given the text file is only parsed if the file in
+    _cachePath_ is missing or older, and saved there afterwards (unless it
+    cannot be written, e.g: a read-only directory).
+    """
+    db = MavenVersionDb ()
+    if cachePath and os.path.exists (cachePath):
+      # caches written with an older format are parsed again
+      if (
+        os.path.getmtime (cachePath) >= os.path.getmtime (path)
+        and MavenVersionDb.isIndexFile (cachePath)
+      ):
+        db.load (cachePath)
+        return db
+
+    if MavenVersionDb.isIndexFile (path):
+      db.load (path)
+      return db
+
+    db.parseFile (path)
+    if cachePath:
+      try:
+        db.save (cachePath)
+      except (IOError, OSError):
+        # the cache is optional
+        pass
+    return db
+
+  @staticmethod
+  def isIndexFile (path):
+    """ Returns True if given file has been written by save
+    """
+    with open (path, 'rb') as f:
+      return f.read (len (MavenVersionDb.MAGIC)) == MavenVersionDb.MAGIC
+
+  def save (self, path):
+    """ Saves default and sorted versions of all packages in a file that can
+    be loaded later (see load). Warnings are not saved.
+
+    The file is an UTF-8 text file that starts with MAGIC followed by a line
+    for each package with tab separated fields: the name (group:artifact),
+    the default version prefixed by '=' (empty when there is none) and all
+    the versions sorted. It does not depend on the python version and it is
+    written to a temporary file first, so it is never read half written.
+    """
+    lines = [MavenVersionDb.MAGIC]
+    with self._lock:
+      for name in sorted (set (self._db) | set (self._versions)):
+        fields = [name]
+        if name in self._db:
+          fields.append ('=' + (self._db[name] or ''))
+        else:
+          fields.append ('')
+        fields.extend (self._versions.get (name, []))
+
+        line = '\t'.join (fields)
+        if ('\n' in line) or (len (fields) != len (line.split ('\t'))):
+          raise Exception ("Cannot save package with tabs or new lines: %s" % name)
+        lines.append (line + '\n')
+
+    (fd, tempPath) = tempfile.mkstemp (
+      prefix = os.path.basename (path) + '.',
+      suffix = '.tmp',
+      dir = os.path.dirname (path) or '.'
+    )
+    try:
+      with os.fdopen (fd, 'wb') as f:
+        f.write (''.join (lines).encode ('utf-8'))
+
+      if os.path.exists (path) and (os.name == 'nt'):
+        os.remove (path)
+      os.rename (tempPath, path)
+    finally:
+      if os.path.exists (tempPath):
+        os.remove (tempPath)
+    return
+
+  def load (self, path):
+    """ Loads a file written by save, replacing the contents of this
+    database
+    """
+    with open (path, 'rb') as f:
+      if f.read (len (MavenVersionDb.MAGIC)) != MavenVersionDb.MAGIC:
+        raise Exception ("Not a version database file: %s" % path)
+
+      data = f.read ().decode ('utf-8')
+
+    db = {}
+    versions = {}
+    for line in data.splitlines ():
+      fields = line.split ('\t')
+      if len (fields) < 2:
+        raise Exception ("Corrupted version database file: %s" % path)
+
+      name = fields[0]
+      if fields[1]:
+        db[name] = fields[1][1:]
+      if len (fields) > 2:
+        versions[name] = fields[2:]
+
+    with self._lock:
+      # versions are stored sorted, their keys are built when queried
+      (self._db, self._versions) = (db, versions)
+      self._keys = {}
     return
 
   def parseFile (self, depsfile):
@@ -21,36 +167,96 @@ class MavenVersionDb:
 
       $  mvn dependency:tree -DoutputType=text -Doutput=deps.txt
 
-      The only difference is that the very first line, which references the
-    coord we are in, should be commented out with '#' character.
+    The very first line, which references the coord we are in, is
+    registered as well unless it is commented out with '#' character.
     """
     with open (depsfile, 'rt') as f:
-      for line in f:
-        line = line.strip()
-        if line.startswith ('#') or (len(line) == 0):
-          continue
-
-        self.register (line.lstrip ('=|+- \\'))
+      for line in _iterTreeLines (f):
+        self.register (line)
         
     return True
 
-  def register (self, coord):
-    """ Register given coord in the database
+  def importPaths (self, paths, processes = None):
+    """ Imports the versions found in given files and directories, which
+    are scanned recursively, and returns the list of warnings found (see
+    MavenWarning) instead of printing them.
+
+    Supported files are:
+
+      - POM files (e.g: from a ~/.m2 directory or a MavenRepo cache dir)
+      - maven-metadata.xml files
+      - dependency:tree outputs (see parseFile), as .txt files
+
+    POM and metadata files only add known versions (see getVersionsFor),
+    while dependency trees register the versions the same way parseFile
+    does, so the first version found becomes the default one and different
+    ones are reported as conflicts.
+
+    Files are scanned in _processes_ worker processes (as many as CPUs by
+    default) and merged in the same order they would be scanned serially,
+    so the result does not depend on the number of processes.
+    """
+    files = []
+    for path in paths:
+      if not os.path.isdir (path):
+        files.append (path)
+        continue
+
+      for (root, dirs, names) in os.walk (path):
+        dirs.sort ()
+        for name in sorted (names):
+          if os.path.splitext (name)[1] in MavenVersionDb.IMPORT_EXTENSIONS:
+            files.append (os.path.join (root, name))
+
+    if processes is None:
+      processes = multiprocessing.cpu_count ()
+
+    if (processes <= 1) or (len (files) <= 1):
+      results = map (_scanFile, files)
+    else:
+      pool = multiprocessing.Pool (processes)
+      try:
+        results = pool.map (_scanFile, files, max (1, len (files) // (processes * 4)))
+      finally:
+        pool.close ()
+        pool.join ()
+
+    with self._lock:
+      firstWarning = len (self._warningRecords)
+      for (versions, treeCoords) in results:
+        for (name, version) in versions:
+          self._addVersion (name, version)
+
+        for coord in treeCoords:
+          self.register (coord, verbose = False)
+
+      return self._warningRecords[firstWarning:]
+
+  def register (self, coord, verbose = True):
+    """ Register given coord in the database, conflicts are printed only
+    when _verbose_ is set (see getWarnings)
     """
     if isinstance (coord, list):
       for m in coord:
-        self.register (m)
+        self.register (m, verbose)
       return
 
     m = MavenCoord (coord)
+    if m.version and vercmp.isRange (m.version):
+      # ranges are not versions, they take the registered one (if any)
+      return self.find (m) or m
 
     myId = m.group + ':' + m.artifact
-    if (myId in self._db) and (self._db[myId] != m.version):
-      self.dependencyWarningOnce (m.id, self._db[myId])
-      m.version = self._db[myId]
-      return m
+    with self._lock:
+      if m.version:
+        self._addVersion (myId, m.version)
+
+      if (myId in self._db) and (self._db[myId] != m.version):
+        self.dependencyWarningOnce (m.id, self._db[myId], verbose)
+        m.version = self._db[myId]
+        return m
 
-    self._db[myId] = m.version
+      self._db[myId] = m.version
     return m
 
   def findOrRegister (self, coord):
@@ -73,20 +279,203 @@ class MavenVersionDb:
     """
     return self._db.get (group + ':' + artifact, None)
 
+  def setVersionFor (self, group, artifact, version):
+    """ Sets the default version for given group and artifact, replacing
+    the one registered (if any)
+    """
+    with self._lock:
+      self._db[group + ':' + artifact] = version
+      self._addVersion (group + ':' + artifact, version)
+    return
+
   def hasVersionFor (self, group, artifact):
-    return self._db.has (group + ':' + artifact)
+    return (group + ':' + artifact) in self._db
 
-  def dependencyWarningOnce (self, coord, existingVersion):
-    """ Show a dependency warning once
+  def getVersionsFor (self, group, artifact):
+    """ Returns all the versions registered for given group and artifact,
+    sorted from oldest to newest
     """
-    if coord in self._warnings:
-      return
-    
-    self._warnings.add (coord)
+    return list (self._versions.get (group + ':' + artifact, []))
+
+  def getNewestVersionFor (self, group, artifact):
+    """ Returns the newest version registered for given group and artifact
+    or None
+    """
+    versions = self._versions.get (group + ':' + artifact)
+    if not versions:
+      return None
+    return versions[-1]
+
+  def getHighestVersionFor (self, group, artifact, versionConstraints):
+    """ Returns the highest version registered for given group and artifact
+    that satisfies given version constraints (e.g: '[1.2,2.0)') or None
+    """
+    name = group + ':' + artifact
+    versions = self._versions.get (name)
+    if not versions:
+      return None
+
+    versionRange = vercmp.getRange (versionConstraints)
+    versions = versionRange.filter (versions, self._getKeys (name, versions))
+    if not versions:
+      return None
+    return versions[-1]
+
+  def _getKeys (self, name, versions):
+    """ Returns the canonical versions (see mavenversioncmp.getCanonical)
+    of given sorted versions of given package
+    """
+    entry = self._keys.get (name)
+    if (entry is None) or (entry[0] is not versions):
+      entry = (versions, [vercmp.getCanonical (v) for v in versions])
+      self._keys[name] = entry
+    return entry[1]
 
-    print (
-      "WARNING: Unhandled dependency conflict for %s (expecting version '%s')" % (
+  def _addVersion (self, name, version):
+    """ Adds given version to the sorted versions of given package, unless
+    it is already there
+    """
+    versions = self._versions.get (name, [])
+    keys = self._getKeys (name, versions)
+    key = vercmp.getCanonical (version)
+
+    i = bisect.bisect_left (keys, key)
+    while (i < len (keys)) and (keys[i] == key):
+      if versions[i] == version:
+        return
+      i += 1
+
+    # lists are replaced instead of changed, so lookups need no lock
+    versions = versions[:i] + [version] + versions[i:]
+    keys = keys[:i] + [key] + keys[i:]
+    self._keys[name] = (versions, keys)
+    self._versions[name] = versions
+    return
+
+  def dependencyWarningOnce (self, coord, existingVersion, verbose = True):
+    """ Show a dependency warning once (see getWarnings), it is only
+    recorded when _verbose_ is not set
+    """
+    with self._lock:
+      if coord in self._warnings:
+        return
+
+      self._warnings.add (coord)
+
+      warning = MavenWarning (
+        MavenWarning.UNHANDLED_CONFLICT,
         coord,
-        existingVersion
+        existingVersion,
+        "WARNING: Unhandled dependency conflict for %s (expecting version '%s')" % (
+          coord,
+          existingVersion
+        )
       )
-    )
\ No newline at end of file
+      self._warningRecords.append (warning)
+
+    if verbose:
+      print (str (warning))
+    return
+
+  def getWarnings (self, kind = None):
+    """ Returns the list of warnings found (see MavenWarning), all of them
+    or only the ones of given kind
+    """
+    with self._lock:
+      return [w for w in self._warningRecords if (kind is None) or (w.kind == kind)]
+
+def _iterTreeLines (lines):
+  """ Generator of the coordinates of given dependency:tree output lines
+  (see MavenVersionDb.parseFile)
+  """
+  for line in lines:
+    line = line.strip()
+    if line.startswith ('#'):
+      continue
+
+    line = line.lstrip ('=|+- \\')
+    if len(line) == 0:
+      continue
+
+    yield _treeLineToCoord (line)
+  return
+
+# scopes found at the end of dependency:tree coordinates
+_TREE_SCOPES = ('compile', 'provided', 'runtime', 'test', 'system', 'import')
+
+def _treeLineToCoord (line):
+  """ Returns the coordinate of a dependency:tree output line without the
+  type and classifier (group:artifact:version[:scope]) by counting its
+  fields, which can be:
+
+    group:artifact:version (written by hand)
+    group:artifact:type[:classifier]:version (root line)
+    group:artifact:type[:classifier]:version:scope
+
+  Anything after the coordinate, such as "(optional)", is ignored.
+  """
+  fields = line.split ()[0].split (':')
+  if len (fields) == 4:
+    del fields[2]
+  elif (len (fields) == 5) and (fields[4] not in _TREE_SCOPES):
+    del fields[2:4]
+  elif len (fields) == 6:
+    del fields[2:4]
+  return ':'.join (fields)
+
+def _scanFile (path):
+  """ Returns a (versions, treeCoords) tuple with the (name, version) tuples
+  found in given POM or metadata file, or the coordinates found in given
+  dependency:tree output (see MavenVersionDb.importPaths).
+
+  It runs in worker processes, so files that cannot be read or parsed are
+  skipped.
+  """
+  versions = []
+  treeCoords = []
+  try:
+    with open (path, 'rb') as f:
+      data = f.read ()
+  except (IOError, OSError):
+    return (versions, treeCoords)
+
+  if not data.lstrip ().startswith ('<'):
+    for line in _iterTreeLines (data.splitlines ()):
+      try:
+        coord = MavenCoord (line)
+      except Exception:
+        continue
+
+      if coord.group and coord.artifact and coord.version:
+        treeCoords.append (coord.id)
+    return (versions, treeCoords)
+
+  try:
+    obj = xmltodict.parse (data)
+  except ExpatError:
+    return (versions, treeCoords)
+
+  if 'metadata' in obj:
+    metadata = obj['metadata'] or {}
+    versioning = metadata.get ('versioning') or {}
+    found = (versioning.get ('versions') or {}).get ('version') or []
+    if isinstance (found, basestring):
+      found = [found]
+
+    if metadata.get ('groupId') and metadata.get ('artifactId'):
+      name = metadata['groupId'] + ':' + metadata['artifactId']
+      versions = [(name, v) for v in found if v]
+
+  elif 'project' in obj:
+    project = obj['project'] or {}
+    parent = project.get ('parent') or {}
+    group = project.get ('groupId') or parent.get ('groupId')
+    version = project.get ('version') or parent.get ('version')
+    artifact = project.get ('artifactId')
+
+    # versions with properties cannot be known without the parents
+    if group and artifact and version and ('${' not in version):
+      versions = [(group + ':' + artifact, version)]
+
+  return (versions, treeCoords)
+
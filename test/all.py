@@ -9,6 +9,12 @@ from mavenparsertest import MavenParserTest
 from mavenversiondbtest import MavenVersionDbTest
 from mavenversioncmptest import MavenVersionCompareTest
 from mavenrepotest import MavenRepoTest
+from mavenpropertiestest import MavenPropertiesTest
+from mavenprofiletest import MavenProfileTest
+from mavenexclusionstest import MavenExclusionsTest
+from mavengraphtest import MavenGraphTest
+from mavenreporttest import MavenReportTest
+from mavenstatstest import MavenStatsTest
 
 def suite():
   return unittest.TestSuite([
@@ -16,7 +22,13 @@ def suite():
     unittest.TestLoader().loadTestsFromTestCase (MavenParserTest),
     unittest.TestLoader().loadTestsFromTestCase (MavenVersionDbTest),
     unittest.TestLoader().loadTestsFromTestCase (MavenVersionCompareTest),
-    unittest.TestLoader().loadTestsFromTestCase (MavenRepoTest)
+    unittest.TestLoader().loadTestsFromTestCase (MavenRepoTest),
+    unittest.TestLoader().loadTestsFromTestCase (MavenPropertiesTest),
+    unittest.TestLoader().loadTestsFromTestCase (MavenProfileTest),
+    unittest.TestLoader().loadTestsFromTestCase (MavenExclusionsTest),
+    unittest.TestLoader().loadTestsFromTestCase (MavenGraphTest),
+    unittest.TestLoader().loadTestsFromTestCase (MavenReportTest),
+    unittest.TestLoader().loadTestsFromTestCase (MavenStatsTest)
   ])
 
 if __name__ == '__main__':
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Benchmarks (not part of the test suite), run them as:
+#
+#   python mavenbenchmark.py
+#
+import os,sys
+import time
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+from mavendeps import MavenDep, MavenDeps
+from mavengraph import MavenGraph
+import mavenversioncmp as vercmp
+
+def buildTree (nodes = 10000, branching = 10, artifacts = 5000):
+  """ Builds a synthetic tree of dependencies with given number of nodes,
+  where the same artifacts are found several times (duplicates)
+  """
+  deps = MavenDeps ('bench:root:jar:1.0:compile')
+  pending = [deps.root]
+  total = 0
+  while total < nodes:
+    parent = pending.pop (0)
+    for i in range (branching):
+      n = (total * 7919) % artifacts
+      dep = MavenDep ('bench.g%d:a%d:jar:1.%d:compile' % (n % 50, n, n % 3))
+      parent.add (dep)
+      pending.append (dep)
+      total += 1
+  return deps
+
+def sizeOf (obj):
+  """ Approximate number of bytes used by the object and its attributes
+  """
+  size = sys.getsizeof (obj)
+  if hasattr (obj, '__dict__'):
+    size += sys.getsizeof (obj.__dict__)
+  return size
+
+def treeSize (deps):
+  """ Approximate number of bytes used by the dependencies and coordinates
+  of the tree (strings are not taken into account)
+  """
+  size = 0
+  coords = set()
+  for (dep, depth, path) in deps.root.walk ():
+    size += sizeOf (dep) + sys.getsizeof (dep.deps)
+    if id (dep.coord) not in coords:
+      coords.add (id (dep.coord))
+      size += sizeOf (dep.coord)
+  return size
+
+def timeIt (name, fn, repeat = 5):
+  best = None
+  for i in range (repeat):
+    start = time.time ()
+    fn ()
+    elapsed = time.time () - start
+    best = elapsed if (best is None) else min (best, elapsed)
+  print "%-32s %8.2f ms" % (name, best * 1000)
+  return best
+
+def benchmarkTree ():
+  """ Memory and throughput of a 10k nodes tree
+  """
+  deps = buildTree ()
+  print "tree with %d nodes: ~%d KB" % (deps.count (), treeSize (deps) / 1024)
+  print "coordinate objects: %d" % len (set ([
+    id (dep.coord) for (dep, depth, path) in deps.root.walk ()
+  ]))
+
+  timeIt ('build', buildTree)
+  timeIt ('flatten ids', lambda: deps.getFlattenCoordFullIds (skipOptional = False))
+  timeIt ('name keys', lambda: [d.coord.name for d in deps.iterFlattenDeps ()])
+  timeIt ('clone + resolve', lambda: deps.clone ().resolve (scope = 'compile'))
+  return
+
+def graphSize (graph):
+  """ Approximate number of bytes used by the columns of the graph
+  """
+  size = 0
+  for column in [
+    graph.nodeCoords, graph.nodeScopes, graph.nodeOptional,
+    graph.edgeStart, graph.edges, graph.exclusionStart, graph.exclusions
+  ]:
+    size += sys.getsizeof (column)
+  return size
+
+def benchmarkGraph ():
+  """ Memory and throughput of the columnar graph for a 10k nodes tree
+  """
+  deps = buildTree ()
+  graph = MavenGraph.fromDeps (deps)
+  print "graph with %d nodes: ~%d KB" % (len (graph), graphSize (graph) / 1024)
+
+  timeIt ('graph from deps', lambda: MavenGraph.fromDeps (deps))
+  timeIt ('graph flatten', lambda: list (graph.iterFlatten (skipOptional = False)))
+  timeIt ('graph resolve', lambda: graph.resolve (scope = 'compile'))
+  timeIt ('graph to deps', graph.toDeps)
+  return
+
+def benchmarkVersions ():
+  """ Version comparisons with and without memoised parsing
+  """
+  versions = [
+    '%d.%d.%d%s' % (major, minor, revision, qualifier)
+    for major in range (3)
+    for minor in range (4)
+    for revision in range (3)
+    for qualifier in ['', '-SNAPSHOT', '-beta-2']
+  ]
+  pairs = [(a, b) for a in versions for b in versions][:20000]
+
+  def parsingAlways ():
+    for (a, b) in pairs:
+      cmp (vercmp._parseCanonical (a), vercmp._parseCanonical (b))
+
+  def memoised ():
+    for (a, b) in pairs:
+      vercmp.compare (a, b)
+
+  timeIt ('compare (parsing always)', parsingAlways)
+  timeIt ('compare (memoised)', memoised)
+  timeIt ('sort with VersionKey', lambda: sorted (versions * 20, key = vercmp.VersionKey))
+  return
+
+if __name__ == '__main__':
+  benchmarkTree ()
+  benchmarkGraph ()
+  benchmarkVersions ()
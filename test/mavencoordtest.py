@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*- 
+import copy
 import os,sys
+import pickle
 import unittest
 
 sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
 
-from mavencoord import MavenCoord
+from mavencoord import MavenCoord, MavenFrozenCoord, MavenCoordPool
+import mavencoord
 
 class MavenCoordTest (unittest.TestCase):
 
@@ -108,6 +111,88 @@ class MavenCoordTest (unittest.TestCase):
     self.assertNotEquals (ga1.name,  ca1.name)
     return
 
+  def testExpand (self):
+    m = MavenCoord ('${g}:${a}-api:${v}:test')
+    m.expand ({ 'g' : 'org.g', 'a' : 'art', 'v' : '1.0' })
+    self.assertEquals (m.full, 'org.g:art-api:jar:1.0:test')
+
+    m = MavenCoord ('g:a:${unknown}')
+    m.expand ({ 'v' : '1.0' })
+    self.assertEquals (m.id, 'g:a:${unknown}')
+    return
+
+  def testKeysAreUpdated (self):
+    m = MavenCoord ('g:a:1.0:test')
+    self.assertEquals ((m.name, m.id, m.full), ('g:a', 'g:a:1.0', 'g:a:jar:1.0:test'))
+
+    m.version = '2.0'
+    self.assertEquals ((m.name, m.id, m.full), ('g:a', 'g:a:2.0', 'g:a:jar:2.0:test'))
+
+    m.group = 'h'
+    m.scope = 'compile'
+    self.assertEquals ((m.name, m.id, m.full), ('h:a', 'h:a:2.0', 'h:a:jar:2.0:compile'))
+
+    # components are interned
+    self.assertTrue (MavenCoord ('g:' + 'a' * 2).artifact is MavenCoord ('g:aa').artifact)
+    self.assertRaises (AttributeError, setattr, m, 'other', 1)
+    return
+
+  def testFrozenCoords (self):
+    pool = MavenCoordPool ()
+    a = pool.get ('g:a:1.0:test')
+    self.assertTrue (pool.get (MavenCoord ('g:a:1.0:test')) is a)
+    self.assertTrue (pool.get (a) is a)
+    self.assertEquals (len (pool), 1)
+
+    self.assertEquals ((a.name, a.id, a.full), ('g:a', 'g:a:1.0', 'g:a:jar:1.0:test'))
+    self.assertRaises (AttributeError, setattr, a, 'version', '2.0')
+
+    # hashable and comparable
+    self.assertEquals (set ([a, pool.get ('g:a:1.0:test')]), set ([a]))
+    self.assertEquals (a, MavenFrozenCoord (MavenCoord ('g:a:1.0:test')))
+    self.assertNotEquals (a, MavenCoordPool.getDefault ().get ('g:a:2.0:test'))
+
+    # modifications return canonical instances
+    b = a.withValues (version = '2.0')
+    self.assertEquals (b.full, 'g:a:jar:2.0:test')
+    self.assertTrue (b is MavenCoord ('g:a:2.0:test').freeze ())
+    self.assertTrue (a.withValues (version = '1.0') is a)
+    self.assertEquals (a.expanded ({}), a)
+    self.assertEquals (MavenCoord ('g:a:${v}').freeze ().expanded ({ 'v' : '3' }).id, 'g:a:3')
+    self.assertEquals (MavenCoord ('g:a:1').freeze ().resolved ().scope, 'compile')
+
+    # mutable copies
+    m = a.thaw ()
+    m.version = '3.0'
+    self.assertEquals ((a.version, m.version), ('1.0', '3.0'))
+    return
+
+  def testCopyAndPickleFrozenCoords (self):
+    a = MavenCoordPool.getDefault ().get ('g:a:1.0:test')
+    self.assertTrue (copy.copy (a) is a)
+    self.assertTrue (copy.deepcopy ([a, a])[0] is a)
+
+    for protocol in range (pickle.HIGHEST_PROTOCOL + 1):
+      self.assertTrue (pickle.loads (pickle.dumps (a, protocol)) is a)
+
+    # mutable coordinates are copied
+    m = MavenCoord ('g:a:2.0:runtime')
+    for c in [copy.deepcopy (m), pickle.loads (pickle.dumps (m))]:
+      self.assertFalse (c is m)
+      self.assertEquals (c.full, 'g:a:jar:2.0:runtime')
+    return
+
+  def testInternedStringsAreBounded (self):
+    for i in range (mavencoord._STRINGS_SIZE + 10):
+      self.assertEquals (MavenCoord ('g:a:%d' % i).version, str (i))
+
+    self.assertTrue (len (mavencoord._strings) <= mavencoord._STRINGS_SIZE)
+
+    # the strings in use are interned again
+    coord = MavenCoord ('group:artifact:1')
+    self.assertTrue (MavenCoord ('group:artifact:2').group is coord.group)
+    return
+
   def testIsContained (self):
     self.assertTrue (MavenCoord('A:B').isContained ('A:B'))
     self.assertTrue (MavenCoord('A:B:1.0').isContained ('A:B'))
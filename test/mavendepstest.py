@@ -1,6 +1,8 @@
 #/usr/bin/env python
 # -*- coding: utf-8 -*- 
+import copy
 import os,sys
+import pickle
 import unittest
 
 sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
@@ -123,5 +125,409 @@ class MavenParserTest (unittest.TestCase):
     )
     return 
 
+  def testDepsResolveNearestWins (self):
+    """ Test that the dependency closest to the root wins
+    """
+    depsA = MavenDeps('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsC = MavenDep ('C:C:jar:1:compile')
+    depsE = MavenDep ('E:E:jar:1:compile')
+    depsF = MavenDep ('F:F:jar:1:compile')
+    depsE2 = MavenDep ('E:E:jar:1:default')
+
+    # A->B->C->E:compile
+    # |  |
+    # |  +->F->E:default
+    # |
+    # +->C
+    depsC.add (depsE)
+    depsB.add (depsC)
+    depsF.add (depsE2)
+    depsB.add (depsF)
+    depsA.add (depsB)
+    depsA.add (MavenDep ('C:C:jar:1:compile'))
+
+    depsA.resolve(scope = ['compile', 'default'])
+
+    # C is placed under A (first level), so E is placed under F
+    self.assertEquals (
+      repr (depsA),
+      "A:A:jar:1:compile\n"
+      "  B:B:jar:1:compile\n"
+      "    F:F:jar:1:compile\n"
+      "      E:E:jar:1:compile\n"
+      "  C:C:jar:1:compile"
+    )
+    return
+
+  def testDepsResolveAcrossBranches (self):
+    """ Test that siblings are placed before going down to their children,
+    one branch after the other, so a dependency found in a deeper level of
+    the first branch is placed there even if it is nearer in a later one
+    """
+    depsA = MavenDeps('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsC = MavenDep ('C:C:jar:1:compile')
+    depsD = MavenDep ('D:D:jar:1:compile')
+
+    # A->B->C->X
+    # |
+    # +->D->X
+    #    |
+    #    +->Y
+    depsC.add (MavenDep ('X:X:jar:1:compile'))
+    depsB.add (depsC)
+    depsD.add (MavenDep ('X:X:jar:1:compile'))
+    depsD.add (MavenDep ('Y:Y:jar:1:compile'))
+    depsA.add (depsB)
+    depsA.add (depsD)
+
+    depsA.resolve(scope = 'compile')
+
+    self.assertEquals (
+      repr (depsA),
+      "A:A:jar:1:compile\n"
+      "  B:B:jar:1:compile\n"
+      "    C:C:jar:1:compile\n"
+      "      X:X:jar:1:compile\n"
+      "  D:D:jar:1:compile\n"
+      "    Y:Y:jar:1:compile"
+    )
+    return
+
+  def testCloneSharesUntilModified (self):
+    """ Test that clones share dependencies and only copy modified paths
+    """
+    depsA = MavenDeps('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:${b.version}:compile')
+    depsC = MavenDep ('C:C:jar:1:compile')
+    depsD = MavenDep ('D:D')
+    depsE = MavenDep ('E:E:jar:1:test')
+
+    # A->B->C
+    # |
+    # +->D->E
+    depsB.add (depsC)
+    depsD.add (depsE)
+    depsA.add (depsB)
+    depsA.add (depsD)
+
+    original = repr (depsA)
+    clone = depsA.clone ()
+    self.assertTrue (clone.root.children[0] is depsB)
+    self.assertTrue (clone.root.children[1] is depsD)
+
+    # expanding copies B but keeps sharing D subtree
+    clone.expand ({ 'b.version' : '2' })
+    self.assertEquals (clone.root.children[0].coord.id, 'B:B:2')
+    self.assertTrue (clone.root.children[0].children[0] is depsC)
+    self.assertTrue (clone.root.children[1] is depsD)
+
+    # version management copies the path to D only
+    management = MavenDeps ()
+    management.add (MavenDep ('D:D:jar:3:runtime'))
+    clone.updateVersionsAndScope (management)
+    self.assertEquals (clone.root.children[1].coord.full, 'D:D:jar:3:runtime')
+    self.assertTrue (clone.root.children[1].children[0] is depsE)
+
+    clone.resolve (scope = ['compile', 'runtime'])
+    self.assertEquals (
+      clone.getFlattenCoordFullIds (),
+      ['B:B:jar:2:compile', 'C:C:jar:1:compile', 'D:D:jar:3:runtime']
+    )
+
+    # original tree is left untouched
+    self.assertEquals (repr (depsA), original)
+
+    # merged dependencies are shared as well
+    merged = MavenDeps ('M:M')
+    merged.merge (depsA)
+    merged.resolve (scope = 'test')
+    self.assertEquals (merged.getFlattenCoordFullIds (), [])
+    self.assertEquals (repr (depsA), original)
+    return
+
+  def testModifyFoundDepsOfClone (self):
+    """ Test that dependencies found in a clone can be modified without
+    modifying the original tree
+    """
+    # A->B->C
+    depsA = MavenDeps('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsB.add (MavenDep ('C:C:jar:1:compile'))
+    depsA.add (depsB)
+
+    original = repr (depsA)
+    clone = depsA.clone ()
+    clone.find ('B:B:1').add (MavenDep ('Z:Z:jar:1:compile'))
+    clone.find ('C:C:1').addCoordToExclude ('X:X')
+    clone.root.find ('C:C:1').add (MavenDep ('Y:Y:jar:1:compile'))
+
+    self.assertEquals (repr (depsA), original)
+    self.assertEquals (
+      repr (clone),
+      "A:A:jar:1:compile\n"
+      "  B:B:jar:1:compile\n"
+      "    C:C:jar:1:compile\n"
+      "      Y:Y:jar:1:compile\n"
+      "      <<< X:X:jar::default\n"
+      "    Z:Z:jar:1:compile"
+    )
+    self.assertEquals (clone.find ('Z:Z:1').coord.full, 'Z:Z:jar:1:compile')
+    self.assertEquals (clone.find ('Y:Y:1').coord.full, 'Y:Y:jar:1:compile')
+
+    # the original tree copies what it modifies as well
+    depsA.find ('C:C:1').add (MavenDep ('W:W:jar:1:compile'))
+    self.assertEquals (depsA.getFlattenCoordIds (), ['B:B:1', 'C:C:1', 'W:W:1'])
+    self.assertEquals (clone.find ('W:W:1'), None)
+    return
+
+  def testModifyDepsOfClone (self):
+    """ Test that the dependencies of a clone or a merged tree can be
+    modified through MavenDep without modifying the original tree
+    """
+    # A->B->C
+    depsA = MavenDeps('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsB.add (MavenDep ('C:C:jar:1:compile'))
+    depsA.add (depsB)
+
+    original = repr (depsA)
+    clone = depsA.clone ()
+    clone.root.deps[0].add (MavenDep ('Z:Z:jar:1:compile'))
+    clone.root.deps[0].deps[0].addCoordToExclude ('X:X')
+    self.assertEquals (repr (depsA), original)
+    self.assertEquals (clone.find ('Z:Z:1').coord.id, 'Z:Z:1')
+
+    merged = MavenDeps ('M:M:jar:1:compile')
+    merged.merge (depsA)
+    merged.root.deps[0].add (MavenDep ('Y:Y:jar:1:compile'))
+    self.assertEquals (repr (depsA), original)
+
+    # and the other way around
+    depsA.root.deps[0].deps[0].add (MavenDep ('W:W:jar:1:compile'))
+    self.assertEquals (merged.getFlattenCoordIds (), ['B:B:1', 'C:C:1', 'Y:Y:1'])
+    self.assertEquals (clone.find ('W:W:1'), None)
+    return
+
+  def testCopyAndPickle (self):
+    """ Test that trees can be deep copied and pickled, keeping the shared
+    dependencies shared
+    """
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsB.add (MavenDep ('C:C:jar:1:compile'))
+    depsB.addCoordToExclude ('X:X')
+    depsA.add (depsB)
+    depsA.add (depsB.share ())
+
+    # indexes are not copied, the copies build their own
+    self.assertEquals (depsA.find ('A:A:1').coord.id, 'A:A:1')
+
+    for copied in [
+      copy.deepcopy (depsA),
+      pickle.loads (pickle.dumps (depsA)),
+      pickle.loads (pickle.dumps (depsA, pickle.HIGHEST_PROTOCOL))
+    ]:
+      self.assertEquals (repr (copied), repr (depsA))
+      self.assertTrue (copied.root.children[0] is copied.root.children[1])
+      self.assertTrue (copied.root.children[0].coord is depsB.coord)
+
+      copied.find ('C:C:1').add (MavenDep ('D:D:jar:1:compile'))
+      self.assertEquals (copied.find ('D:D:1').coord.id, 'D:D:1')
+      self.assertEquals (depsA.find ('D:D:1'), None)
+    return
+
+  def testResolvedDepsAreShared (self):
+    """ Test that resolving keeps sharing the dependencies not affected
+    """
+    # C->D->E
+    depsC = MavenDeps ('C:C:jar:1:compile')
+    depsD = MavenDep ('D:D:jar:1:compile')
+    depsD.add (MavenDep ('E:E:jar:1:compile'))
+    depsC.add (depsD)
+    depsC.resolve (scope = 'compile')
+
+    # A->C->(D->E)
+    # |
+    # +->B->C->(D->E)
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    for parent in [depsA.root, depsB]:
+      depC = MavenDep ('C:C:jar:1:compile')
+      depC.deps += [dep.share () for dep in depsC.root.children]
+      parent.add (depC)
+    depsA.add (depsB)
+
+    self.assertEquals (depsA.count (), 7)
+
+    depsA.resolve (scope = 'compile')
+
+    self.assertEquals (
+      depsA.getFlattenCoordIds (),
+      ['C:C:1', 'D:D:1', 'E:E:1', 'B:B:1']
+    )
+
+    # D subtree is the same object in both trees
+    self.assertTrue (depsA.root.children[0].children[0] is depsD)
+    self.assertTrue (depsC.root.children[0] is depsD)
+    self.assertEquals (depsC.getFlattenCoordIds (), ['D:D:1', 'E:E:1'])
+    return
+
+  def testWalk (self):
+    """ Test pre-order and breadth-first traversals
+    """
+    # A->B->C
+    # |  |
+    # |  +->D (optional)
+    # |
+    # +->E
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsB.add (MavenDep ('C:C:jar:1:compile'))
+    depsB.add (MavenDep ('D:D:jar:1:compile', optional = True))
+    depsA.add (depsB)
+    depsA.add (MavenDep ('E:E:jar:1:compile'))
+
+    self.assertEquals (
+      [(d.coord.artifact, depth, path) for (d, depth, path) in depsA.root.walk ()],
+      [('A', 0, ()), ('B', 1, (0,)), ('C', 2, (0, 0)), ('D', 2, (0, 1)), ('E', 1, (1,))]
+    )
+
+    self.assertEquals (
+      [d.coord.artifact for (d, depth, path) in depsA.root.walk (breadthFirst = True)],
+      ['A', 'B', 'E', 'C', 'D']
+    )
+
+    self.assertEquals (
+      [d.coord.artifact for d in depsA.root.iterFlatten (breadthFirst = True)],
+      ['B', 'E', 'C']
+    )
+
+    self.assertEquals (
+      [c.id for c in depsA.iterFlattenCoords (skipOptional = False)],
+      ['B:B:1', 'C:C:1', 'D:D:1', 'E:E:1']
+    )
+
+    self.assertTrue (depsA.getWritableDep ([0, 1]).optional)
+    return
+
+  def testDeepTree (self):
+    """ Test that deep trees do not hit the recursion limit
+    """
+    depth = sys.getrecursionlimit () * 2
+    deps = MavenDeps ('root:root:jar:1:compile')
+    dep = deps.root
+    for i in range (depth):
+      child = MavenDep ('g:a%d:jar:${v}:default' % i)
+      dep.add (child)
+      dep = child
+
+    deps.expand ({ 'v' : '1' })
+    deps.resolve (scope = ['compile', 'default'])
+
+    self.assertEquals (deps.count (), depth)
+    self.assertEquals (len (deps.getFlattenDeps ()), depth)
+    self.assertEquals (deps.find ('g:a%d:1' % (depth - 1)).coord.scope, 'compile')
+    self.assertTrue (deps.root.find ('g:a%d:1' % (depth - 1)) is deps.find ('g:a%d:1' % (depth - 1)))
+    self.assertTrue (deps.root.find ('root:root:1') is deps.root)
+    self.assertEquals (len (repr (deps).split ('\n')), depth + 1)
+    return
+
+  def testFindIndex (self):
+    """ Test that lookups are consistent after modifying the tree
+    """
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsB.add (MavenDep ('C:C:jar:1:test'))
+    depsA.add (depsB)
+
+    self.assertTrue (depsA.find ('A:A:1') is depsA.root)
+    self.assertEquals (depsA.find ('C:C:1').coord.scope, 'test')
+    self.assertEquals (depsA.find ('D:D:1'), None)
+
+    depsA.add (MavenDep ('D:D:jar:1:compile'))
+    self.assertEquals (depsA.find ('D:D:1').coord.id, 'D:D:1')
+
+    depsE = MavenDeps ('E:E:jar:1:compile')
+    depsE.add (MavenDep ('E2:E2:jar:1:compile'))
+    depsA.merge (depsE)
+    self.assertEquals (depsA.find ('E2:E2:1').coord.id, 'E2:E2:1')
+
+    depsA.resolve (scope = 'compile')
+    self.assertEquals (depsA.find ('C:C:1'), None)
+    self.assertEquals (depsA.find ('D:D:1').coord.id, 'D:D:1')
+
+    # changes made through the dependencies are noticed as well
+    depsA.root.deps[0].add (MavenDep ('F:F:jar:1:compile'))
+    self.assertEquals (depsA.find ('F:F:1').coord.id, 'F:F:1')
+
+    depsA.getWritableDep ([0]).deps[0].add (MavenDep ('G:G:jar:1:compile'))
+    self.assertEquals (depsA.find ('G:G:1').coord.id, 'G:G:1')
+
+    # but changes made to other trees do not invalidate the index
+    index = depsA._indexes['id']
+    depsE.root.add (MavenDep ('H:H:jar:1:compile'))
+    depsE.resolve ()
+    self.assertEquals (depsA.find ('G:G:1').coord.id, 'G:G:1')
+    self.assertTrue (depsA._indexes['id'] is index)
+    return
+
+  def testFindSharedAfterChanges (self):
+    """ Test that changes made to a dependency shared by several trees are
+    noticed by all of them, not only by the last one that indexed it
+    """
+    # A->B and its clone, both sharing B
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsA.add (depsB.share ())
+
+    self.assertEquals (depsA.find ('C:C:1'), None)
+    clone = depsA.clone ()
+    self.assertEquals (clone.find ('C:C:1'), None)
+
+    # B->C
+    depsB.add (MavenDep ('C:C:jar:1:compile'))
+    self.assertEquals (depsA.find ('C:C:1').coord.id, 'C:C:1')
+    self.assertEquals (clone.find ('C:C:1').coord.id, 'C:C:1')
+
+    # copies index their own dependencies
+    copied = pickle.loads (pickle.dumps (depsA))
+    self.assertEquals (copied.find ('D:D:1'), None)
+    copied.root.children[0].add (MavenDep ('D:D:jar:1:compile'))
+    self.assertEquals (copied.find ('D:D:1').coord.id, 'D:D:1')
+    self.assertEquals (depsA.find ('D:D:1'), None)
+    return
+
+  def testUpdateVersionsAndScope (self):
+    """ Test that managed dependencies are applied by name
+    """
+    management = MavenDeps ()
+    management.add (MavenDep ('B:B:jar:2:test'))
+    management.add (MavenDep ('C:C:jar:3:compile'))
+
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar::default')
+    depsB.add (MavenDep ('C:C:jar:1:default'))
+    depsA.add (depsB)
+    depsA.add (MavenDep ('D:D:jar::default'))
+
+    depsA.updateVersionsAndScope (management)
+
+    self.assertEquals (
+      depsA.getFlattenCoordFullIds (),
+      ['B:B:jar:2:test', 'C:C:jar:1:compile', 'D:D:jar::default']
+    )
+
+    management.add (MavenDep ('D:D:jar:4:runtime'))
+    depsA.updateVersionsAndScope (management)
+    self.assertEquals (depsA.find ('D:D:4').coord.scope, 'runtime')
+
+    # the index of the managed dependencies is kept
+    index = management.getNameIndex ()
+    depsA.updateVersionsAndScope (management)
+    self.assertTrue (management.getNameIndex () is index)
+    return
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os,sys
+import unittest
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+from mavencoord import MavenCoord
+from mavendeps import MavenDep, MavenDeps
+from mavenexclusions import MavenExclusions
+
+class MavenExclusionsTest (unittest.TestCase):
+
+  def testExcludesByName (self):
+    exclusions = MavenExclusions (['A:B', 'C:D:1.0'])
+    self.assertTrue (exclusions.excludes (MavenCoord ('A:B:1.0')))
+    self.assertTrue (exclusions.excludes (MavenCoord ('C:D:2.0')))
+    self.assertFalse (exclusions.excludes (MavenCoord ('A:C:1.0')))
+    self.assertTrue (MavenExclusions.EMPTY.empty ())
+    self.assertFalse (exclusions.empty ())
+    return
+
+  def testWildcards (self):
+    byGroup = MavenExclusions ([{ 'groupId' : 'A', 'artifactId' : '*' }])
+    self.assertTrue (byGroup.excludes (MavenCoord ('A:X:1.0')))
+    self.assertFalse (byGroup.excludes (MavenCoord ('B:X:1.0')))
+
+    byArtifact = MavenExclusions (['*:X'])
+    self.assertTrue (byArtifact.excludes (MavenCoord ('B:X:1.0')))
+    self.assertFalse (byArtifact.excludes (MavenCoord ('B:Y:1.0')))
+
+    everything = MavenExclusions (['*:*'])
+    self.assertTrue (everything.excludes (MavenCoord ('B:Y:1.0')))
+
+    # empty groups or artifacts are not wildcards
+    noGroup = MavenExclusions ([{ 'artifactId' : 'X' }])
+    self.assertFalse (noGroup.excludes (MavenCoord ('B:X:1.0')))
+    self.assertTrue (noGroup.excludes (MavenCoord (':X:1.0')))
+
+    noArtifact = MavenExclusions ([{ 'groupId' : 'A' }])
+    self.assertFalse (noArtifact.excludes (MavenCoord ('A:X:1.0')))
+    self.assertFalse (noArtifact.empty ())
+    return
+
+  def testExtendIsShared (self):
+    parent = MavenExclusions (['A:B'])
+    self.assertTrue (parent.extend ([]) is parent)
+
+    child = parent.extend (['C:D', 'G:*'])
+    self.assertTrue (child.excludes (MavenCoord ('A:B:1')))
+    self.assertTrue (child.excludes (MavenCoord ('C:D:1')))
+    self.assertTrue (child.excludes (MavenCoord ('G:H:1')))
+
+    # the parent is not modified
+    self.assertFalse (parent.excludes (MavenCoord ('C:D:1')))
+    self.assertFalse (parent.excludes (MavenCoord ('G:H:1')))
+
+    self.assertEquals (
+      child.getKey (),
+      MavenExclusions (['G:*', 'C:D', 'A:B']).getKey ()
+    )
+
+    grandChild = child.extend (['*:*'])
+    self.assertTrue (grandChild.excludes (MavenCoord ('X:Y:1')))
+    self.assertFalse (child.excludes (MavenCoord ('X:Y:1')))
+
+    # inherited exclusions are merged, sets excluding nothing new are reused
+    self.assertEquals (child._names, frozenset (['A:B', 'C:D']))
+    self.assertEquals (child._groups, frozenset (['G']))
+    self.assertTrue (child.extend (['A:B', 'C:D:2']) is child)
+    self.assertTrue (grandChild.extend (['X:Z']) is grandChild)
+    return
+
+  def testResolveWithWildcards (self):
+    # A->B->C->D
+    # |  |
+    # |  +->E (B excludes *:*)
+    # |
+    # +->F->G (F excludes G:*)
+    depsA = MavenDeps ('A:A:jar:1:compile')
+    depsB = MavenDep ('B:B:jar:1:compile')
+    depsC = MavenDep ('C:C:jar:1:compile')
+    depsC.add (MavenDep ('D:D:jar:1:compile'))
+    depsB.add (depsC)
+    depsB.add (MavenDep ('E:E:jar:1:compile'))
+    depsB.addCoordToExclude ('*:*')
+    depsF = MavenDep ('F:F:jar:1:compile')
+    depsF.add (MavenDep ('G:G:jar:1:compile'))
+    depsF.addCoordToExclude ({ 'groupId' : 'G', 'artifactId' : '*' })
+    depsA.add (depsB)
+    depsA.add (depsF)
+
+    depsA.resolve (scope = 'compile')
+
+    self.assertEquals (depsA.getFlattenCoordIds (), ['B:B:1', 'F:F:1'])
+    return
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os,sys
+import random
+import unittest
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+from mavendeps import MavenDep, MavenDeps
+from mavengraph import MavenGraph
+
+class MavenGraphTest (unittest.TestCase):
+
+  def _randomDeps (self, seed, nodes = 300):
+    """ Random tree with duplicates, conflicting scopes, optional
+    dependencies, exclusions and shared dependencies
+    """
+    rnd = random.Random (seed)
+    scopes = ['default', 'compile', 'runtime', 'test', 'provided']
+
+    deps = MavenDeps ('root:root:jar:1:compile')
+    all = [deps.root]
+    shared = 0
+    for i in range (nodes):
+      p = rnd.randrange (min (len (all), 1 + i // 2))
+      parent = all[p]
+      if (shared < 10) and (rnd.random () < 0.1) and (len (all) > p + 1):
+        # only nodes created after the parent, so there are no cycles
+        parent.add (rnd.choice (all[p + 1:]).share ())
+        shared += 1
+        continue
+
+      n = rnd.randrange (nodes // 3)
+      dep = MavenDep (
+        'g%d:a%d:jar:1:%s' % (n % 7, n, rnd.choice (scopes)),
+        optional = (rnd.random () < 0.1)
+      )
+      if rnd.random () < 0.1:
+        n = rnd.randrange (nodes // 3)
+        dep.addCoordToExclude ('g%d:a%d' % (n % 7, n))
+      if rnd.random () < 0.02:
+        dep.addCoordToExclude ('g%d:*' % rnd.randrange (7))
+
+      parent.add (dep)
+      all.append (dep)
+    return deps
+
+  def testFromAndToDeps (self):
+    deps = self._randomDeps (1)
+    graph = MavenGraph.fromDeps (deps)
+
+    self.assertEquals (
+      graph.getFlattenCoordFullIds (skipOptional = False),
+      deps.getFlattenCoordFullIds (skipOptional = False)
+    )
+    self.assertEquals (
+      graph.getFlattenCoordFullIds (),
+      deps.getFlattenCoordFullIds ()
+    )
+    self.assertEquals (repr (graph.toDeps ()), repr (deps))
+
+    # shared dependencies are stored once
+    self.assertTrue (len (graph) < deps.count () + 1)
+    return
+
+  def testFind (self):
+    deps = self._randomDeps (2)
+    graph = MavenGraph.fromDeps (deps)
+
+    for coord in ['root:root:1'] + deps.getFlattenCoordIds (skipOptional = False):
+      self.assertEquals (graph.getCoord (graph.find (coord)), deps.find (coord).coord)
+
+    self.assertEquals (graph.find ('not:found:1'), None)
+    return
+
+  def testResolveAsDeps (self):
+    for seed in range (20):
+      for scope in [None, 'compile', ['compile', 'default', 'runtime']]:
+        deps = self._randomDeps (seed)
+        graph = MavenGraph.fromDeps (deps).resolve (scope)
+
+        deps.resolve (scope)
+        self.assertEquals (repr (graph.toDeps ()), repr (deps))
+    return
+
+  def testResolveAcrossBranches (self):
+    # A->B->C->X
+    # |
+    # +->D->X
+    #    |
+    #    +->Y
+    deps = MavenDeps ('A:A:jar:1:compile')
+    depB = MavenDep ('B:B:jar:1:compile')
+    depC = MavenDep ('C:C:jar:1:compile')
+    depD = MavenDep ('D:D:jar:1:compile')
+    depC.add (MavenDep ('X:X:jar:1:compile'))
+    depB.add (depC)
+    depD.add (MavenDep ('X:X:jar:1:compile'))
+    depD.add (MavenDep ('Y:Y:jar:1:compile'))
+    deps.add (depB)
+    deps.add (depD)
+
+    graph = MavenGraph.fromDeps (deps).resolve ('compile')
+    deps.resolve ('compile')
+
+    # X is placed in the first branch, as MavenDeps does
+    self.assertEquals (repr (graph.toDeps ()), repr (deps))
+    self.assertEquals (
+      graph.getFlattenCoordFullIds (),
+      [
+        'B:B:jar:1:compile',
+        'C:C:jar:1:compile',
+        'X:X:jar:1:compile',
+        'D:D:jar:1:compile',
+        'Y:Y:jar:1:compile'
+      ]
+    )
+    return
+
+if __name__ == '__main__':
+  unittest.main()
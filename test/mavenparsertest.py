@@ -7,6 +7,7 @@ sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
 
 from mavencoord import MavenCoord
 from mavendeps import MavenDep, MavenDeps
+from mavenprofile import MavenProfile
 import mavenparser 
 
 class MavenParserTest (unittest.TestCase):
@@ -226,6 +227,208 @@ class MavenParserTest (unittest.TestCase):
     )
 
 
+  def testIncrementalExpand (self):
+    """ Test that changing properties after an expansion updates properties
+    and coordinates depending on them
+    """
+    mvn = mavenparser.parseFile ('data/org.apache.cxf/cxf-parent-3.0.2.pom')
+    mvn.merge (mavenparser.parseFile ('data/org.apache.cxf/cxf-3.0.2.pom'))
+    mvn.expand ()
+
+    self.assertEquals (
+      mvn.depsManagement.find ('com.sun.xml.bind:jaxb-impl:2.1.14').coord.id,
+      'com.sun.xml.bind:jaxb-impl:2.1.14'
+    )
+
+    variant = mvn.clone ()
+    variant.setProperty ('cxf.jaxb21.impl.version', '2.1.99')
+    variant.setProperty ('cxf.asm.groupId', 'org.ow2.asm')
+    variant.expand ()
+
+    self.assertEquals (variant.properties['cxf.jaxb.impl.version'], '2.1.99')
+    self.assertTrue (variant.depsManagement.find ('com.sun.xml.bind:jaxb-impl:2.1.99'))
+    self.assertTrue (variant.depsManagement.find ('org.ow2.asm:asm:3.3.1'))
+
+    # original object is not modified
+    self.assertEquals (mvn.properties['cxf.jaxb.impl.version'], '2.1.14')
+    self.assertTrue (mvn.depsManagement.find ('com.sun.xml.bind:jaxb-impl:2.1.14'))
+    self.assertTrue (mvn.depsManagement.find ('asm:asm:3.3.1'))
+
+    # adding dependencies after an expansion expands them as well
+    variant.deps.add (MavenDep ('${cxf.asm.groupId}:asm-util:${cxf.asm.version}'))
+    variant.expand ()
+    self.assertTrue (variant.deps.find ('org.ow2.asm:asm-util:3.3.1'))
+    return
+
+  def testResolveOnce (self):
+    """ Test that resolving again only does the work needed
+    """
+    def parse ():
+      mvn = mavenparser.parseFile ('data/org.apache.cxf/cxf-rt-frontend-jaxws-3.0.2.pom')
+      mvn.merge (mavenparser.parseFile ('data/org.apache.cxf/cxf-parent-3.0.2.pom'))
+      mvn.merge (mavenparser.parseFile ('data/org.apache.cxf/cxf-3.0.2.pom'))
+      return mvn
+
+    mvn = parse ()
+    mvn.resolve (jdkVersion = '1.8')
+    root = mvn.deps.root
+    generation = mvn.deps.getGeneration ()
+
+    # same state, nothing to do
+    mvn.resolve (jdkVersion = '1.8')
+    self.assertTrue (mvn.deps.root is root)
+    self.assertEquals (mvn.deps.getGeneration (), generation)
+
+    # narrower scope, same result as resolving the dependencies again
+    mvn.resolve (scope = 'compile', jdkVersion = '1.8')
+    expected = parse ()
+    expected.resolve (jdkVersion = '1.8')
+    expected.deps.resolve (scope = 'compile')
+    self.assertEquals (repr (mvn.deps), repr (expected.deps))
+
+    generation = mvn.deps.getGeneration ()
+    mvn.resolve (scope = ['compile'], jdkVersion = '1.8')
+    self.assertEquals (mvn.deps.getGeneration (), generation)
+
+    # changes are taken into account
+    mvn.deps.add (MavenDep ('${cxf.asm.groupId}:asm-util:${cxf.asm.version}'))
+    mvn.resolve (jdkVersion = '1.8')
+    self.assertTrue (mvn.deps.find ('asm:asm-util:3.3.1'))
+
+    generation = mvn.deps.getGeneration ()
+    mvn.setProperty ('jdk', '1.7')
+    mvn.resolve ()
+    self.assertEquals (mvn.properties['jdk'], '1.7')
+    self.assertNotEquals (mvn.deps.getGeneration (), generation)
+    return
+
+  def testSetPropertyAndResolve (self):
+    """ Test that changing properties after resolving and resolving again
+    expands the dependencies with the new values
+    """
+    mvn = mavenparser.parseString ("""
+      <project>
+        <groupId>app</groupId><artifactId>app</artifactId><version>1</version>
+        <properties><v>1.0</v><g>x</g></properties>
+        <dependencies>
+          <dependency><groupId>x</groupId><artifactId>y</artifactId><version>${v}</version></dependency>
+          <dependency><groupId>${g}</groupId><artifactId>z</artifactId><version>1</version></dependency>
+        </dependencies>
+      </project>
+    """)
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.0', 'x:z:1'])
+
+    variant = mvn.clone ()
+    variant.setProperty ('v', '2.0')
+    variant.resolve ()
+    self.assertEquals (variant.deps.getFlattenCoordIds (), ['x:y:2.0', 'x:z:1'])
+
+    variant.setProperty ('g', 'w')
+    variant.resolve (scope = 'compile')
+    self.assertEquals (variant.deps.getFlattenCoordIds (), ['x:y:2.0', 'w:z:1'])
+
+    # the original object keeps its values
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.0', 'x:z:1'])
+
+    # setting the same value does not prepare again
+    state = mvn._preparedState
+    mvn.setProperty ('v', '1.0')
+    mvn.resolve ()
+    self.assertTrue (mvn._preparedState is state)
+
+    # properties changed directly are noticed as well
+    mvn.properties['v'] = '1.5'
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.5', 'x:z:1'])
+
+    mvn.properties = dict (mvn.properties, v = '1.0')
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.0', 'x:z:1'])
+    mvn.properties.update ({ 'v' : '1.6' })
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.6', 'x:z:1'])
+
+    # profiles added since are applied
+    profile = MavenProfile ()
+    profile.setActivation ({ 'activeByDefault' : 'true' })
+    profile.properties['v'] = '3.0'
+    profile.deps.add (MavenDep ('p:q:${v}'))
+    mvn.profiles.append (profile)
+    mvn.resolve ()
+    self.assertEquals (
+      mvn.deps.getFlattenCoordIds (),
+      ['x:y:3.0', 'x:z:1', 'p:q:3.0']
+    )
+    return
+
+  def testSetManagedPropertyAndResolve (self):
+    """ Test that changing a property used by the dependency management
+    applies the management again to the dependencies it manages
+    """
+    xml = """
+      <project>
+        <groupId>app</groupId><artifactId>app</artifactId><version>1</version>
+        <properties><v>1.0</v></properties>
+        <dependencyManagement><dependencies>
+          <dependency>
+            <groupId>x</groupId><artifactId>y</artifactId><version>${v}</version>
+            <exclusions><exclusion><groupId>e</groupId><artifactId>f</artifactId></exclusion></exclusions>
+          </dependency>
+        </dependencies></dependencyManagement>
+        <dependencies>
+          <dependency><groupId>x</groupId><artifactId>y</artifactId></dependency>
+          <dependency><groupId>x</groupId><artifactId>z</artifactId><version>1</version></dependency>
+        </dependencies>
+      </project>
+    """
+    mvn = mavenparser.parseString (xml)
+    mvn.prepare ()
+    self.assertEquals ([e.name for e in mvn.deps.find ('x:y:1.0').exclusions], ['e:f'])
+
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.0', 'x:z:1'])
+
+    variant = mvn.clone ()
+    variant.setProperty ('v', '2.0')
+    variant.prepare ()
+    self.assertEquals ([e.name for e in variant.deps.find ('x:y:2.0').exclusions], ['e:f'])
+
+    # same as parsing the POM file with the new value
+    fresh = mavenparser.parseString (xml.replace ('<v>1.0</v>', '<v>2.0</v>'))
+    fresh.resolve ()
+    variant.resolve ()
+    self.assertEquals (variant.deps.getFlattenCoordIds (), ['x:y:2.0', 'x:z:1'])
+    self.assertEquals (repr (variant.deps), repr (fresh.deps))
+
+    # the original object keeps its values
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1.0', 'x:z:1'])
+    return
+
+  def testSetNestedPropertyAndResolve (self):
+    """ Test that changing a property a nested reference is composed into
+    expands again the properties and dependencies using it
+    """
+    mvn = mavenparser.parseString ("""
+      <project>
+        <groupId>app</groupId><artifactId>app</artifactId><version>1</version>
+        <properties><f>x</f><v.x>1</v.x><ver>${v.${f}}</ver></properties>
+        <dependencies>
+          <dependency><groupId>x</groupId><artifactId>y</artifactId><version>${ver}</version></dependency>
+        </dependencies>
+      </project>
+    """)
+    mvn.resolve ()
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:1'])
+
+    mvn.setProperty ('v.x', '2')
+    mvn.resolve ()
+    self.assertEquals (mvn.properties['ver'], '2')
+    self.assertEquals (mvn.deps.getFlattenCoordIds (), ['x:y:2'])
+    return
+
   def testComplexApacheCxf (self):
     """ Test complex apache CXF module previously downloaded
     """ 
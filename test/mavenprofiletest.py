@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os,sys
+import unittest
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+from mavenprofile import MavenProfile, MavenActivation, MavenEnvironment
+
+class MavenProfileTest (unittest.TestCase):
+
+  LINUX = MavenEnvironment (
+    osName = 'Linux',
+    osFamily = 'unix',
+    osArch = 'amd64',
+    osVersion = '4.4',
+    fileExists = lambda path: path in ['/etc/hosts', 'base/pom.xml']
+  )
+
+  WINDOWS = MavenEnvironment (
+    osName = 'Windows 10',
+    osFamily = 'windows',
+    osArch = 'x86',
+    osVersion = '10.0',
+    fileExists = lambda path: False
+  )
+
+  def testActiveByDefault (self):
+    self.assertTrue (MavenActivation ({ 'activeByDefault' : 'True' }).isActive ())
+    self.assertFalse (MavenActivation ({ 'activeByDefault' : 'false' }).isActive ())
+    self.assertFalse (MavenActivation ({}).isActive ())
+    self.assertFalse (MavenActivation (None).isActive ())
+    return
+
+  def testJdk (self):
+    exact = MavenActivation ({ 'jdk' : '1.8' })
+    self.assertTrue (exact.isActive ({ 'jdk' : '1.8' }))
+    self.assertFalse (exact.isActive ({ 'jdk' : '1.7' }))
+    self.assertFalse (exact.isActive ({}))
+
+    negated = MavenActivation ({ 'jdk' : '!1.8' })
+    self.assertFalse (negated.isActive ({ 'jdk' : '1.8' }))
+    self.assertTrue (negated.isActive ({ 'jdk' : '1.7' }))
+
+    ranged = MavenActivation ({ 'jdk' : '[1.7,1.9)' })
+    self.assertTrue (ranged.isActive ({ 'jdk' : '1.7' }))
+    self.assertTrue (ranged.isActive ({ 'jdk' : '1.8' }))
+    self.assertFalse (ranged.isActive ({ 'jdk' : '1.9' }))
+    return
+
+  def testProperty (self):
+    withValue = MavenActivation ({ 'property' : { 'name' : 'p', 'value' : ' v ' } })
+    self.assertTrue (withValue.isActive ({ 'p' : 'v' }))
+    self.assertFalse (withValue.isActive ({ 'p' : 'w' }))
+    self.assertFalse (withValue.isActive ({}))
+
+    notValue = MavenActivation ({ 'property' : { 'name' : 'p', 'value' : '!v' } })
+    self.assertFalse (notValue.isActive ({ 'p' : 'v' }))
+    self.assertTrue (notValue.isActive ({ 'p' : 'w' }))
+    self.assertFalse (notValue.isActive ({}))
+
+    defined = MavenActivation ({ 'property' : { 'name' : 'p' } })
+    self.assertTrue (defined.isActive ({ 'p' : '' }))
+    self.assertFalse (defined.isActive ({}))
+
+    missing = MavenActivation ({ 'property' : { 'name' : '!p', 'value' : None } })
+    self.assertFalse (missing.isActive ({ 'p' : 'v' }))
+    self.assertTrue (missing.isActive ({ 'q' : 'v' }))
+    return
+
+  def testOs (self):
+    unix = MavenActivation ({ 'os' : { 'family' : 'unix' } })
+    self.assertTrue (unix.isActive ({}, self.LINUX))
+    self.assertFalse (unix.isActive ({}, self.WINDOWS))
+
+    notWindows = MavenActivation ({ 'os' : { 'family' : '!windows', 'arch' : 'amd64' } })
+    self.assertTrue (notWindows.isActive ({}, self.LINUX))
+    self.assertFalse (notWindows.isActive ({}, self.WINDOWS))
+
+    byName = MavenActivation ({ 'os' : { 'name' : 'windows 10', 'version' : '10.0' } })
+    self.assertFalse (byName.isActive ({}, self.LINUX))
+    self.assertTrue (byName.isActive ({}, self.WINDOWS))
+
+    mac = MavenEnvironment (osName = 'Mac OS X', osFamily = 'mac')
+    self.assertTrue (unix.isActive ({}, mac))
+    return
+
+  def testFile (self):
+    exists = MavenActivation ({ 'file' : { 'exists' : '${basedir}/pom.xml' } })
+    self.assertTrue (exists.isActive ({ 'basedir' : 'base' }, self.LINUX))
+    self.assertFalse (exists.isActive ({ 'basedir' : 'other' }, self.LINUX))
+    self.assertFalse (exists.isActive ({}, self.LINUX))
+
+    missing = MavenActivation ({ 'file' : { 'missing' : '/etc/hosts' } })
+    self.assertFalse (missing.isActive ({}, self.LINUX))
+    self.assertTrue (missing.isActive ({}, self.WINDOWS))
+    return
+
+  def testAllConditionsRequired (self):
+    activation = MavenActivation ({
+      'jdk' : '1.8',
+      'property' : { 'name' : 'p', 'value' : 'v' },
+      'os' : { 'family' : 'unix' }
+    })
+
+    self.assertTrue (activation.isActive ({ 'jdk' : '1.8', 'p' : 'v' }, self.LINUX))
+    self.assertFalse (activation.isActive ({ 'jdk' : '1.7', 'p' : 'v' }, self.LINUX))
+    self.assertFalse (activation.isActive ({ 'jdk' : '1.8', 'p' : 'w' }, self.LINUX))
+    self.assertFalse (activation.isActive ({ 'jdk' : '1.8', 'p' : 'v' }, self.WINDOWS))
+    return
+
+  def testMemoisedPerContext (self):
+    calls = []
+    class Environment (MavenEnvironment):
+      def isFamily (self, family):
+        calls.append (family)
+        return MavenEnvironment.isFamily (self, family)
+
+    environment = Environment (osFamily = 'unix')
+    activation = MavenActivation ({
+      'os' : { 'family' : 'unix' },
+      'property' : { 'name' : 'p' }
+    })
+
+    for i in range (10):
+      self.assertTrue (activation.isActive ({ 'p' : 'a', 'other' : str (i) }, environment))
+    self.assertTrue (activation.isActive ({ 'p' : 'b' }, environment))
+    self.assertFalse (activation.isActive ({}, environment))
+
+    self.assertEquals (calls, ['unix', 'unix'])
+    return
+
+  def testFilesCheckedEveryTime (self):
+    files = set()
+    environment = MavenEnvironment (
+      osFamily = 'unix',
+      fileExists = lambda path: path in files
+    )
+    activation = MavenActivation ({
+      'os' : { 'family' : 'unix' },
+      'file' : { 'exists' : '${dir}/f' }
+    })
+
+    self.assertFalse (activation.isActive ({ 'dir' : 'a' }, environment))
+    files.add ('a/f')
+    self.assertTrue (activation.isActive ({ 'dir' : 'a' }, environment))
+    files.remove ('a/f')
+    self.assertFalse (activation.isActive ({ 'dir' : 'a' }, environment))
+    return
+
+  def testProfileRecompilesActivation (self):
+    profile = MavenProfile ()
+    profile.setActivation ({ 'jdk' : '1.8' })
+    self.assertTrue (profile.isActive ({ 'jdk' : '1.8' }))
+
+    # replacing the activation dictionary is still supported
+    profile.activation = { 'jdk' : '1.7' }
+    self.assertFalse (profile.isActive ({ 'jdk' : '1.8' }))
+    self.assertTrue (profile.isActive ({ 'jdk' : '1.7' }))
+    return
+
+if __name__ == '__main__':
+  unittest.main()
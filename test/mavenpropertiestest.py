@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os,sys
+import unittest
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+import mavenproperties
+import mavenparser
+
+class MavenPropertiesTest (unittest.TestCase):
+
+  def testGetReferences (self):
+    self.assertEquals (mavenproperties.getReferences ('1.0'), [])
+    self.assertEquals (mavenproperties.getReferences ('${a}-${b}'), ['a', 'b'])
+    self.assertEquals (mavenproperties.getReferences ('${a.${b}}'), ['b'])
+    self.assertEquals (
+      mavenproperties.getResolvedReferences ('${a.${b}}', { 'b' : 'x' }),
+      set (['a.x', 'b'])
+    )
+    return
+
+  def testExpandChained (self):
+    expanded = mavenproperties.expandProperties ({
+      'a' : '${b}.${c}',
+      'b' : '${c}',
+      'c' : '1',
+      'd' : 'plain'
+    })
+
+    self.assertEquals (expanded, {
+      'a' : '1.1',
+      'b' : '1',
+      'c' : '1',
+      'd' : 'plain'
+    })
+    return
+
+  def testExpandUnknownReferences (self):
+    expanded = mavenproperties.expandProperties ({
+      'a' : '${unknown}-${b}',
+      'b' : '2'
+    })
+
+    self.assertEquals (expanded['a'], '${unknown}-2')
+    self.assertEquals (expanded['b'], '2')
+    return
+
+  def testExpandNested (self):
+    expanded = mavenproperties.expandProperties ({
+      'a' : '${version.${flavour}}',
+      'flavour' : 'jdk8',
+      'version.jdk8' : '${base}-jdk8',
+      'base' : '2.0'
+    })
+
+    self.assertEquals (expanded['a'], '2.0-jdk8')
+    return
+
+  def testExpandCycles (self):
+    self.assertRaises (
+      Exception,
+      mavenproperties.expandProperties,
+      { 'a' : 'x${a}' }
+    )
+
+    self.assertRaises (
+      Exception,
+      mavenproperties.expandProperties,
+      { 'a' : '${b}', 'b' : '${c}', 'c' : '${a}', 'd' : '1' }
+    )
+    return
+
+  def testExpandDeepChain (self):
+    properties = { 'p0' : 'end' }
+    for i in range (1, 5000):
+      properties['p%d' % i] = '${p%d}' % (i - 1)
+
+    expanded = mavenproperties.expandProperties (properties)
+    self.assertEquals (expanded['p4999'], 'end')
+    return
+
+  def testInterpolator (self):
+    interpolator = mavenproperties.MavenInterpolator ({
+      'a' : '1.0',
+      'g' : 'org.group'
+    })
+
+    self.assertEquals (interpolator.interpolate ('plain'), 'plain')
+    self.assertEquals (interpolator.interpolate ('${a}'), '1.0')
+    self.assertEquals (interpolator.interpolate ('${g}.sub:${a}'), 'org.group.sub:1.0')
+    self.assertEquals (interpolator.interpolate ('${a}-${unknown}'), '1.0-${unknown}')
+
+    # memoised results
+    self.assertEquals (interpolator.interpolate ('${a}'), '1.0')
+    self.assertTrue (
+      mavenproperties.MavenInterpolator.create (interpolator) is interpolator
+    )
+    return
+
+  def testPropertyGraphUpdate (self):
+    properties = {
+      'a' : '${b}.${c}',
+      'b' : '${c}',
+      'c' : '1',
+      'd' : 'plain'
+    }
+    graph = mavenproperties.MavenPropertyGraph (properties)
+    self.assertEquals (graph.getDependents ('c'), set (['a', 'b']))
+
+    # nothing changed
+    self.assertEquals (graph.update (dict (graph.expanded)), set())
+
+    # changing c affects all properties depending on it
+    properties = dict (graph.expanded)
+    properties['c'] = '2'
+    self.assertEquals (graph.update (properties), set (['a', 'b', 'c']))
+    self.assertEquals (graph.expanded['a'], '2.2')
+
+    # overriding b with a template stops depending on c
+    properties = dict (graph.expanded)
+    properties['b'] = '${d}'
+    self.assertEquals (graph.update (properties), set (['a', 'b']))
+    self.assertEquals (graph.expanded['a'], 'plain.2')
+    self.assertEquals (graph.getDependents ('c'), set (['a']))
+
+    # removed properties are left as references
+    properties = dict (graph.expanded)
+    del properties['d']
+    self.assertEquals (graph.update (properties), set (['a', 'b', 'd']))
+    self.assertEquals (graph.expanded['a'], '${d}.2')
+    return
+
+  def testPropertyGraphUpdateNested (self):
+    properties = {
+      'f' : 'x',
+      'v.x' : '1',
+      'v.y' : '2',
+      'version' : '${v.${f}}'
+    }
+    graph = mavenproperties.MavenPropertyGraph (properties)
+    self.assertEquals (graph.expanded['version'], '1')
+    self.assertEquals (graph.getDependents ('v.x'), set (['version']))
+
+    # changing the property the reference is composed into
+    properties = dict (graph.expanded)
+    properties['v.x'] = '3'
+    self.assertEquals (graph.update (properties), set (['v.x', 'version']))
+    self.assertEquals (graph.expanded['version'], '3')
+
+    # changing the composed reference itself
+    properties = dict (graph.expanded)
+    properties['f'] = 'y'
+    self.assertEquals (graph.update (properties), set (['f', 'version']))
+    self.assertEquals (graph.expanded['version'], '2')
+    self.assertEquals (graph.getDependents ('v.x'), set ())
+
+    properties = dict (graph.expanded)
+    properties['v.y'] = '4'
+    self.assertEquals (graph.update (properties), set (['v.y', 'version']))
+    self.assertEquals (graph.expanded['version'], '4')
+
+    # clones keep their own references
+    clone = graph.clone ()
+    properties = dict (graph.expanded)
+    properties['f'] = 'x'
+    graph.update (properties)
+    self.assertEquals (clone.getDependents ('v.y'), set (['version']))
+    self.assertEquals (graph.getDependents ('v.y'), set ())
+    return
+
+  def testExpandApacheCxf (self):
+    mvn = mavenparser.parseFile ('data/org.apache.cxf/cxf-parent-3.0.2.pom')
+    mvn.merge (mavenparser.parseFile ('data/org.apache.cxf/cxf-3.0.2.pom'))
+    mvn.expand ()
+
+    for k, v in mvn.properties.items():
+      for ref in mavenproperties.getReferences (v):
+        self.assertTrue (ref not in mvn.properties)
+    return
+
+if __name__ == '__main__':
+  unittest.main()
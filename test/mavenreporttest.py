@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os,sys
+import unittest
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+from mavendeps import MavenDep, MavenDeps
+from mavenreport import MavenReport
+from mavenversiondb import MavenVersionDb
+
+class MavenReportTest (unittest.TestCase):
+
+  def _buildDeps (self):
+    deps = MavenDeps ('root:root:1')
+
+    a = MavenDep ('lib:a:1')
+    a.addCoordToExclude ('lib:x')
+    a.add (MavenDep ('lib:c:1'))
+    a.add (MavenDep ('lib:x:1'))
+    a.add (MavenDep ('lib:y:1'))
+
+    b = MavenDep ('lib:b:1')
+    b.add (MavenDep ('lib:c:2'))
+    b.add (MavenDep ('lib:x:2'))
+
+    deps.add (a)
+    deps.add (b)
+    deps.add (MavenDep ('lib:e:1'))
+    deps.add (MavenDep ('lib:e:2'))
+
+    a.deps[2].addCoordToExclude ('*:*')
+    a.deps[2].add (MavenDep ('lib:z:1'))
+    return deps
+
+  def testPaths (self):
+    deps = self._buildDeps ()
+    report = MavenReport ()
+    deps.resolve (report = report)
+
+    self.assertEquals (
+      [[c.id for c in path] for path in report.getPaths ('lib:c')],
+      [
+        ['root:root:1', 'lib:a:1', 'lib:c:1'],
+        ['root:root:1', 'lib:b:1', 'lib:c:2'],
+      ]
+    )
+    self.assertEquals (
+      [[c.id for c in path] for path in report.getPaths ('lib:c:2')],
+      [['root:root:1', 'lib:b:1', 'lib:c:2']]
+    )
+    self.assertEquals (report.getPlaced ('lib:c').coord.id, 'lib:c:1')
+    self.assertEquals (report.getPlaced ('lib:not-found'), None)
+    return
+
+  def testLosers (self):
+    deps = self._buildDeps ()
+    report = MavenReport ()
+    deps.resolve (report = report)
+
+    self.assertEquals (
+      [(e.coord.id, e.reason, w.coord.id) for (e, w) in report.getLosers ()],
+      [
+        ('lib:e:1', MavenReport.CONFLICT, 'lib:e:2'),
+        ('lib:c:2', MavenReport.OMITTED, 'lib:c:1'),
+      ]
+    )
+    self.assertEquals (report.getLosers ('lib:a'), [])
+    return
+
+  def testExclusions (self):
+    deps = self._buildDeps ()
+    report = MavenReport ()
+    deps.resolve (report = report)
+
+    self.assertEquals (
+      [(e.coord.id, by.coord.id, x.name) for (e, by, x) in report.getExclusions ()],
+      [
+        ('lib:x:1', 'lib:a:1', 'lib:x'),
+        ('lib:z:1', 'lib:y:1', '*:*'),
+      ]
+    )
+
+    # lib:x:2 is not excluded in its path
+    self.assertEquals (report.getPlaced ('lib:x').coord.id, 'lib:x:2')
+    self.assertEquals (report.getExclusions ('lib:x:2'), [])
+    return
+
+  def testSameResolution (self):
+    deps = self._buildDeps ()
+    reported = self._buildDeps ()
+    deps.resolve ()
+    reported.resolve (report = MavenReport ())
+    self.assertEquals (repr (reported), repr (deps))
+    return
+
+  def testVersionDbWarnings (self):
+    verdb = MavenVersionDb ()
+    verdb.register ('lib:a:1', verbose = False)
+    verdb.register ('lib:a:2', verbose = False)
+    verdb.register ('lib:a:2', verbose = False)
+
+    self.assertEquals (
+      [(w.kind, w.coord, w.expected) for w in verdb.getWarnings ()],
+      [('unhandled-conflict', 'lib:a:2', '1')]
+    )
+    return
+
+if __name__ == '__main__':
+  unittest.main()
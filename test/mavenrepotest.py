@@ -1,12 +1,97 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*- 
 import os,sys
+import random
+import shutil
+import StringIO
+import tempfile
+import threading
 import unittest
 
 sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
 
 from mavencoord import MavenCoord
-from mavenrepo import MavenRepo
+from mavenrepo import MavenRepo, MavenResolution
+from mavenreport import MavenReport, MavenWarning
+from mavendeps import MavenDep
+from mavenversiondb import MavenVersionDb
+import mavenversioncmp as mavenvercmp
+
+class MavenMemoryRepo (MavenRepo):
+  """ Repository with the POM files in memory (no network involved) that
+  keeps track of the files downloaded
+  """
+  def __init__ (self, poms, versionDb = None, cacheDir = None):
+    MavenRepo.__init__ (self, 'memory://repo', versionDb, cacheDir)
+    self.poms = {}
+    self.downloads = []
+    for coord, deps in poms.items ():
+      self.setPom (coord, deps)
+    return
+
+  def setPom (self, coord, deps, properties = None):
+    """ Sets the POM of given coordinate with given list of dependencies,
+    as coordinates or (coordinate, list of exclusions) tuples, and given
+    dictionary of properties
+    """
+    coord = MavenCoord (coord)
+    xml = [
+      '<project><groupId>%s</groupId><artifactId>%s</artifactId>'
+      '<version>%s</version>' % (
+        coord.group, coord.artifact, coord.version
+      )
+    ]
+
+    xml.append ('<properties>')
+    for (name, value) in sorted ((properties or {}).items ()):
+      xml.append ('<%s>%s</%s>' % (name, value, name))
+    xml.append ('</properties><dependencies>')
+
+    for dep in deps:
+      (dep, exclusions) = dep if isinstance (dep, tuple) else (dep, [])
+      dep = MavenCoord (dep)
+      xml.append (
+        '<dependency><groupId>%s</groupId><artifactId>%s</artifactId>' % (
+          dep.group, dep.artifact
+        )
+      )
+      if dep.version:
+        xml.append ('<version>%s</version>' % dep.version)
+
+      if dep.scope != MavenCoord.SCOPE_DEFAULT:
+        xml.append ('<scope>%s</scope>' % dep.scope)
+
+      xml.append ('<exclusions>')
+      for exclusion in exclusions:
+        exclusion = MavenCoord (exclusion)
+        xml.append (
+          '<exclusion><groupId>%s</groupId><artifactId>%s</artifactId></exclusion>' % (
+            exclusion.group, exclusion.artifact
+          )
+        )
+      xml.append ('</exclusions></dependency>')
+
+    xml.append ('</dependencies></project>')
+    self.poms[self.getPomUrlFor (coord)] = ''.join (xml)
+    return
+
+  def setVersions (self, coord, versions, release = None):
+    """ Sets the metadata of the artifact of given coordinate
+    """
+    coord = MavenCoord (coord)
+    xml = ['<metadata><versioning>']
+    if release:
+      xml.append ('<release>%s</release>' % release)
+
+    xml.append ('<versions>')
+    xml.extend (['<version>%s</version>' % v for v in versions])
+    xml.append ('</versions></versioning></metadata>')
+    self.poms[self.getMetadataUrlFor (coord)] = ''.join (xml)
+    return
+
+  def _request2string (self, url):
+    self.downloads.append (url)
+    return self.poms.get (url, None)
 
 class MavenRepoTest (unittest.TestCase):
   """ Test fetching dependencies on any maven repository
@@ -185,6 +270,510 @@ class MavenRepoTest (unittest.TestCase):
         '  org.apache.neethi:neethi:jar:3.0.3:compile',
       ]]
     )
+    return
+
+  def testFetchTreePlacesSiblingsFirst (self):
+    # same shape as cxf-rt-frontend-jaxws (see testFetchTreeForCxfRtFrontendJaxws)
+    repo = MavenMemoryRepo ({
+      'cxf:jaxws:1'     : ['cxf:soap:1', 'cxf:policy:1'],
+      'cxf:soap:1'      : ['cxf:wsdl:1'],
+      'cxf:wsdl:1'      : ['wsdl4j:wsdl4j:1'],
+      'cxf:policy:1'    : ['wsdl4j:wsdl4j:1', 'neethi:neethi:1'],
+      'wsdl4j:wsdl4j:1' : [],
+      'neethi:neethi:1' : [],
+    })
+    maven = repo.fetchResolvedTree ('cxf:jaxws:1', 'compile')
+    maven.resolve (scope = 'compile')
+
+    # wsdl4j stays under cxf-rt-wsdl, the first branch it is found in
+    self.assertEquals (
+      maven.deps.getFlattenCoordFullIds (),
+      [x.strip() for x in [
+        'cxf:soap:jar:1:compile',
+        '  cxf:wsdl:jar:1:compile',
+        '    wsdl4j:wsdl4j:jar:1:compile',
+        'cxf:policy:jar:1:compile',
+        '  neethi:neethi:jar:1:compile',
+      ]]
+    )
+    return
+
+  def testWarnings (self):
+    output = StringIO.StringIO ()
+    original = sys.stdout
+    try:
+      sys.stdout = output
+      repo = MavenMemoryRepo ({})
+      repo._warn (MavenWarning.VERSION_MISMATCH, 'lib:c:2', '1', 'WARNING: lib:c:2')
+
+      # warnings are only recorded unless verbose
+      self.assertEquals (
+        [(w.kind, w.coord, w.expected) for w in repo.getWarnings ()],
+        [('version-mismatch', 'lib:c:2', '1')]
+      )
+      self.assertEquals (output.getvalue (), '')
+
+      repo.setVerbose ()
+      repo._warn (MavenWarning.OUTDATED_VERSION, 'lib:d:2', '1', 'WARNING: lib:d:2')
+      self.assertEquals (len (repo.getWarnings ()), 2)
+      self.assertEquals (output.getvalue (), 'WARNING: lib:d:2\n')
+    finally:
+      sys.stdout = original
+    return
+
+  def testResolveVersionRanges (self):
+    versionDb = MavenVersionDb ()
+    versionDb.register ('lib:b:1.5')
+
+    repo = MavenMemoryRepo ({}, versionDb)
+    repo.setVersions ('lib:a', ['1.0', '1.10', '1.2', '2.0', '1.2.1'], '2.0')
+    repo.setVersions ('lib:b', ['1.0', '1.5', '1.9'])
+    repo.setVersions ('lib:c', ['1.0'])
+
+    self.assertEquals (repo.resolveCoord ('lib:a').id, 'lib:a:2.0')
+    self.assertEquals (repo.resolveCoord ('lib:a:1.1').id, 'lib:a:1.1')
+    self.assertEquals (repo.resolveCoord ('lib:a:[1.2,2.0)').id, 'lib:a:1.10')
+    self.assertEquals (repo.resolveCoord ('lib:a:[1.2,1.3)').id, 'lib:a:1.2.1')
+    self.assertEquals (repo.resolveCoord ('lib:a:(,1.0]').id, 'lib:a:1.0')
+    self.assertEquals (repo.resolveCoord ('lib:a:[3.0,)'), None)
+
+    # the version in the version DB is used if it is in the range
+    self.assertEquals (repo.resolveCoord ('lib:b:[1.0,2.0)').id, 'lib:b:1.5')
+    self.assertEquals (repo.resolveCoord ('lib:b:[1.6,2.0)').id, 'lib:b:1.9')
+
+    # only one version and no release
+    self.assertEquals (repo.resolveCoord ('lib:c:[1.0]').id, 'lib:c:1.0')
+    self.assertEquals (repo.resolveCoord ('lib:c'), None)
+
+    # metadata is downloaded once per artifact
+    self.assertEquals (len (repo.downloads), 3)
+
+    # versions of the metadata are not parsed again for each lookup
+    mavenvercmp._canonicalCache.clear ()
+    self.assertEquals (repo.resolveCoord ('lib:a:[1.1,1.3]').id, 'lib:a:1.2.1')
+    self.assertEquals (
+      set (['1.0', '1.10', '1.2', '2.0', '1.2.1']) & set (mavenvercmp._canonicalCache),
+      set()
+    )
+    return
+
+  def testResolveVersionRangesInTrees (self):
+    versionDb = MavenVersionDb ()
+    repo = MavenMemoryRepo ({
+      'app:app:1' : ['lib:a:[1.2,2.0)'],
+      'lib:a:1.5' : ['lib:b:[1,)'],
+      'lib:b:2'   : [],
+    }, versionDb)
+    repo.setVersions ('lib:a', ['1.0', '1.5', '2.0'])
+    repo.setVersions ('lib:b', ['1', '2'])
+
+    expected = ['lib:a:jar:1.5:compile', 'lib:b:jar:2:compile']
+    self.assertEquals (
+      repo.fetchResolvedTree ('app:app:1', 'compile').deps.getFlattenCoordFullIds (),
+      expected
+    )
+    self.assertEquals (
+      repo.fetchResolvedTree (
+        'app:app:1', 'compile', MavenResolution ()
+      ).deps.getFlattenCoordFullIds (),
+      expected
+    )
+    self.assertEquals (
+      repo.fetchResolvedScopes ('app:app:1')['compile'].deps.getFlattenCoordFullIds (),
+      expected
+    )
+
+    # artifacts are downloaded with the versions the ranges resolve to
+    repo.downloadUrl = lambda url: url
+    for coords in ['app:app:1', ['app:app:1']]:
+      self.assertEquals (
+        [url for url in repo.downloadArtifacts (coords, 'compile') if '/lib/' in url],
+        [
+          'memory://repo/lib/a/1.5/a-1.5.jar',
+          'memory://repo/lib/b/2/b-2.jar'
+        ]
+      )
+
+    # ranges given through properties
+    repo.setPom ('app:app:2', ['lib:a:${a.version}'], { 'a.version' : '[1.2,2.0)' })
+    self.assertEquals (
+      repo.fetchResolvedTree ('app:app:2', 'compile').deps.getFlattenCoordFullIds (),
+      expected
+    )
+    self.assertEquals (
+      repo.fetchResolvedTree (
+        'app:app:2', 'compile', MavenResolution ()
+      ).deps.getFlattenCoordFullIds (),
+      expected
+    )
+    self.assertEquals (
+      repo.fetchResolvedScopes ('app:app:2')['compile'].deps.getFlattenCoordFullIds (),
+      expected
+    )
+
+    # ranges are never registered as versions
+    versionDb.register ('lib:c:[1.0,2.0)')
+    self.assertEquals (versionDb.find ('lib:c'), None)
+    self.assertEquals (versionDb.getVersionsFor ('lib', 'a'), ['1.5'])
+    return
+
+  def testPropertiesOfDependencies (self):
+    repo = MavenMemoryRepo ({
+      'lib:b:2.0' : [],
+      'lib:c:1'   : [],
+    })
+    repo.setPom (
+      'app:app:5',
+      ['lib:a:1'],
+      { 'b.version' : '9.9' }
+    )
+    repo.setPom (
+      'lib:a:1',
+      ['lib:b:${b.version}', 'lib:c:${project.version}'],
+      { 'b.version' : '2.0' }
+    )
+
+    # dependencies are expanded with the properties of the POM declaring them
+    expected = [
+      'lib:a:jar:1:compile',
+      'lib:b:jar:2.0:compile',
+      'lib:c:jar:1:compile'
+    ]
+    self.assertEquals (
+      repo.fetchResolvedTree ('app:app:5', 'compile').deps.getFlattenCoordFullIds (),
+      expected
+    )
+    self.assertEquals (
+      repo.fetchResolvedTree (
+        'app:app:5', 'compile', MavenResolution ()
+      ).deps.getFlattenCoordFullIds (),
+      expected
+    )
+
+    # resolving again keeps them
+    maven = repo.fetchResolvedTree ('app:app:5', 'compile')
+    maven.setProperty ('b.version', '9.8')
+    maven.resolve (scope = 'compile')
+    self.assertEquals (maven.deps.getFlattenCoordFullIds (), expected)
+    return
+
+  def testVersionDbIndex (self):
+    tempDir = tempfile.mkdtemp ()
+    try:
+      versionDbPath = os.path.join (tempDir, 'deps.txt')
+      shutil.copy ('data/simple-deps.txt', versionDbPath)
+
+      # the version DB is indexed next to it
+      repo = MavenMemoryRepo ({}, versionDbPath)
+      indexPath = versionDbPath + MavenVersionDb.INDEX_EXTENSION
+      self.assertTrue (MavenVersionDb.isIndexFile (indexPath))
+
+      # and the index is loaded instead of parsing the file again
+      db = MavenVersionDb ()
+      db.register ('lib:a:1', verbose = False)
+      db.save (indexPath)
+      repo = MavenMemoryRepo ({}, versionDbPath)
+      self.assertEquals (repo._versionDb.find ('lib:a').id, 'lib:a:1')
+    finally:
+      shutil.rmtree (tempDir)
+    return
+
+  def testDownloadArtifacts (self):
+    repo = MavenMemoryRepo ({
+      'app:app:1' : [
+        'lib:a:jar:1:compile',
+        'lib:p:jar:1:provided',
+        'lib:s:jar:1:system',
+        'lib:r:jar:1:runtime',
+        'lib:t:jar:1:test',
+      ],
+      'app:two:1' : ['lib:a:1', 'lib:d:1'],
+      'lib:a:1'   : ['lib:b:1', 'lib:c:jar:1:runtime'],
+      'lib:d:1'   : [],
+    })
+    repo.downloadUrl = lambda url: url.split ('/')[-1]
+
+    # only the dependencies with given scope (see fetchResolvedTree)
+    for (scope, expected) in [
+      ('compile', ['app-1.jar', 'a-1.jar', 'b-1.jar']),
+      ('runtime', ['app-1.jar', 'r-1.jar']),
+      ('test', ['app-1.jar', 't-1.jar']),
+      ('provided', ['app-1.jar', 'p-1.jar']),
+    ]:
+      self.assertEquals (repo.downloadArtifacts ('app:app:1', scope), expected)
+      self.assertEquals (repo.downloadArtifacts (['app:app:1'], scope), expected)
+
+    # several roots share the POM files fetched and each artifact is
+    # returned once
+    repo.downloads = []
+    self.assertEquals (
+      repo.downloadArtifacts (['app:app:1', 'app:two:1'], 'compile'),
+      ['app-1.jar', 'a-1.jar', 'b-1.jar', 'two-1.jar', 'd-1.jar']
+    )
+    self.assertEquals (len (repo.downloads), len (set (repo.downloads)))
+    return
+
+  POMS = {
+    'app:app:1' : ['lib:a:1', 'lib:b:1'],
+    'lib:a:1'   : ['lib:c:1', 'lib:d'],
+    'lib:a:2'   : ['lib:e:1', 'lib:d'],
+    'lib:b:1'   : ['lib:c:2', ('lib:e:1', ['lib:d'])],
+    'lib:c:1'   : ['lib:f:1'],
+    'lib:c:2'   : ['lib:f:2'],
+    'lib:d:1'   : ['lib:g:1'],
+    'lib:d:2'   : [],
+    'lib:e:1'   : ['lib:d', 'lib:h:1'],
+    'lib:f:1'   : [],
+    'lib:f:2'   : ['lib:g:1'],
+    'lib:g:1'   : [],
+    'lib:h:1'   : [],
+  }
+
+  def _assertSameAsFullResolution (self, maven, repo):
+    """ Asserts given maven object is the same as the one resolved from
+    scratch with a copy of given repository
+    """
+    versionDb = MavenVersionDb ()
+    versionDb._db = dict (repo._versionDb._db)
+
+    fullRepo = MavenMemoryRepo ({}, versionDb)
+    fullRepo.poms = dict (repo.poms)
+    fullMaven = fullRepo.fetchResolvedTree (maven.coord, 'compile')
+
+    self.assertEquals (repr (maven.deps), repr (fullMaven.deps))
+    return fullRepo
+
+  def testIncrementalResolution (self):
+    versionDb = MavenVersionDb ()
+    versionDb.register ('lib:d:1')
+
+    repo = MavenMemoryRepo (self.POMS, versionDb)
+    resolution = MavenResolution ()
+    maven = repo.fetchResolvedTree ('app:app:1', 'compile', resolution)
+    self._assertSameAsFullResolution (maven, repo)
+
+    # nothing changed
+    repo.downloads = []
+    maven = repo.fetchResolvedTree ('app:app:1', 'compile', resolution)
+    self._assertSameAsFullResolution (maven, repo)
+    self.assertEquals (repo.downloads, [])
+
+    # objects returned can be modified
+    maven.resolve (scope = 'compile')
+    maven.deps.add (MavenDep ('lib:x:1'))
+    self.assertEquals (
+      repo.fetchResolvedTree ('app:app:1', 'compile', resolution).deps.find ('lib:x:1'),
+      None
+    )
+
+    # change the version of a direct dependency
+    repo.setPom ('app:app:1', ['lib:a:2', 'lib:b:1'])
+    resolution.invalidate ('app:app:1')
+    repo.downloads = []
+    maven = repo.fetchResolvedTree ('app:app:1', 'compile', resolution)
+    fullRepo = self._assertSameAsFullResolution (maven, repo)
+    self.assertTrue (0 < len (repo.downloads) < len (fullRepo.downloads))
+
+    # add and remove direct dependencies
+    repo.setPom ('app:app:1', ['lib:b:1', 'lib:h:1'])
+    resolution.invalidate ('app:app:1')
+    repo.downloads = []
+    maven = repo.fetchResolvedTree ('app:app:1', 'compile', resolution)
+    fullRepo = self._assertSameAsFullResolution (maven, repo)
+    self.assertTrue (len (repo.downloads) < len (fullRepo.downloads))
+
+    # change a pinned version
+    versionDb.setVersionFor ('lib', 'd', '2')
+    repo.downloads = []
+    maven = repo.fetchResolvedTree ('app:app:1', 'compile', resolution)
+    fullRepo = self._assertSameAsFullResolution (maven, repo)
+    self.assertTrue (len (repo.downloads) < len (fullRepo.downloads))
+    self.assertEquals (maven.deps.find ('lib:g:1').coord.id, 'lib:g:1')
+    return
+
+  def testFetchResolvedTreeReport (self):
+    versionDb = MavenVersionDb ()
+    versionDb.register ('lib:d:1')
+
+    repo = MavenMemoryRepo (self.POMS, versionDb)
+    report = MavenReport ()
+    maven = repo.fetchResolvedTree ('app:app:1', 'compile', report = report)
+    self.assertEquals (maven.deps.find ('lib:c:1').coord.id, 'lib:c:1')
+
+    # placed by the resolution of the whole tree
+    self.assertEquals (
+      [c.id for c in report.getPlaced ('lib:c').getPath ()],
+      ['app:app:1', 'lib:a:1', 'lib:c:1']
+    )
+
+    # lib:c:2 is omitted since lib:c:1 is as near to the root
+    [(loser, winner)] = report.getLosers ('lib:c:2')
+    self.assertEquals (loser.reason, MavenReport.OMITTED)
+    self.assertEquals (
+      [c.id for c in loser.getPath ()],
+      ['app:app:1', 'lib:b:1', 'lib:c:2']
+    )
+    self.assertTrue (winner is report.getPlaced ('lib:c'))
+
+    # the resolutions of each POM file are recorded too
+    self.assertEquals (
+      [c.id for c in report.getPaths ('lib:h:1')[0]],
+      ['lib:e:1', 'lib:h:1']
+    )
+    return
+
+  def testConcurrentResolutions (self):
+    versionDb = MavenVersionDb ()
+    versionDb.register ('lib:d:1')
+
+    poms = dict (self.POMS)
+    poms['lib:m:1'] = ['lib:a:1', 'lib:n:[1.0,2.0)']
+    poms['lib:n:1.5'] = ['lib:h:1']
+
+    coords = sorted (poms.keys ())
+    tasks = [
+      ([coord], scope) for coord in coords for scope in ['compile', 'runtime']
+    ] + [
+      (['app:app:1', 'lib:a:2', 'lib:m:1'], 'compile'),
+      (['lib:b:1', 'lib:e:1'], 'test')
+    ]
+
+    def resolve (repo, task):
+      (coords, scope) = task
+      if len (coords) == 1:
+        maven = repo.fetchResolvedTree (coords[0], scope)
+        return repr (maven.deps) if maven else None
+
+      (deps, roots) = repo.fetchResolvedRoots (coords, scope)
+      return repr (deps)
+
+    def memoryRepo (cacheDir = None):
+      repo = MavenMemoryRepo (poms, versionDb, cacheDir)
+      repo.setVersions ('lib:n', ['0.9', '1.5', '2.0'])
+      return repo
+
+    expected = [resolve (memoryRepo (), task) for task in tasks]
+
+    cacheDir = tempfile.mkdtemp ()
+    try:
+      repo = memoryRepo (cacheDir)
+      rnd = random.Random (1)
+      jobs = [rnd.randrange (len (tasks)) for i in range (400)]
+      results = [None] * len (jobs)
+      errors = []
+
+      def worker (offset):
+        try:
+          for i in range (offset, len (jobs), 16):
+            results[i] = resolve (repo, tasks[jobs[i]])
+        except Exception as e:
+          errors.append (e)
+        return
+
+      threads = [threading.Thread (target = worker, args = (i,)) for i in range (16)]
+      for thread in threads:
+        thread.start ()
+      for thread in threads:
+        thread.join ()
+
+      self.assertEquals (errors, [])
+      self.assertEquals (results, [expected[j] for j in jobs])
+
+      # each file is downloaded once, no matter how many threads wanted it
+      self.assertEquals (len (repo.downloads), len (set (repo.downloads)))
+      self.assertEquals (
+        [f for f in os.listdir (cacheDir) if f.endswith ('.tmp')],
+        []
+      )
+    finally:
+      shutil.rmtree (cacheDir)
+    return
+
+  def testFetchResolvedScopes (self):
+    repo = MavenMemoryRepo ({
+      'app:app:1' : [
+        'lib:a:jar:1:compile',
+        'lib:t:jar:1:test',
+        'lib:r:jar:1:runtime',
+        'lib:p:jar:1:provided',
+      ],
+      'lib:a:1'   : [
+        'lib:b:1',
+        'lib:c:jar:1:runtime',
+        'lib:d:jar:1:test',
+        'lib:e:jar:1:provided',
+      ],
+      'lib:t:1'   : ['lib:b:2', 'lib:f:1'],
+      'lib:r:1'   : [('lib:f:1', ['lib:g'])],
+      'lib:f:1'   : ['lib:g:1'],
+    })
+
+    classpaths = repo.fetchResolvedScopes ('app:app:1')
+    self.assertEquals (
+      dict (
+        (scope, maven.deps.getFlattenCoordFullIds ())
+        for (scope, maven) in classpaths.items ()
+      ),
+      {
+        'compile' : [
+          'lib:a:jar:1:compile',
+          'lib:b:jar:1:compile',
+          'lib:p:jar:1:provided',
+        ],
+        'runtime' : [
+          'lib:a:jar:1:compile',
+          'lib:b:jar:1:compile',
+          'lib:c:jar:1:runtime',
+          'lib:r:jar:1:runtime',
+          'lib:f:jar:1:runtime',
+        ],
+        'test' : [
+          'lib:a:jar:1:compile',
+          'lib:b:jar:1:compile',
+          'lib:c:jar:1:runtime',
+          'lib:t:jar:1:test',
+          'lib:f:jar:1:test',
+          'lib:g:jar:1:test',
+          'lib:r:jar:1:runtime',
+          'lib:p:jar:1:provided',
+        ],
+      }
+    )
+
+    # each POM file is fetched once
+    self.assertEquals (len (repo.downloads), len (set (repo.downloads)))
+    return
+
+  def testFetchResolvedRoots (self):
+    poms = {
+      'app:one:1' : ['lib:a:1', 'lib:b:1'],
+      'app:two:1' : ['lib:b:2', 'app:one:1', 'lib:c:1'],
+      'lib:a:1'   : ['lib:c:1'],
+      'lib:b:1'   : ['lib:c:2'],
+      'lib:b:2'   : [],
+      'lib:c:1'   : [],
+      'lib:c:2'   : [],
+    }
+    repo = MavenMemoryRepo (poms)
+    (deps, roots) = repo.fetchResolvedRoots (
+      ['app:one:1', 'app:two:1', 'app:missing:1'],
+      'compile'
+    )
+
+    self.assertEquals (
+      deps.getFlattenCoordIds (),
+      ['app:one:1', 'lib:a:1', 'lib:c:1', 'lib:b:1', 'app:two:1']
+    )
+
+    # each POM file is fetched once
+    self.assertEquals (len (repo.downloads), len (set (repo.downloads)))
+
+    # same as resolving each one of them
+    self.assertEquals (roots[2], None)
+    for (coord, maven) in zip (['app:one:1', 'app:two:1'], roots):
+      classpaths = MavenMemoryRepo (poms).fetchResolvedScopes (coord, ['compile'])
+      self.assertEquals (repr (maven.deps), repr (classpaths['compile'].deps))
+    return
     
 if __name__ == '__main__':
   unittest.main() 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os,sys
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
+
+from mavenstats import MavenStats, byteCount, timed
+import mavenparser
+import mavenrepo
+import mavenrepotest
+
+class MavenStatsTest (unittest.TestCase):
+
+  def tearDown (self):
+    MavenStats.getDefault ().enable (False)
+    MavenStats.getDefault ().reset ()
+    return
+
+  def testTimed (self):
+    @timed ('phase')
+    def fn (value):
+      MavenStats.getDefault ().count ('phase', bytes = len (value), hits = 1)
+      return value
+
+    stats = MavenStats.getDefault ()
+    self.assertEquals (fn ('abc'), 'abc')
+    self.assertEquals (stats.snapshot (), {})
+
+    stats.enable ()
+    fn ('abc')
+    fn ('de')
+
+    snapshot = stats.snapshot ()
+    self.assertEquals (snapshot.keys (), ['phase'])
+    self.assertEquals (snapshot['phase'].calls, 2)
+    self.assertEquals (snapshot['phase'].bytes, 5)
+    self.assertEquals (snapshot['phase'].hits, 2)
+    self.assertEquals (snapshot['phase'].misses, 0)
+    self.assertTrue (snapshot['phase'].totalTime >= snapshot['phase'].maxTime)
+
+    # snapshots are not updated afterwards
+    fn ('f')
+    self.assertEquals (snapshot['phase'].calls, 2)
+    self.assertEquals (stats.snapshot ()['phase'].calls, 3)
+
+    stats.reset ()
+    self.assertEquals (stats.snapshot (), {})
+    return
+
+  def testByteCount (self):
+    self.assertEquals (byteCount (None), 0)
+    self.assertEquals (byteCount ('abc'), 3)
+    self.assertEquals (byteCount (u'a\xf1'), 3)
+    return
+
+  def testDisabledStats (self):
+    def byteCount (data):
+      raise Exception ("Bytes counted with stats disabled")
+
+    # sizes are not computed while disabled
+    repo = mavenrepotest.MavenMemoryRepo ({ 'lib:a:1' : [] })
+    original = (mavenparser.byteCount, mavenrepo.byteCount)
+    try:
+      mavenparser.byteCount = mavenrepo.byteCount = byteCount
+      self.assertEquals (repo.fetchOne ('lib:a:1').coord.id, 'lib:a:1')
+    finally:
+      (mavenparser.byteCount, mavenrepo.byteCount) = original
+    return
+
+  def testRepoStats (self):
+    cacheDir = tempfile.mkdtemp ()
+    try:
+      repo = mavenrepotest.MavenMemoryRepo (
+        mavenrepotest.MavenRepoTest.POMS,
+        cacheDir = cacheDir
+      )
+      repo._versionDb.register ('lib:d:1')
+
+      repo.fetchResolvedTree ('app:app:1', 'compile')
+      self.assertEquals (repo.stats (), {})
+
+      repo.enableStats ()
+      repo.fetchResolvedTree ('app:app:1', 'compile')
+      stats = repo.stats ()
+      self.assertEquals (
+        sorted (stats.keys ()),
+        [
+          MavenStats.DOWNLOAD,
+          MavenStats.EXPAND,
+          MavenStats.PARSE,
+          MavenStats.PROFILES,
+          MavenStats.RESOLVE
+        ]
+      )
+
+      # all files are in the cache already
+      download = stats[MavenStats.DOWNLOAD]
+      self.assertEquals (download.hits, download.calls)
+      self.assertEquals (download.misses, 0)
+      self.assertEquals (stats[MavenStats.PARSE].calls, download.calls)
+      self.assertTrue (stats[MavenStats.PARSE].bytes > 0)
+      self.assertTrue (stats[MavenStats.RESOLVE].calls > 0)
+
+      repo.resetStats ()
+      repo._download2string (repo.getPomUrlFor ('lib:new:1'))
+      repo.poms[repo.getPomUrlFor ('lib:new:1')] = u'<project>\xf1</project>'
+      repo._download2string (repo.getPomUrlFor ('lib:new:1'))
+      download = repo.stats ()[MavenStats.DOWNLOAD]
+      self.assertEquals ((download.calls, download.hits, download.misses), (2, 0, 2))
+      self.assertEquals (download.bytes, len ('<project>\xc3\xb1</project>'))
+    finally:
+      shutil.rmtree (cacheDir)
+    return
+
+  def testStatsPerRepo (self):
+    repo = mavenrepotest.MavenMemoryRepo (mavenrepotest.MavenRepoTest.POMS)
+    other = mavenrepotest.MavenMemoryRepo (mavenrepotest.MavenRepoTest.POMS)
+    repo.enableStats ()
+    other.enableStats ()
+
+    repo.fetchResolvedTree ('app:app:1', 'compile')
+    self.assertTrue (repo.stats ()[MavenStats.PARSE].calls > 0)
+    self.assertEquals (other.stats (), {})
+    self.assertEquals (MavenStats.getDefault ().snapshot (), {})
+
+    other.fetchOne ('lib:a:1')
+    parsed = repo.stats ()[MavenStats.PARSE].calls
+    other.resetStats ()
+    self.assertEquals (other.stats (), {})
+    self.assertEquals (repo.stats ()[MavenStats.PARSE].calls, parsed)
+
+    # the stats activated are restored afterwards
+    stats = MavenStats ()
+    with stats.activate ():
+      self.assertTrue (MavenStats.getCurrent () is stats)
+      repo.fetchOne ('lib:a:1')
+      self.assertTrue (MavenStats.getCurrent () is stats)
+    self.assertTrue (MavenStats.getCurrent () is MavenStats.getDefault ())
+    self.assertEquals (stats.snapshot (), {})
+    return
+
+  def testCountFromThreads (self):
+    stats = MavenStats ()
+    stats.enable ()
+
+    def count ():
+      for i in range (1000):
+        stats.count ('phase', bytes = 2, hits = 1)
+        stats.record ('phase', 0.0)
+      return
+
+    threads = [threading.Thread (target = count) for i in range (4)]
+    for thread in threads:
+      thread.start ()
+    for thread in threads:
+      thread.join ()
+
+    phase = stats.snapshot ()['phase']
+    self.assertEquals ((phase.calls, phase.hits, phase.bytes), (4000, 4000, 8000))
+    return
+
+if __name__ == '__main__':
+  unittest.main()
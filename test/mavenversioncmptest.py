@@ -66,6 +66,59 @@ class MavenVersionCompareTest (unittest.TestCase):
     self.assertTrue (vercmp.compare ('1.3', '1.2]') > 0)
     return
 
+  def testVersionKey (self):
+    versions = ['1.10', '1.2-beta', '', '1.2', '1.2-alpha-2', '1.2-alpha', '0.9']
+    self.assertEquals (
+      sorted (versions, key = vercmp.VersionKey),
+      ['', '0.9', '1.2', '1.2-alpha', '1.2-alpha-2', '1.2-beta', '1.10']
+    )
+
+    # same order as compare
+    for a in versions:
+      for b in versions:
+        self.assertEquals (
+          cmp (vercmp.VersionKey (a), vercmp.VersionKey (b)),
+          vercmp.compare (a, b)
+        )
+
+    self.assertEquals (vercmp.VersionKey ('1.0'), vercmp.VersionKey ('1.0.0'))
+    self.assertEquals (len (set ([vercmp.VersionKey ('1'), vercmp.VersionKey ('1.0')])), 1)
+    self.assertNotEquals (vercmp.VersionKey ('1.0'), '1.0')
+    return
+
+  def testVersionRange (self):
+    versionRange = vercmp.getRange ('(,1.0], [1.2,1.3), (2.0,)')
+    self.assertTrue (vercmp.getRange ('(,1.0], [1.2,1.3), (2.0,)') is versionRange)
+    self.assertEquals (len (versionRange.intervals), 3)
+
+    self.assertTrue  (versionRange.contains ('0.3'))
+    self.assertTrue  (versionRange.contains ('1.0'))
+    self.assertFalse (versionRange.contains ('1.1'))
+    self.assertTrue  (versionRange.contains ('1.2.5'))
+    self.assertFalse (versionRange.contains ('1.3'))
+    self.assertFalse (versionRange.contains ('2.0'))
+    self.assertTrue  (versionRange.contains ('2.0.1'))
+
+    versions = ['0.3', '1.0', '1.0.1', '1.1', '1.2', '1.2.5', '1.3', '2.0', '2.0.1', '10']
+    self.assertEquals (
+      versionRange.filter (versions),
+      ['0.3', '1.0', '1.2', '1.2.5', '2.0.1', '10']
+    )
+    self.assertEquals (vercmp.getRange ('[1.2]').filter (versions), ['1.2'])
+    self.assertEquals (vercmp.getRange ('1.3').filter (versions), ['1.3', '2.0', '2.0.1', '10'])
+    self.assertEquals (vercmp.getRange ('(1.0,1.0.1)').filter (versions), [])
+
+    self.assertRaises (Exception, vercmp.VersionRange, None)
+    self.assertRaises (Exception, vercmp.VersionRange, '[1.0,2.0,3.0]')
+    return
+
+  def testCanonicalCacheIsBounded (self):
+    for i in range (vercmp._CANONICAL_CACHE_SIZE + 10):
+      self.assertEquals (vercmp.getCanonical ('%d.1' % i), (i, 1, 0, '', 0))
+
+    self.assertTrue (len (vercmp._canonicalCache) <= vercmp._CANONICAL_CACHE_SIZE)
+    return
+
   def testSatisfiesMinimum (self):
     self.assertFalse (vercmp.satisfies ("1.2", "1.3"))
     self.assertFalse (vercmp.satisfies ("12.1.2-a-0", "12.1.2-a-1"))
@@ -1,11 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*- 
 import os,sys
+import shutil
+import tempfile
+import threading
 import unittest
 
 sys.path.append (os.path.join (os.path.dirname (__file__), '..'))
 
 from mavencoord import MavenCoord
+from mavenreport import MavenWarning
 from mavenversiondb import MavenVersionDb
 
 class MavenVersionDbTest (unittest.TestCase):
@@ -57,6 +61,27 @@ class MavenVersionDbTest (unittest.TestCase):
     )
     return
 
+  def testParseTreeOutput (self):
+    # raw dependency:tree output, the root line has no scope
+    expected = [
+      'com.example:proj:1.0-SNAPSHOT',
+      'commons-io:commons-io:2.4',
+      'junit:junit:4.12',
+      'org.hamcrest:hamcrest-core:1.3',
+      'com.google.guava:guava:19.0',
+      'net.java.dev.jna:jna:4.2.2',
+    ]
+
+    verdb = MavenVersionDb()
+    verdb.parseFile ('data/tree-deps.txt')
+    self.assertEquals ([verdb.find (c).id for c in expected], expected)
+    self.assertEquals (verdb.getWarnings (), [])
+
+    imported = MavenVersionDb()
+    self.assertEquals (imported.importPaths (['data/tree-deps.txt'], 1), [])
+    self.assertEquals (imported._db, verdb._db)
+    return
+
   def testFind (self):
     verdb = MavenVersionDb()
     verdb.parseFile ('data/simple-deps.txt')
@@ -81,3 +106,171 @@ class MavenVersionDbTest (unittest.TestCase):
       'commons-beanutils:commons-beanutils:1.8.3'
     )
     return
+
+  def testVersions (self):
+    verdb = MavenVersionDb()
+    verdb.register ([
+      'lib:a:1.2', 'lib:a:1.10', 'lib:a:1.0', 'lib:a:2.0-SNAPSHOT', 'lib:a:1.2'
+    ], verbose = False)
+
+    self.assertEquals (verdb.find ('lib:a').id, 'lib:a:1.2')
+    self.assertTrue (verdb.hasVersionFor ('lib', 'a'))
+    self.assertFalse (verdb.hasVersionFor ('lib', 'b'))
+
+    self.assertEquals (
+      verdb.getVersionsFor ('lib', 'a'),
+      ['1.0', '1.2', '1.10', '2.0-SNAPSHOT']
+    )
+    self.assertEquals (verdb.getVersionsFor ('lib', 'b'), [])
+    self.assertEquals (verdb.getNewestVersionFor ('lib', 'a'), '2.0-SNAPSHOT')
+    self.assertEquals (verdb.getNewestVersionFor ('lib', 'b'), None)
+
+    self.assertEquals (verdb.getHighestVersionFor ('lib', 'a', '[1.0,2.0)'), '1.10')
+    self.assertEquals (verdb.getHighestVersionFor ('lib', 'a', '(,1.2]'), '1.2')
+    self.assertEquals (verdb.getHighestVersionFor ('lib', 'a', '[1.0]'), '1.0')
+    self.assertEquals (verdb.getHighestVersionFor ('lib', 'a', '[3.0,)'), None)
+    self.assertEquals (verdb.getHighestVersionFor ('lib', 'b', '[1.0,)'), None)
+
+    verdb.setVersionFor ('lib', 'a', '1.5')
+    self.assertEquals (verdb.find ('lib:a').id, 'lib:a:1.5')
+    self.assertEquals (verdb.getHighestVersionFor ('lib', 'a', '[1.3,1.6)'), '1.5')
+    return
+
+  def testSaveAndLoad (self):
+    tempDir = tempfile.mkdtemp ()
+    try:
+      indexPath = os.path.join (tempDir, 'deps.txt.index')
+
+      verdb = MavenVersionDb.fromFile ('data/simple-deps.txt', indexPath)
+      verdb.register ('commons-io:commons-io:2.2', verbose = False)
+      verdb.save (indexPath)
+
+      for loaded in [
+        MavenVersionDb.fromFile (indexPath),
+        MavenVersionDb.fromFile ('data/simple-deps.txt', indexPath)
+      ]:
+        self.assertEquals (
+          loaded.find ('commons-io:commons-io').id,
+          'commons-io:commons-io:2.4'
+        )
+        self.assertEquals (
+          loaded.getVersionsFor ('commons-io', 'commons-io'),
+          ['2.2', '2.4']
+        )
+        self.assertEquals (
+          loaded.getHighestVersionFor ('commons-io', 'commons-io', '[2.0,2.3]'),
+          '2.2'
+        )
+
+      self.assertFalse (MavenVersionDb.isIndexFile ('data/simple-deps.txt'))
+      self.assertRaises (
+        Exception,
+        MavenVersionDb ().load, 'data/simple-deps.txt'
+      )
+    finally:
+      shutil.rmtree (tempDir)
+    return
+
+  def _writeFiles (self, baseDir, files):
+    for (path, data) in files.items ():
+      path = os.path.join (baseDir, *path.split ('/'))
+      if not os.path.exists (os.path.dirname (path)):
+        os.makedirs (os.path.dirname (path))
+
+      with open (path, 'wb') as f:
+        f.write (data)
+    return
+
+  def testImportPaths (self):
+    tempDir = tempfile.mkdtemp ()
+    try:
+      self._writeFiles (tempDir, {
+        'm2/lib/a/1.0/a-1.0.pom' : (
+          '<project><groupId>lib</groupId><artifactId>a</artifactId>'
+          '<version>1.0</version></project>'
+        ),
+        'm2/lib/b/2.0/b-2.0.pom' : (
+          '<project><parent><groupId>lib</groupId><version>2.0</version></parent>'
+          '<artifactId>b</artifactId></project>'
+        ),
+        'm2/lib/c/${v}/c.pom' : (
+          '<project><groupId>lib</groupId><artifactId>c</artifactId>'
+          '<version>${v}</version></project>'
+        ),
+        'm2/lib/a/maven-metadata.xml' : (
+          '<metadata><groupId>lib</groupId><artifactId>a</artifactId>'
+          '<versioning><versions><version>1.1</version><version>0.9</version>'
+          '</versions></versioning></metadata>'
+        ),
+        'm2/lib/a/1.0/a-1.0.jar' : 'not scanned',
+        'm2/broken.xml' : '<project>',
+        'trees/p1.txt' : '# p1\nlib:a:jar:1.5:compile\n+- lib:b:jar:2.0:compile\n',
+        'trees/p2.txt' : 'lib:a:jar:1.6:compile\n\\- lib:b:jar:2.1:runtime\n',
+      })
+
+      dbs = []
+      for processes in [1, 3]:
+        verdb = MavenVersionDb ()
+        warnings = verdb.importPaths (
+          [os.path.join (tempDir, 'm2'), os.path.join (tempDir, 'trees')],
+          processes
+        )
+        dbs.append (verdb)
+
+        self.assertEquals (
+          [(w.kind, w.coord, w.expected) for w in warnings],
+          [
+            (MavenWarning.UNHANDLED_CONFLICT, 'lib:a:1.6', '1.5'),
+            (MavenWarning.UNHANDLED_CONFLICT, 'lib:b:2.1', '2.0')
+          ]
+        )
+        self.assertEquals (verdb.getWarnings (), warnings)
+
+        self.assertEquals (verdb.find ('lib:a').id, 'lib:a:1.5')
+        self.assertEquals (verdb.find ('lib:b').id, 'lib:b:2.0')
+        self.assertEquals (verdb.find ('lib:c'), None)
+        self.assertEquals (
+          verdb.getVersionsFor ('lib', 'a'),
+          ['0.9', '1.0', '1.1', '1.5', '1.6']
+        )
+        self.assertEquals (verdb.getVersionsFor ('lib', 'b'), ['2.0', '2.1'])
+        self.assertEquals (verdb.getVersionsFor ('lib', 'c'), [])
+
+      self.assertEquals (dbs[0]._db, dbs[1]._db)
+      self.assertEquals (dbs[0]._versions, dbs[1]._versions)
+    finally:
+      shutil.rmtree (tempDir)
+    return
+
+  def testConcurrentRegister (self):
+    verdb = MavenVersionDb ()
+    coords = [
+      'lib:a%d:1.%d' % (i % 20, (i * 7) % 13) for i in range (2000)
+    ]
+
+    def worker (offset):
+      for coord in coords[offset::8]:
+        verdb.findOrRegister (coord)
+        verdb.register (coord, verbose = False)
+        verdb.getHighestVersionFor ('lib', 'a%d' % (offset % 20), '[1.0,1.9]')
+      return
+
+    threads = [threading.Thread (target = worker, args = (i,)) for i in range (8)]
+    for thread in threads:
+      thread.start ()
+    for thread in threads:
+      thread.join ()
+
+    for i in range (20):
+      versions = sorted (set ([
+        c.split (':')[2] for c in coords if c.startswith ('lib:a%d:' % i)
+      ]), key = lambda v: int (v.split ('.')[1]))
+
+      self.assertEquals (verdb.getVersionsFor ('lib', 'a%d' % i), versions)
+      self.assertTrue (verdb.getVersionFor ('lib', 'a%d' % i) in versions)
+
+    # each conflict is recorded once
+    warnings = verdb.getWarnings ()
+    self.assertEquals (len (warnings), len (set ([w.coord for w in warnings])))
+    return
+